@@ -7,6 +7,9 @@ bl_info = {
     "category": "Render",
 }
 
+import time
+_import_begin: float = time.perf_counter()
+
 import bpy
 from bpy.utils import register_class, unregister_class
 
@@ -17,7 +20,22 @@ from . import render
 from . import camera
 from . import settings
 from . import materials
+from . import params
 from . import buffers
+from . import gbuffer
+from . import store
+from . import registry
+from . import session
+from . import scheduler
+from . import cache
+from . import fingerprint
+from . import journal
+from . import const
+from . import core
+
+# ... i moduli dei job senza interfaccia (cli, server, jobs) e distribuiti (farm, workqueue) vengono importati
+# dai loro punti di ingresso e dagli operatori che li usano, non all'avvio dell'add-on ...
+startup_ms: dict[str, float] = {"import": (time.perf_counter() - _import_begin) * 1000.0}  # tempi di avvio dell'add-on
 
 
 def register():
@@ -25,6 +43,8 @@ def register():
     Il metodo gestisce la registrazione dei componenti blender
     """
     
+    begin: float = time.perf_counter()
+    
     # ... proprietà ...
     register_class(properties.PixelizeProperties)
     bpy.types.Scene.pixel_props = bpy.props.PointerProperty(type = properties.PixelizeProperties)
@@ -40,11 +60,25 @@ def register():
     register_class(render.RenderPixelArtAnimation)
     register_class(render.RenderMultiAngle)
     register_class(render.RenderMultiAngleAnimation)
+    register_class(render.RebuildSpritesheets)
+    register_class(render.PatchSpritesheet)
+    register_class(render.SubmitRenderQueue)
+    register_class(render.AssembleRenderQueue)
+    register_class(gbuffer.ResolvePalette)
+    
+    # ... handler ...
+    registry.register_handlers()
     
     # ... interfaccia grafica ...
     register_class(panels.RenderingPanel)
     register_class(panels.PixelArtMaterialPanel)
     
+    # ... tempi di avvio (nessuna dipendenza viene installata o importata qui: vedi imaging) ...
+    startup_ms["register"] = (time.perf_counter() - begin) * 1000.0
+    total: float = startup_ms["import"] + startup_ms["register"]
+    if total > const.REGISTER_BUDGET_MS:
+        print(f"Pixelize: avvio lento, {total:.1f} ms (import {startup_ms['import']:.1f} ms, registrazione {startup_ms['register']:.1f} ms)")
+    
 def unregister():
     """
     Il metodo gestisce la cancellazione delle componenti
@@ -65,6 +99,14 @@ def unregister():
     unregister_class(render.RenderPixelArtAnimation)
     unregister_class(render.RenderMultiAngle)
     unregister_class(render.RenderMultiAngleAnimation)
+    unregister_class(render.RebuildSpritesheets)
+    unregister_class(render.PatchSpritesheet)
+    unregister_class(render.SubmitRenderQueue)
+    unregister_class(render.AssembleRenderQueue)
+    unregister_class(gbuffer.ResolvePalette)
+    
+    # ... handler ...
+    registry.unregister_handlers()
 
     # ... interfaccia grafica ...
     unregister_class(panels.RenderingPanel)
@@ -3,36 +3,220 @@ Il modulo offre delle funzionalità per la gestione dei buffer
 """
 
 import bpy
-from bpy.types import Scene, Operator, Context
-import os
+from bpy.types import Scene, Operator, Context, Image, Node, NodeTree, NodeSocket
+import numpy as np
+from typing import Optional
 
 from . import const
+from .core.palette import PaletteUtils
+from .core.profiling import Profiler
+
+
+class BufferPool:
+    """
+    La classe gestisce il pool delle immagini usate come buffer da Pixelize.
+    Le immagini vengono riutilizzate e ridimensionate al cambio di risoluzione, mentre tutte le operazioni
+    in blocco sui pixel (pulizia, copia, lettura) passano per array NumPy contigui.
+    I buffer BYTE sono in sRGB, come l'output finale: read e write convertono i colori da e verso i valori lineari della scena,
+    così gli 8 bit restituiscono esattamente i colori della palette.
+    """
+
+    STORAGE_TAG: str = "pixelize_storage"  # proprietà che marca le immagini possedute dal pool
+    STORAGE_PROPS: dict[str, str] = {
+        const.DIFFUSE_BUFFER: "diffuse_storage",
+        const.FREESTYLE_BUFFER: "freestyle_storage",
+        const.BORDER_BUFFER: "border_storage",
+    }  # associa ai buffer la proprietà che ne sceglie la precisione
+    SNAPSHOT_DTYPES: dict[str, type] = {"BYTE": np.uint8, "HALF": np.float16, "FLOAT": np.float32}
+    COLOR_BUFFERS: set[str] = {const.SPRITE_BUFFER}  # buffer che contengono colori da salvare con la gestione del colore della scena
+
+    _scratch: dict[tuple[int, int], np.ndarray] = {}  # array di lavoro riutilizzati, uno per risoluzione
+    _zeros: dict[tuple[int, int], np.ndarray] = {}  # array nulli usati per la pulizia
+
+    @staticmethod
+    def storage(name: str) -> str:
+        """
+        Il metodo restituisce la precisione scelta per il buffer ('BYTE', 'HALF' o 'FLOAT').
+        """
+
+        prop: Optional[str] = BufferPool.STORAGE_PROPS.get(name)
+        scene: Scene = bpy.context.scene
+        if prop is None or not hasattr(scene, "pixel_props"): return "FLOAT"
+        return getattr(scene.pixel_props, prop)
+
+    @staticmethod
+    def is_srgb(name: str) -> bool:
+        """
+        Il metodo indica se i pixel del buffer sono codificati in sRGB (buffer BYTE del pool).
+        """
+
+        return name in BufferPool.STORAGE_PROPS and BufferPool.storage(name) == "BYTE"
+
+    @staticmethod
+    def scratch(width: int, height: int) -> np.ndarray:
+        """
+        Il metodo restituisce un array float contiguo di dimensione width * height * 4, riutilizzato tra le chiamate.
+        """
+
+        key: tuple[int, int] = (width, height)
+        if key not in BufferPool._scratch:
+            BufferPool._scratch[key] = np.empty(width * height * 4, dtype = np.float32)
+        return BufferPool._scratch[key]
+
+    @staticmethod
+    def owned() -> list[Image]:
+        """
+        Il metodo restituisce le immagini possedute dal pool.
+        """
+
+        return [img for img in bpy.data.images if BufferPool.STORAGE_TAG in img]
+
+    @staticmethod
+    def acquire(name: str, width: Optional[int] = None, height: Optional[int] = None) -> Image:
+        """
+        Il metodo restituisce il buffer richiesto, creandolo o adattandolo a risoluzione e precisione.
+
+        Args:
+            - name: il nome del buffer.
+            - width: la larghezza richiesta (di default quella del rendering).
+            - height: l'altezza richiesta (di default quella del rendering).
+
+        Returns:
+            - l'immagine del buffer.
+        """
+
+        scene: Scene = bpy.context.scene
+        if width is None: width = scene.render.resolution_x
+        if height is None: height = scene.render.resolution_y
+        storage: str = BufferPool.storage(name)
+        use_float: bool = storage != "BYTE"
+
+        img: Optional[Image] = bpy.data.images.get(name)
+        if img is None:
+            img = bpy.data.images.new(name, width = width, height = height, alpha = True, float_buffer = use_float)
+            img.use_fake_user = True  # evita che l'immagine venga rimossa
+
+        if img.source != "GENERATED":  # buffer delle versioni precedenti, caricato da file e impacchettato
+            if img.packed_file is not None: img.unpack(method = "REMOVE")  # elimina la copia impacchettata
+            img.source = "GENERATED"
+            img.filepath = ""
+
+        if img.get(BufferPool.STORAGE_TAG) != storage:
+            img.generated_float = use_float
+            if storage == "BYTE":
+                img.colorspace_settings.name = "sRGB"  # i byte codificano i colori come l'output finale
+            elif name not in BufferPool.COLOR_BUFFERS:
+                img.colorspace_settings.name = "Non-Color"  # i valori vengono letti così come sono stati scritti
+            img[BufferPool.STORAGE_TAG] = storage
+
+        if tuple(img.size) != (width, height): img.scale(width, height)
+        return img
+
+    @staticmethod
+    def resize_all(width: int, height: int) -> None:
+        """
+        Il metodo adegua tutti i buffer del pool alla nuova risoluzione.
+        """
+
+        for img in BufferPool.owned():
+            BufferPool.acquire(img.name, width, height)
+
+        BufferPool._scratch.clear()  # le vecchie risoluzioni non servono più
+        BufferPool._zeros.clear()
+
+    @staticmethod
+    def clear(name: str) -> None:
+        """
+        Il metodo azzera i pixel del buffer.
+        """
+
+        if name not in bpy.data.images: return
+
+        img: Image = bpy.data.images[name]
+        width, height = img.size
+        key: tuple[int, int] = (width, height)
+        if key not in BufferPool._zeros:
+            BufferPool._zeros[key] = np.zeros(width * height * 4, dtype = np.float32)
+
+        img.pixels.foreach_set(BufferPool._zeros[key])
+        img.update()
+
+    @staticmethod
+    def read(name: str, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Il metodo legge i pixel dell'immagine in un array float di forma (altezza, larghezza, 4).
+
+        Args:
+            - name: il nome dell'immagine da leggere.
+            - out: l'array in cui copiare i pixel; se assente viene usato l'array di lavoro del pool.
+        """
+
+        img: Image = bpy.data.images[name]
+        width, height = img.size
+        if out is None: out = BufferPool.scratch(width, height)
+        img.pixels.foreach_get(out.reshape(-1))
+        pixels: np.ndarray = out.reshape(height, width, 4)
+        if BufferPool.is_srgb(name): pixels[..., :3] = PaletteUtils.srgb_to_linear(pixels[..., :3])
+        return pixels
+
+    @staticmethod
+    def write(name: str, pixels: np.ndarray) -> None:
+        """
+        Il metodo scrive i pixel di forma (altezza, larghezza, 4) nel buffer, adattandone la risoluzione.
+        """
+
+        height, width = pixels.shape[:2]
+        img: Image = BufferPool.acquire(name, width, height)
+        if BufferPool.is_srgb(name):
+            pixels = np.array(pixels, dtype = np.float32)
+            pixels[..., :3] = PaletteUtils.linear_to_srgb(pixels[..., :3])
+        img.pixels.foreach_set(np.ascontiguousarray(pixels, dtype = np.float32).reshape(-1))
+        img.update()
+
+    @staticmethod
+    def copy(source: str, target: str) -> None:
+        """
+        Il metodo copia i pixel di un'immagine nel buffer indicato.
+        """
+
+        BufferPool.write(target, BufferPool.read(source))
+
+    @staticmethod
+    def snapshot(name: str) -> np.ndarray:
+        """
+        Il metodo restituisce una copia dei pixel del buffer con la precisione scelta per il buffer stesso.
+        """
+
+        pixels: np.ndarray = BufferPool.read(name)
+        dtype: type = BufferPool.SNAPSHOT_DTYPES[BufferPool.storage(name)]
+        if dtype is np.uint8: return PaletteUtils.encode_bytes(pixels)
+        return pixels.astype(dtype)
+
+    @staticmethod
+    def restore(name: str, snapshot: np.ndarray) -> None:
+        """
+        Il metodo riporta nel buffer una copia ottenuta con snapshot.
+        """
+
+        if snapshot.dtype == np.uint8: BufferPool.write(name, PaletteUtils.decode_bytes(snapshot))
+        else: BufferPool.write(name, snapshot)
 
 
 class BufferUtils:
     """
     La classe raccoglie delle funzionalità di utilità per la gestione dei buffer
     """
-    
+
     @staticmethod
-    def new_buffer(name: str) -> None: 
+    def new_buffer(name: str) -> Image:
         """
         Il metodo consente la creazione di un nuovo buffer per il rendering.
 
         Args:
             name (str): il nome del buffer.
         """
-        
-        if name in bpy.data.images:
-            print("Il buffer esiste già")
-            return bpy.data.images[name]
-        
-        scene: Scene = bpy.data.scenes["Scene"]
-        rw: int = scene.render.resolution_x
-        rh: int = scene.render.resolution_y
-        bpy.ops.image.new(name=name, width=rw, height=rh, alpha=True)  
-        bpy.data.images[name].use_fake_user = True  # evita che l'immagine venga rimossa
-        return
+
+        return BufferPool.acquire(name)
 
 
     @staticmethod
@@ -40,39 +224,102 @@ class BufferUtils:
         """
         Il metodo consente di ripulire il buffer
         """
-        
-        if name not in bpy.data.images: return
-        
-        img = bpy.data.images[name]
 
-        # Assicura che l'immagine abbia dati di pixel
-        width, height = img.size
-        values: list[float] = [0.0 for _ in range(width * height * 4)]
-        img.pixels.foreach_set(values)
-        img.update()
+        BufferPool.clear(name)
 
 
+    @staticmethod
+    def set_viewer(scene: Scene, source: Optional[NodeSocket] = None) -> Node:
+        """
+        Il metodo garantisce la presenza del nodo viewer usato per leggere in memoria il risultato del rendering.
+
+        Args:
+            - scene: la scena di cui configurare il compositor.
+            - source: l'uscita da collegare al viewer (di default l'immagine dei render layers).
+
+        Returns:
+            - il nodo viewer collegato alla sorgente.
+        """
+
+        if scene.node_tree is None: scene.use_nodes = True  # crea l'albero del compositor
+        tree: NodeTree = scene.node_tree
+
+        viewer: Node = tree.nodes.get(const.VIEWER_NODE)
+        if viewer is None:
+            viewer = tree.nodes.new("CompositorNodeViewer")
+            viewer.name = const.VIEWER_NODE
+            viewer.label = const.VIEWER_NODE
+            viewer.location = (0, -300)
+            viewer.use_alpha = True
+
+        if source is None: source = tree.nodes["Render Layers"].outputs["Image"]
+        if not viewer.inputs["Image"].is_linked or viewer.inputs["Image"].links[0].from_socket != source:
+            tree.links.new(source, viewer.inputs["Image"])
+
+        tree.nodes.active = viewer  # il compositor aggiorna solo il viewer attivo
+        return viewer
+
+    @staticmethod
+    def composite_source(scene: Scene) -> NodeSocket:
+        """
+        Il metodo restituisce l'uscita collegata al nodo Composite, cioè l'immagine finale del compositor.
+        """
+
+        composite: Node = scene.node_tree.nodes["Composite"]
+        if composite.inputs["Image"].is_linked: return composite.inputs["Image"].links[0].from_socket
+        return scene.node_tree.nodes["Render Layers"].outputs["Image"]
+
+    @staticmethod
+    def copy_render_result(buffer_name: str) -> None:
+        """
+        Il metodo copia il risultato dell'ultimo rendering nei pixel del buffer, senza passare dal disco.
+        """
+
+        if const.VIEWER_IMAGE not in bpy.data.images or 0 in bpy.data.images[const.VIEWER_IMAGE].size:
+            raise RuntimeError("il compositor non ha prodotto il risultato del rendering")
+
+        BufferPool.copy(const.VIEWER_IMAGE, buffer_name)
+
+    @staticmethod
+    def still_path(scene: Scene) -> str:
+        """
+        Il metodo restituisce il percorso assoluto in cui il rendering corrente verrebbe salvato da write_still.
+        """
+
+        path: str = bpy.path.abspath(scene.render.filepath)
+        if scene.render.use_file_extension: path = bpy.path.ensure_ext(path, scene.render.file_extension)
+        return path
+
+    @staticmethod
+    def save_still(buffer_name: str, scene: Scene) -> str:
+        """
+        Il metodo salva il buffer nel percorso di output della scena, con le impostazioni di formato e colore del rendering.
+
+        Returns:
+            - il percorso del file salvato.
+        """
+
+        path: str = BufferUtils.still_path(scene)
+        bpy.data.images[buffer_name].save_render(path, scene = scene)
+        return path
+
     @staticmethod
     def render_buffer(buffer_name: str) -> None:
         """
         Il metodo gestisce il rendering del buffer.
+        Il risultato viene letto dal viewer del compositor e copiato in memoria nel buffer: niente file temporanei né immagini impacchettate.
         """
-        
-        old_path: str = bpy.data.scenes["Scene"].render.filepath
-        new_path: str = "//" + buffer_name + ".png"
-        bpy.data.scenes["Scene"].render.filepath = new_path
-        
-        bpy.ops.render.render(use_viewport = True, write_still = True)
-        bpy.data.scenes["Scene"].render.filepath = old_path
-        
-        tex = bpy.data.images[buffer_name]
-        tex.source = "FILE"
-        tex.filepath = new_path
-        tex.reload()
-        tex.pack()
-        
-        os.remove(bpy.path.abspath(new_path))  # rimuove il file temporaneo
-        
+
+        scene: Scene = bpy.context.scene
+        BufferUtils.set_viewer(scene)
+
+        use_nodes: bool = scene.use_nodes
+        scene.use_nodes = True  # il viewer viene aggiornato solo con il compositor attivo
+        bpy.ops.render.render(use_viewport = True)
+        scene.use_nodes = use_nodes
+
+        with Profiler.span("capture", "buffer"): BufferUtils.copy_render_result(buffer_name)
+
 
 class ClearBuffers(Operator):
     """
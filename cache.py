@@ -0,0 +1,227 @@
+"""
+Il modulo contiene la cache su disco degli sprite renderizzati, indicizzata dall'hash dei dati che li determinano
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Any, BinaryIO, Callable, Optional
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+
+
+@dataclass
+class CacheStats:
+    """
+    classe che raccoglie le statistiche della cache
+    """
+
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    evicted_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        La frazione delle richieste servite dalla cache.
+        """
+
+        total: int = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def merge(self, other: "CacheStats") -> None:
+        """
+        Il metodo somma le statistiche di other.
+        """
+
+        for key, value in asdict(other).items(): setattr(self, key, getattr(self, key) + value)
+
+
+class RenderCache:
+    """
+    La classe conserva gli sprite (RGBA uint8, come nell'archivio di frame) in file '<chiave>.npy' raggruppati
+    in sottocartelle per le prime due cifre della chiave.
+
+    Accanto a uno sprite può essere conservato il file dei suoi dati di illuminazione ('<chiave>.lighting.npz', vedi palette.LightingData),
+    che segue lo sprite nell'occupazione e nelle rimozioni.
+
+    La data di modifica di ogni file indica l'ultimo utilizzo: i file letti vengono toccati e, quando la dimensione
+    totale supera max_bytes, vengono rimossi quelli usati meno di recente (LRU).
+    Le statistiche cumulative vengono salvate in 'stats.json' alla chiusura.
+    """
+
+    EXTENSION: str = ".npy"
+    LIGHTING_EXTENSION: str = ".lighting.npz"
+
+    def __init__(self, root: str, max_bytes: int):
+        """
+        Args:
+            - root: la cartella della cache.
+            - max_bytes: la dimensione massima dei file della cache.
+        """
+
+        self.root: str = root
+        self.max_bytes: int = max_bytes
+        self.stats: CacheStats = CacheStats()  # statistiche della sessione
+        os.makedirs(root, exist_ok = True)
+        self._size: Optional[int] = None  # dimensione totale, calcolata alla prima scrittura
+
+    def __enter__(self) -> "RenderCache":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def path(self, key: str) -> str:
+        """
+        Il metodo restituisce il percorso del file della chiave.
+        """
+
+        return os.path.join(self.root, key[:2], key + RenderCache.EXTENSION)
+
+    @staticmethod
+    def lighting_path(path: str) -> str:
+        """
+        Il metodo restituisce il percorso dei dati di illuminazione associati al file di uno sprite.
+        """
+
+        return path[:-len(RenderCache.EXTENSION)] + RenderCache.LIGHTING_EXTENSION
+
+    def get(self, key: str, lighting: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Il metodo restituisce lo sprite della chiave, oppure None se non è in cache.
+
+        Args:
+            - lighting: se indicato, il percorso in cui copiare i dati di illuminazione dello sprite;
+              uno sprite salvato senza dati di illuminazione conta come assente.
+        """
+
+        path: str = self.path(key)
+        try:
+            if lighting is not None: shutil.copyfile(RenderCache.lighting_path(path), lighting)
+            pixels: np.ndarray = np.load(path)
+            os.utime(path)  # ultimo utilizzo, per l'LRU
+        except (FileNotFoundError, ValueError, OSError):  # file assente, rimosso nel frattempo o incompleto
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return pixels
+
+    def put(self, key: str, pixels: np.ndarray, lighting: Optional[str] = None) -> None:
+        """
+        Il metodo salva lo sprite della chiave, poi libera spazio se la cache supera la dimensione massima.
+
+        Args:
+            - lighting: il file dei dati di illuminazione dello sprite, copiato accanto allo sprite (ignorato se non esiste).
+        """
+
+        path: str = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        if lighting is not None and os.path.exists(lighting):  # prima dello sprite: chi trova lo sprite trova anche i dati
+            with open(lighting, "rb") as source:
+                RenderCache.publish(RenderCache.lighting_path(path), lambda file: shutil.copyfileobj(source, file))
+        RenderCache.publish(path, lambda file: np.save(file, np.ascontiguousarray(pixels)))
+
+        self.stats.writes += 1
+        if self._size is None: self._size = sum(size for _, size, _ in self.entries())
+        else: self._size += RenderCache.size(path)
+        if self._size > self.max_bytes: self.evict()
+
+    @staticmethod
+    def publish(path: str, write: Callable[[BinaryIO], None]) -> None:
+        """
+        Il metodo scrive un file della cache in un file temporaneo e lo rinomina: i lettori vedono il file completo o nessun file.
+        """
+
+        partial: str = f"{path}.{uuid.uuid4().hex[:8]}.part"
+        with open(partial, "wb") as file:
+            write(file)
+        os.replace(partial, path)
+
+    @staticmethod
+    def size(path: str) -> int:
+        """
+        Il metodo restituisce l'occupazione dello sprite, compresi i suoi dati di illuminazione.
+        """
+
+        try:
+            return os.path.getsize(path) + os.path.getsize(RenderCache.lighting_path(path))
+        except FileNotFoundError:
+            return os.path.getsize(path)
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        """
+        Il metodo restituisce (ultimo utilizzo, dimensione, percorso) di ogni file della cache.
+        """
+
+        entries: list[tuple[float, int, str]] = []
+        for directory in os.scandir(self.root):
+            if not directory.is_dir(): continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith(RenderCache.EXTENSION):
+                    entries.append((entry.stat().st_mtime, RenderCache.size(entry.path), entry.path))
+        return entries
+
+    def evict(self, target: Optional[int] = None) -> None:
+        """
+        Il metodo rimuove i file usati meno di recente finché la cache non scende sotto target (il 90% di max_bytes se None),
+        così le scritture successive non causano una rimozione ciascuna.
+        """
+
+        target = int(self.max_bytes * 0.9) if target is None else target
+        entries: list[tuple[float, int, str]] = sorted(self.entries())
+        size: int = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= target: break
+            for name in (path, RenderCache.lighting_path(path)):
+                try:
+                    os.remove(name)
+                except FileNotFoundError:
+                    pass
+            size -= entry_size
+            self.stats.evictions += 1
+            self.stats.evicted_bytes += entry_size
+        self._size = size
+
+    def clear(self) -> None:
+        """
+        Il metodo svuota la cache.
+        """
+
+        self.evict(0)
+
+    def totals(self) -> dict[str, Any]:
+        """
+        Il metodo restituisce le statistiche cumulative (sessioni precedenti e corrente) e l'occupazione della cache.
+        """
+
+        stats: CacheStats = self._load_stats()
+        stats.merge(self.stats)
+        entries: list[tuple[float, int, str]] = self.entries()
+        return dict(asdict(stats), hit_rate = stats.hit_rate, entries = len(entries), bytes = sum(size for _, size, _ in entries),
+                    max_bytes = self.max_bytes)
+
+    def close(self) -> None:
+        """
+        Il metodo aggiunge le statistiche della sessione a quelle cumulative.
+        """
+
+        stats: CacheStats = self._load_stats()
+        stats.merge(self.stats)
+        with open(os.path.join(self.root, "stats.json"), "w") as file:
+            json.dump(asdict(stats), file, indent = 2)
+        self.stats = CacheStats()
+
+    def _load_stats(self) -> CacheStats:
+        """
+        Il metodo legge le statistiche cumulative salvate.
+        """
+
+        path: str = os.path.join(self.root, "stats.json")
+        if not os.path.exists(path): return CacheStats()
+        with open(path, "r") as file:
+            return CacheStats(**json.load(file))
@@ -6,6 +6,9 @@ import bpy
 from bpy.types import Operator, NodeGroup, Node, Context, Camera
 
 from . import const
+from . import buffers
+from . import materials
+from . import params
 
 class CameraMappingGroupSetting(Operator):
     """
@@ -117,11 +120,9 @@ class CameraMappingGroupSetting(Operator):
         Il metodo consente la definizione del metodo
         """
         
-        node: Node = group.nodes.new("ShaderNodeValue")
+        node: Node = materials.PixelArtMaterialsUtils.new_param_node(group, self.CAMERA_SCALE_NODE)  # il valore è sugli oggetti
         node.location = (-1900, -300)
-        node.label = self.CAMERA_SCALE_NODE
         node.name = self.CAMERA_SCALE_NODE
-        node.outputs[0].default_value = bpy.data.cameras[camera_name].ortho_scale
         return node
     
     def _define_camera_ratio_node(self, group: NodeGroup) -> Node:
@@ -139,11 +140,9 @@ class CameraMappingGroupSetting(Operator):
         Il metodo gestisce la definizione del nodo
         """
         
-        node: Node = group.nodes.new("ShaderNodeValue")
+        node: Node = materials.PixelArtMaterialsUtils.new_param_node(group, self.CAMERA_RESOLUTION_X_NODE)
         node.location = (-2200, -600)
-        node.label = self.CAMERA_RESOLUTION_X_NODE
         node.name = self.CAMERA_RESOLUTION_X_NODE
-        node.outputs[0].default_value = width
         return node        
     
     def _define_camera_res_y_node(self, group: NodeGroup, height: int) -> Node:
@@ -151,11 +150,9 @@ class CameraMappingGroupSetting(Operator):
         Il metodo gestisce la creazione del nodo
         """
         
-        node: Node = group.nodes.new("ShaderNodeValue")
+        node: Node = materials.PixelArtMaterialsUtils.new_param_node(group, self.CAMERA_RESOLUTION_Y_NODE)
         node.location = (-2200, -900)
-        node.label = self.CAMERA_RESOLUTION_Y_NODE
         node.name = self.CAMERA_RESOLUTION_Y_NODE
-        node.outputs[0].default_value = height
         return node   
     
     def _define_coord_node(self, group: NodeGroup, camera_name: str) -> Node:
@@ -178,9 +175,8 @@ class CameraMappingGroupSetting(Operator):
         group: NodeGroup = bpy.data.node_groups[const.CAMERA_MAPPING_GROUP]  # ricava il gruppo
         
         # ... regola i nodi di mapping della camera ...
-        group.nodes[self.CAMERA_SCALE_NODE].outputs[0].default_value = bpy.data.cameras[camera_name].ortho_scale
-        group.nodes[self.CAMERA_RESOLUTION_X_NODE].outputs[0].default_value = width
-        group.nodes[self.CAMERA_RESOLUTION_Y_NODE].outputs[0].default_value = height
+        params.ShaderParams.migrate_tree(group)  # scala e risoluzione arrivano dagli attributi degli oggetti
+        params.ShaderParams.apply(bpy.context.scene)
         group.nodes[self.CAMERA_COORD_NODE].object = bpy.data.objects[camera_name]
         
         return
@@ -218,11 +214,13 @@ class CameraMappingGroupSetting(Operator):
         group.links.new(separate_node.outputs["Y"], scale_y_node.inputs[0])  # separate -> scale_y
         group.links.new(coord_node.outputs["Object"], separate_node.inputs["Vector"])  # camera_scale_y -> separate
         group.links.new(camera_scale_y_node.outputs[0], scale_y_node.inputs[1])  # camera_scale_y -> scale_y
-        group.links.new(camera_scale_node.outputs["Value"], scale_x_node.inputs[1])  # camera_scale -> scale_x
-        group.links.new(camera_scale_node.outputs["Value"], camera_scale_y_node.inputs[0])  # camera_scale -> camera_scale_y
+        group.links.new(camera_scale_node.outputs["Fac"], scale_x_node.inputs[1])  # camera_scale -> scale_x
+        group.links.new(camera_scale_node.outputs["Fac"], camera_scale_y_node.inputs[0])  # camera_scale -> camera_scale_y
         group.links.new(camera_ratio_node.outputs["Value"], camera_scale_y_node.inputs[1])  # camera_ratio -> camera_scale_y
-        group.links.new(camera_res_y_node.outputs["Value"], camera_ratio_node.inputs[0])  # camera_res_y -> camera_ratio
-        group.links.new(camera_res_x_node.outputs["Value"], camera_ratio_node.inputs[1])  # camera_res_x -> camera_ratio
+        group.links.new(camera_res_y_node.outputs["Fac"], camera_ratio_node.inputs[0])  # camera_res_y -> camera_ratio
+        group.links.new(camera_res_x_node.outputs["Fac"], camera_ratio_node.inputs[1])  # camera_res_x -> camera_ratio
+        
+        params.ShaderParams.apply(bpy.context.scene)  # scrive scala e risoluzione sugli oggetti
           
     def execute(self, context: Context):
         """
@@ -243,6 +241,7 @@ class CameraMappingGroupSetting(Operator):
         
         bpy.data.scenes["Scene"].render.resolution_x = width
         bpy.data.scenes["Scene"].render.resolution_y = height
+        buffers.BufferPool.resize_all(width, height)  # i buffer seguono la nuova risoluzione
         
         
         if const.CAMERA_MAPPING_GROUP in bpy.data.node_groups:  # se il nodo esiste già
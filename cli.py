@@ -0,0 +1,202 @@
+"""
+Il modulo contiene la riga di comando di Pixelize, per eseguire i job con Blender in background:
+
+    blender -b progetto.blend --python <add-on>/cli.py -- --type multiangle_animation --subject Hero --frames 1-24
+    blender -b progetto.blend --python-expr "import <add-on>.cli as cli; cli.PixelizeCLI.main()" -- --jobs jobs.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+if __name__ == "__main__":  # eseguito con '--python': il modulo viene importato come parte del pacchetto dell'add-on
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    __package__ = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+    importlib.import_module(__package__)
+
+import bpy
+from typing import Any, Optional
+
+from . import jobs
+
+
+class PixelizeCLI:
+    """
+    La classe interpreta gli argomenti che seguono '--', esegue i job nell'ordine in una sola sessione di Blender
+    e stampa un riepilogo dei tempi.
+
+    I job vengono dalla riga di comando (--type e le altre opzioni) e/o da file JSON (--jobs): un job, una lista di job
+    oppure {"defaults": {...}, "jobs": [...]}; i campi sono quelli di jobs.JobRunner, più "blend" per cambiare progetto.
+    Le opzioni della riga di comando valgono come valori predefiniti dei job dei file.
+
+    Codici di uscita: EXIT_OK se tutti i job sono riusciti, EXIT_FAILED se almeno uno è fallito, EXIT_USAGE per argomenti non validi.
+    L'ultima riga dell'output è il riepilogo JSON, preceduto da RESULT_PREFIX.
+    """
+
+    EXIT_OK: int = 0
+    EXIT_FAILED: int = 1
+    EXIT_USAGE: int = 2
+    RESULT_PREFIX: str = "PIXELIZE_RESULT "
+
+    @staticmethod
+    def parser() -> argparse.ArgumentParser:
+        """
+        Il metodo costruisce il parser degli argomenti.
+        """
+
+        parser: argparse.ArgumentParser = argparse.ArgumentParser(prog = "pixelize", description = "Esegue i job di Pixelize senza interfaccia.")
+        parser.add_argument("--type", choices = jobs.JobRunner.JOB_TYPES, help = "il tipo del job da eseguire")
+        parser.add_argument("--jobs", action = "append", default = [], metavar = "FILE", help = "file JSON con uno o più job (ripetibile)")
+        parser.add_argument("--subject", help = "l'oggetto da ruotare nei job multi-angolo")
+        parser.add_argument("--frames", help = "frame e intervalli, ad esempio '1-24, 30'")
+        parser.add_argument("--angles", help = "angoli in gradi dei job multi-angolo, ad esempio '0, 90, 180, 270'")
+        parser.add_argument("--samples", type = int, help = "i campioni del rendering")
+        parser.add_argument("--preview", action = "store_true", help = "usa i campioni di anteprima")
+        parser.add_argument("--frame-size", type = int, help = "il lato delle celle della spritesheet")
+        parser.add_argument("--format", choices = ("PNG", "RAW"), help = "il formato della spritesheet")
+        parser.add_argument("--layout", choices = ("GRID", "ATLAS"), help = "la disposizione degli sprite")
+        parser.add_argument("--output", help = "il percorso dello sprite o la cartella della spritesheet")
+        parser.add_argument("--report", metavar = "FILE", help = "salva il riepilogo JSON nel file")
+        parser.add_argument("--fail-fast", action = "store_true", help = "si ferma al primo job fallito")
+        parser.add_argument("--profile", action = "store_true", help = "misura tempi e memoria dei job e salva i trace (vedi core.profiling)")
+        return parser
+
+    @staticmethod
+    def defaults(args: argparse.Namespace) -> dict[str, Any]:
+        """
+        Il metodo converte le opzioni della riga di comando nei campi dei job.
+        """
+
+        fields: dict[str, Any] = {"type": args.type, "subject": args.subject, "frames": args.frames, "samples": args.samples,
+                                  "frame_size": args.frame_size, "format": args.format, "layout": args.layout, "output": args.output}
+        if args.angles: fields["angles"] = [int(angle) for angle in args.angles.split(",") if angle.strip()]
+        if args.preview: fields["preview"] = True
+        if args.profile: fields["profile"] = True
+        return {key: value for key, value in fields.items() if value is not None}
+
+    @staticmethod
+    def load_jobs(args: argparse.Namespace) -> list[dict[str, Any]]:
+        """
+        Il metodo restituisce i job da eseguire, nell'ordine: quelli dei file, poi quello della riga di comando se non ci sono file.
+        """
+
+        defaults: dict[str, Any] = PixelizeCLI.defaults(args)
+        loaded: list[dict[str, Any]] = []
+        for path in args.jobs:
+            with open(path, "r") as file:
+                data: Any = json.load(file)
+            if isinstance(data, dict) and "jobs" in data:
+                loaded.extend({**defaults, **data.get("defaults", {}), **job} for job in data["jobs"])
+            else:
+                loaded.extend({**defaults, **job} for job in (data if isinstance(data, list) else [data]))
+
+        if not args.jobs and args.type: loaded.append(defaults)
+        for number, job in enumerate(loaded):
+            if job.get("type") not in jobs.JobRunner.JOB_TYPES: raise ValueError(f"job {number}: tipo '{job.get('type')}' non valido")
+        return loaded
+
+    @staticmethod
+    def run_job(job: dict[str, Any]) -> dict[str, Any]:
+        """
+        Il metodo esegue un job (aprendo il suo progetto se diverso da quello caricato) e ne misura la durata.
+
+        Returns:
+            - il risultato: tipo, esito, secondi, sprite salvati, file prodotti ed eventuale errore.
+        """
+
+        sprites: int = 0
+        def progress(idx: int, path: str) -> None:
+            nonlocal sprites
+            sprites += 1
+
+        result: dict[str, Any] = {"id": job.get("id"), "type": job["type"], "status": "ok", "sprites": 0, "outputs": []}
+        begin: float = time.perf_counter()
+        try:
+            blend: Optional[str] = job.get("blend")
+            if blend and os.path.abspath(blend) != bpy.data.filepath: bpy.ops.wm.open_mainfile(filepath = os.path.abspath(blend))
+            result["outputs"] = jobs.JobRunner.run(bpy.context.scene, job, bpy.data.filepath, progress)
+        except Exception as error:
+            result.update(status = "error", error = f"{type(error).__name__}: {error}")
+        result.update(seconds = time.perf_counter() - begin, sprites = sprites)
+        return result
+
+    @staticmethod
+    def summary(results: list[dict[str, Any]]) -> str:
+        """
+        Il metodo restituisce la tabella dei tempi dei job.
+        """
+
+        lines: list[str] = [f"{'#':>3}  {'type':<22}{'status':<8}{'sprites':>8}{'seconds':>10}{'sprites/s':>11}"]
+        for number, result in enumerate(results):
+            rate: float = result["sprites"] / result["seconds"] if result["seconds"] > 0 else 0.0
+            lines.append(f"{number:>3}  {result['type']:<22}{result['status']:<8}{result['sprites']:>8}{result['seconds']:>10.2f}{rate:>11.2f}")
+            if "error" in result: lines.append(f"     {result['error']}")
+        total: float = sum(result["seconds"] for result in results)
+        lines.append(f"     {len(results)} job, {sum(result['sprites'] for result in results)} sprite, {total:.2f} s")
+        return "\n".join(lines)
+
+    @staticmethod
+    def run(argv: list[str]) -> int:
+        """
+        Il metodo esegue i job indicati dagli argomenti.
+
+        Returns:
+            - il codice di uscita.
+        """
+
+        try:
+            args: argparse.Namespace = PixelizeCLI.parser().parse_args(argv)
+            job_list: list[dict[str, Any]] = PixelizeCLI.load_jobs(args)
+        except SystemExit as exit:  # argparse esce da solo per --help e argomenti errati
+            return PixelizeCLI.EXIT_OK if exit.code == 0 else PixelizeCLI.EXIT_USAGE
+        except (OSError, ValueError) as error:
+            sys.stderr.write(f"pixelize: {error}\n")
+            return PixelizeCLI.EXIT_USAGE
+        if not job_list:
+            sys.stderr.write("pixelize: nessun job (usa --type oppure --jobs)\n")
+            return PixelizeCLI.EXIT_USAGE
+
+        if not hasattr(bpy.types.Scene, "pixel_props"): importlib.import_module(__package__).register()  # add-on non abilitato
+        results: list[dict[str, Any]] = []
+        for job in job_list:
+            results.append(PixelizeCLI.run_job(job))
+            if PixelizeCLI.report_progress(results[-1]) and args.fail_fast: break
+
+        failed: bool = any(result["status"] != "ok" for result in results) or len(results) < len(job_list)
+        report: dict[str, Any] = {"status": "error" if failed else "ok", "jobs": results}
+        if args.report:
+            with open(args.report, "w") as file:
+                json.dump(report, file, indent = 2)
+        print(PixelizeCLI.summary(results))
+        print(PixelizeCLI.RESULT_PREFIX + json.dumps(report))
+        return PixelizeCLI.EXIT_FAILED if failed else PixelizeCLI.EXIT_OK
+
+    @staticmethod
+    def report_progress(result: dict[str, Any]) -> bool:
+        """
+        Il metodo stampa l'esito di un job appena concluso.
+
+        Returns:
+            - True se il job è fallito.
+        """
+
+        failed: bool = result["status"] != "ok"
+        print(f"pixelize: {result['type']} {'fallito: ' + result['error'] if failed else 'completato'} ({result['seconds']:.2f} s)")
+        sys.stdout.flush()
+        return failed
+
+    @staticmethod
+    def main() -> None:
+        """
+        Il metodo esegue la riga di comando con gli argomenti che seguono '--' ed esce con il codice dei job.
+        """
+
+        argv: list[str] = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+        sys.exit(PixelizeCLI.run(argv))
+
+
+if __name__ == "__main__":
+    PixelizeCLI.main()
@@ -7,4 +7,41 @@ EMISSION_MATERIAL: str = "OverrideEmission"
 DIFFUSE_BUFFER: str = "DiffuseBuffer"
 FREESTYLE_BUFFER: str = "FreeStyleBuffer"
 BORDER_BUFFER: str = "BorderBuffer"
+GBUFFER_BUFFER: str = "PixelizeGBuffer"
+SPRITE_BUFFER: str = "PixelizeSprite"
 CAMERA_MAPPING_GROUP: str = "CameraMapping"
+SESSION_BATCH: int = 8  # sprite dello stesso frame raggruppati dalla sessione di rendering (gli 8 angoli)
+LUT_CACHE_DIR: str = ".pixelize_cache"  # cartella (accanto al progetto) delle tabelle di quantizzazione delle palette
+FARM_MAX_WORKERS: int = 8  # processi della farm, ognuno con una copia della scena in memoria
+FARM_SHARD: int = 8  # sprite dello stesso frame assegnati insieme a un worker della farm
+FARM_BLEND_SUFFIX: str = ".farm.blend"  # copia del progetto aperta dai worker della farm
+FARM_COSTS_SUFFIX: str = ".costs.json"  # durate misurate dalla farm, usate per stimare i costi del job successivo
+SERVER_PORT: int = 47800  # porta locale predefinita del server di rendering
+SERVER_READY: str = "PIXELIZE_SERVER_READY"  # riga scritta dal server quando accetta connessioni
+QUEUE_BLEND: str = "project.blend"  # copia del progetto salvata nella coda condivisa
+QUEUE_POLL: float = 5.0  # secondi di attesa dei worker della coda quando gli sprite rimasti sono in corso altrove
+CACHE_DIR: str = "sprites"  # sottocartella di LUT_CACHE_DIR con la cache degli sprite
+PROFILE_DIR: str = "profiles"  # sottocartella di LUT_CACHE_DIR con i trace dei job (vedi core.profiling)
+CACHE_VERSION: str = "pixelize-cache-1"  # entra in ogni chiave: cambiarlo invalida la cache dopo modifiche al rendering
+JOURNAL_SUFFIX: str = ".journal.jsonl"  # journal degli sprite completati, accanto all'archivio di frame
+
+REGISTER_BUDGET_MS: float = 50.0  # oltre questo tempo (import + registrazione) l'add-on segnala un avvio lento
+
+VIEWER_NODE: str = "PixelizeViewer"
+VIEWER_IMAGE: str = "Viewer Node"
+
+GBUFFER_AOV: str = "pixelize_material"
+GBUFFER_LIGHT_NODE: str = "PixelizeGBufferLight"
+GBUFFER_PACK_NODE: str = "PixelizeGBufferPack"
+LIGHTING_SUFFIX: str = ".lighting.npz"  # dati di illuminazione salvati accanto agli sprite per la risoluzione differita delle palette
+
+# ... parametri passati agli shader come attributi degli oggetti (l'etichetta del nodo individua l'attributo) ...
+SHADER_PARAMS: dict[str, str] = {
+    "IsBorder": "pixelize_is_border",
+    "GBuffer": "pixelize_gbuffer",
+    "CameraScale": "pixelize_camera_scale",
+    "ResolutionX": "pixelize_resolution_x",
+    "ResolutionY": "pixelize_resolution_y",
+    "CameraResX": "pixelize_resolution_x",
+    "CameraResY": "pixelize_resolution_y",
+}
@@ -0,0 +1,13 @@
+"""
+Il pacchetto contiene il nucleo di Pixelize che non dipende da Blender (solo libreria standard e NumPy):
+- frames, spritesheet, atlas, pipeline: operazioni sulle immagini, centratura e disposizione delle spritesheet, anche durante il rendering;
+- sheet, indexed, imaging: scrittura e lettura di PNG e RAW, anche a colori indicizzati;
+- palette, outline, quantize: modello delle palette, risoluzione differita e quantizzazione;
+- profiling: misura dei tempi e della memoria dei job, con trace JSON e tabella riassuntiva.
+
+I moduli importano solo altri moduli del pacchetto, quindi si possono usare anche fuori da Blender
+(processi di lavoro, script di build, benchmark) aggiungendo la cartella dell'add-on a sys.path:
+
+    import sys; sys.path.insert(0, "<cartella dell'add-on>")
+    from core.spritesheet import SpritesheetUtils
+"""
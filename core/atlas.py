@@ -0,0 +1,205 @@
+"""
+Il modulo contiene il packer degli atlanti: i frame vengono ritagliati, deduplicati e impacchettati in una o più pagine
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Any, Optional
+import hashlib
+import json
+import numpy as np
+
+from . import frames
+
+
+@dataclass
+class AtlasFrame:
+    """
+    classe che descrive la posizione di un frame nell'atlante
+    """
+
+    index: int  # l'indice del frame nel job
+    page: int  # la pagina dell'atlante (-1 per i frame vuoti)
+    x: int  # posizione del ritaglio nella pagina
+    y: int
+    w: int  # dimensioni del ritaglio
+    h: int
+    offset_x: int  # posizione del ritaglio nel frame originale
+    offset_y: int
+    source_w: int  # dimensioni del frame originale
+    source_h: int
+    duplicate_of: Optional[int] = None  # il primo frame con lo stesso contenuto, che ne condivide il ritaglio
+
+
+class MaxRects:
+    """
+    La classe implementa il bin packing MaxRects (euristica Best Short Side Fit) per una singola pagina:
+    mantiene l'elenco dei rettangoli liberi massimali e vi colloca i rettangoli richiesti.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width: int = width
+        self.height: int = height
+        self.free: list[tuple[int, int, int, int]] = [(0, 0, width, height)]  # rettangoli liberi (x, y, w, h)
+        self.used_width: int = 0
+        self.used_height: int = 0
+
+    def find(self, w: int, h: int) -> Optional[tuple[int, int, int, int]]:
+        """
+        Il metodo cerca la posizione migliore per un rettangolo w x h.
+
+        Returns:
+            - (x, y, scarto corto, scarto lungo), oppure None se il rettangolo non entra nella pagina.
+        """
+
+        best: Optional[tuple[int, int, int, int]] = None
+        for fx, fy, fw, fh in self.free:
+            if w > fw or h > fh: continue
+            short, long = sorted((fw - w, fh - h))
+            if best is None or (short, long) < best[2:]: best = (fx, fy, short, long)
+        return best
+
+    def place(self, x: int, y: int, w: int, h: int) -> None:
+        """
+        Il metodo occupa il rettangolo indicato, dividendo i rettangoli liberi che lo intersecano.
+        """
+
+        split: list[tuple[int, int, int, int]] = []
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:  # nessuna intersezione
+                split.append((fx, fy, fw, fh))
+                continue
+
+            if x > fx: split.append((fx, fy, x - fx, fh))  # parte a sinistra
+            if x + w < fx + fw: split.append((x + w, fy, fx + fw - x - w, fh))  # parte a destra
+            if y > fy: split.append((fx, fy, fw, y - fy))  # parte sopra
+            if y + h < fy + fh: split.append((fx, y + h, fw, fy + fh - y - h))  # parte sotto
+
+        # ... rimuove i rettangoli contenuti in altri ...
+        self.free = [rect for i, rect in enumerate(split)
+                     if not any(j != i and MaxRects.contains(other, rect) and (other != rect or j < i) for j, other in enumerate(split))]
+        self.used_width = max(self.used_width, x + w)
+        self.used_height = max(self.used_height, y + h)
+
+    @staticmethod
+    def contains(outer: tuple[int, int, int, int], inner: tuple[int, int, int, int]) -> bool:
+        """
+        Il metodo verifica se inner è contenuto in outer.
+        """
+
+        return (outer[0] <= inner[0] and outer[1] <= inner[1]
+                and inner[0] + inner[2] <= outer[0] + outer[2] and inner[1] + inner[3] <= outer[1] + outer[3])
+
+
+class AtlasPacker:
+    """
+    La classe costruisce l'atlante di un job:
+    - ogni frame viene ritagliato al rettangolo dei pixel visibili, memorizzando la posizione originale;
+    - i frame con ritaglio identico byte per byte (riconosciuti tramite hash) vengono salvati una sola volta;
+    - i ritagli vengono impacchettati con MaxRects in pagine di lato massimo max_size, aggiungendo pagine quando serve.
+    """
+
+    CHUNK: int = 64  # frame elaborati insieme durante il ritaglio
+
+    def __init__(self, max_size: int = 2048, padding: int = 0):
+        """
+        Args:
+            - max_size: il lato massimo di una pagina.
+            - padding: i pixel trasparenti lasciati tra i ritagli.
+        """
+
+        self.max_size: int = max_size
+        self.padding: int = padding
+
+    def pack(self, source: np.ndarray, frame_size: Optional[int] = None) -> tuple[list[np.ndarray], list[AtlasFrame]]:
+        """
+        Il metodo impacchetta i frame.
+
+        Args:
+            - source: i frame RGBA uint8 di forma (N, altezza, larghezza, 4), anche mappati in memoria.
+            - frame_size: se indicato, i frame vengono prima ridimensionati a frame_size x frame_size.
+
+        Returns:
+            - le pagine dell'atlante, ritagliate all'area usata, e la descrizione di ogni frame.
+        """
+
+        entries: list[AtlasFrame] = []
+        crops: dict[int, np.ndarray] = {}  # ritagli unici, indicizzati con il primo frame che li contiene
+        hashes: dict[bytes, int] = {}
+
+        # ... ritaglio e deduplicazione, a blocchi di frame ...
+        for start in range(0, len(source), AtlasPacker.CHUNK):
+            stack: np.ndarray = np.asarray(source[start:start + AtlasPacker.CHUNK])
+            if frame_size is not None: stack = frames.FrameEngine.resize_nearest(stack, frame_size, frame_size)
+            height, width = stack.shape[1:3]
+
+            for offset, (frame, box) in enumerate(zip(stack, frames.FrameEngine.bboxes(stack))):
+                idx: int = start + offset
+                min_y, min_x, max_y, max_x = (int(value) for value in box)
+                if min_y < 0:  # frame vuoto
+                    entries.append(AtlasFrame(idx, -1, 0, 0, 0, 0, 0, 0, width, height))
+                    continue
+
+                crop: np.ndarray = np.ascontiguousarray(frame[min_y:max_y, min_x:max_x])
+                if crop.shape[0] + self.padding > self.max_size or crop.shape[1] + self.padding > self.max_size:
+                    raise ValueError(f"il frame {idx} ({crop.shape[1]}x{crop.shape[0]}) non entra in una pagina di {self.max_size} pixel")
+
+                digest: bytes = hashlib.blake2b(crop.tobytes(), digest_size = 16, person = b"%dx%d" % crop.shape[:2]).digest()
+                duplicate: Optional[int] = hashes.setdefault(digest, idx)
+                entries.append(AtlasFrame(idx, -1, 0, 0, max_x - min_x, max_y - min_y, min_x, min_y, width, height,
+                                          duplicate if duplicate != idx else None))
+                if duplicate == idx: crops[idx] = crop
+
+        # ... impacchettamento: prima i ritagli più grandi ...
+        bins: list[MaxRects] = []
+        placement: dict[int, tuple[int, int, int]] = {}  # frame -> (pagina, x, y)
+        for idx in sorted(crops, key = lambda key: (-max(crops[key].shape[:2]), -crops[key].shape[0] * crops[key].shape[1])):
+            h, w = crops[idx].shape[:2]
+            pw, ph = w + self.padding, h + self.padding
+            for page, bin_ in enumerate(bins):
+                found: Optional[tuple[int, int, int, int]] = bin_.find(pw, ph)
+                if found is not None: break
+            else:
+                bins.append(MaxRects(self.max_size, self.max_size))
+                page, bin_ = len(bins) - 1, bins[-1]
+                found = bin_.find(pw, ph)
+
+            bin_.place(found[0], found[1], pw, ph)
+            placement[idx] = (page, found[0], found[1])
+
+        pages: list[np.ndarray] = [np.zeros((max(1, bin_.used_height), max(1, bin_.used_width), 4), dtype = np.uint8) for bin_ in bins]
+        for idx, (page, x, y) in placement.items():
+            h, w = crops[idx].shape[:2]
+            pages[page][y:y + h, x:x + w] = crops[idx]
+
+        for entry in entries:
+            owner: Optional[int] = entry.duplicate_of if entry.duplicate_of is not None else (entry.index if entry.index in placement else None)
+            if owner is not None: entry.page, entry.x, entry.y = placement[owner]
+
+        return pages, entries
+
+    @staticmethod
+    def index(entries: list[AtlasFrame], pages: list[np.ndarray], page_files: list[str], meta: Optional[list[dict[str, Any]]] = None) -> dict[str, Any]:
+        """
+        Il metodo costruisce l'indice JSON dell'atlante, con i metadati del job (frame, angolo, ...) per ogni frame.
+        """
+
+        frames_index: list[dict[str, Any]] = []
+        for entry in entries:
+            item: dict[str, Any] = asdict(entry)
+            if meta is not None and entry.index < len(meta): item.update(meta[entry.index])
+            frames_index.append(item)
+
+        return {
+            "pages": [{"file": name, "width": page.shape[1], "height": page.shape[0]} for name, page in zip(page_files, pages)],
+            "frames": frames_index,
+            "unique": sum(1 for entry in entries if entry.page >= 0 and entry.duplicate_of is None),
+        }
+
+    @staticmethod
+    def write_index(path: str, index: dict[str, Any]) -> None:
+        """
+        Il metodo salva l'indice JSON.
+        """
+
+        with open(path, "w") as file:
+            json.dump(index, file, indent = 2)
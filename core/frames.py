@@ -0,0 +1,173 @@
+"""
+Il modulo contiene il post processing vettoriale dei frame: bounding box, centratura, ridimensionamento e composizione della spritesheet
+"""
+
+from typing import Any, Optional
+import numpy as np
+
+
+class FrameEngine:
+    """
+    La classe elabora pile di frame RGBA di forma (N, altezza, larghezza, 4) con operazioni vettoriali NumPy.
+    I frame hanno le righe dall'alto verso il basso, come le immagini lette da file.
+    """
+
+    EMPTY: tuple[int, int, int, int] = (-1, -1, -1, -1)  # bounding box di un frame senza pixel visibili
+
+    @staticmethod
+    def bboxes(frames: np.ndarray) -> np.ndarray:
+        """
+        Il metodo calcola il rettangolo che contiene i pixel visibili (alpha > 0) di ogni frame.
+
+        Returns:
+            - un array (N, 4) con (min_y, min_x, max_y + 1, max_x + 1), oppure EMPTY per i frame vuoti.
+        """
+
+        visible: np.ndarray = frames[..., 3] > 0
+        rows: np.ndarray = visible.any(axis = 2)  # (N, altezza)
+        cols: np.ndarray = visible.any(axis = 1)  # (N, larghezza)
+        height, width = visible.shape[1:]
+
+        boxes: np.ndarray = np.stack((
+            rows.argmax(axis = 1),
+            cols.argmax(axis = 1),
+            height - rows[:, ::-1].argmax(axis = 1),
+            width - cols[:, ::-1].argmax(axis = 1),
+        ), axis = 1)
+        boxes[~rows.any(axis = 1)] = FrameEngine.EMPTY
+        return boxes
+
+    @staticmethod
+    def union_bbox(boxes: np.ndarray) -> np.ndarray:
+        """
+        Il metodo restituisce il rettangolo che contiene tutti i rettangoli non vuoti (EMPTY se sono tutti vuoti).
+        """
+
+        valid: np.ndarray = boxes[boxes[:, 0] >= 0]
+        if len(valid) == 0: return np.array(FrameEngine.EMPTY)
+        return np.concatenate((valid[:, :2].min(axis = 0), valid[:, 2:].max(axis = 0)))
+
+    @staticmethod
+    def resize_nearest(frames: np.ndarray, height: int, width: int) -> np.ndarray:
+        """
+        Il metodo ridimensiona i frame con il campionamento al pixel più vicino (come Image.NEAREST).
+        """
+
+        src_height, src_width = frames.shape[1:3]
+        if (src_height, src_width) == (height, width): return frames
+
+        ys: np.ndarray = ((np.arange(height) + 0.5) * src_height / height).astype(np.intp)
+        xs: np.ndarray = ((np.arange(width) + 0.5) * src_width / width).astype(np.intp)
+        return frames[:, ys[:, None], xs[None, :]]
+
+    @staticmethod
+    def offsets(boxes: np.ndarray, height: int, width: int) -> np.ndarray:
+        """
+        Il metodo calcola lo spostamento (dy, dx) che porta ogni rettangolo al centro del frame; i frame vuoti non si spostano.
+        """
+
+        sizes: np.ndarray = boxes[:, 2:] - boxes[:, :2]
+        shift: np.ndarray = np.array([height // 2, width // 2]) - sizes // 2 - boxes[:, :2]
+        shift[boxes[:, 0] < 0] = 0
+        return shift
+
+    @staticmethod
+    def translate(frames: np.ndarray, shift: np.ndarray) -> np.ndarray:
+        """
+        Il metodo sposta ogni frame di (dy, dx) pixel, riempiendo con pixel trasparenti.
+        """
+
+        count, height, width = frames.shape[:3]
+        ys: np.ndarray = np.arange(height)[None, :] - shift[:, 0, None]  # (N, altezza) righe di origine
+        xs: np.ndarray = np.arange(width)[None, :] - shift[:, 1, None]  # (N, larghezza) colonne di origine
+        valid: np.ndarray = ((ys >= 0) & (ys < height))[:, :, None] & ((xs >= 0) & (xs < width))[:, None, :]
+
+        moved: np.ndarray = frames[np.arange(count)[:, None, None], np.clip(ys, 0, height - 1)[:, :, None], np.clip(xs, 0, width - 1)[:, None, :]]
+        moved[~valid] = 0
+        return moved
+
+    @staticmethod
+    def center(frames: np.ndarray, anchor: bool = False, box: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Il metodo centra il contenuto visibile dei frame.
+
+        Args:
+            - frames: i frame da centrare.
+            - anchor: se True tutti i frame vengono spostati della stessa quantità, calcolata sull'unione dei rettangoli,
+              così gli sprite di un'animazione non tremolano.
+            - box: il rettangolo comune già calcolato (ad esempio su tutta l'animazione), usato al posto di quelli dei frame.
+        """
+
+        height, width = frames.shape[1:3]
+        boxes: np.ndarray = FrameEngine.bboxes(frames) if box is None else np.broadcast_to(box, (len(frames), 4))
+        if anchor and box is None: boxes = np.broadcast_to(FrameEngine.union_bbox(boxes), boxes.shape)
+        return FrameEngine.translate(frames, FrameEngine.offsets(boxes, height, width))
+
+    @staticmethod
+    def sheet(frames: np.ndarray, rows: int, cols: int) -> np.ndarray:
+        """
+        Il metodo dispone i frame nella spritesheet per colonne: il frame idx va nella colonna idx // rows e nella riga idx % rows.
+        """
+
+        count, height, width, channels = frames.shape
+        if count < rows * cols:  # le celle mancanti restano trasparenti
+            frames = np.concatenate((frames, np.zeros((rows * cols - count, height, width, channels), dtype = frames.dtype)))
+
+        grid: np.ndarray = frames[:rows * cols].reshape(cols, rows, height, width, channels)
+        return grid.transpose(1, 2, 0, 3, 4).reshape(rows * height, cols * width, channels)
+
+    @staticmethod
+    def process(frames: np.ndarray, rows: int, cols: int, frame_size: Optional[int] = None, center: bool = False, anchor: bool = False) -> np.ndarray:
+        """
+        Il metodo esegue l'intero post processing: ridimensionamento, centratura e composizione della spritesheet.
+        """
+
+        if frame_size is not None: frames = FrameEngine.resize_nearest(frames, frame_size, frame_size)
+        if center: frames = FrameEngine.center(frames, anchor)
+        return FrameEngine.sheet(frames, rows, cols)
+
+    @staticmethod
+    def stream(frames: np.ndarray, rows: int, cols: int, writer: Any, frame_size: Optional[int] = None, center: bool = False,
+               anchor: bool = False) -> None:
+        """
+        Il metodo esegue il post processing fascia per fascia e consegna ogni riga della griglia al writer (vedi sheet.SheetWriter),
+        così la memoria occupata è quella di una sola fascia anche per spritesheet enormi.
+        I frame possono essere un array mappato in memoria: vengono letti solo quelli della fascia corrente.
+        """
+
+        box: Optional[np.ndarray] = FrameEngine.anchor_box(frames, rows, cols, frame_size) if center and anchor else None
+        for row in range(rows): writer.write(FrameEngine.band(frames, rows, cols, row, frame_size, center, box))
+
+    @staticmethod
+    def cells(frames: np.ndarray, rows: int, cols: int, row: int, frame_size: Optional[int] = None) -> np.ndarray:
+        """
+        Il metodo restituisce i frame della riga row della griglia, ridimensionati; vengono letti solo quelli della riga.
+        """
+
+        indices: list[int] = [col * rows + row for col in range(cols)]
+        stack: np.ndarray = np.asarray(frames[[idx for idx in indices if idx < len(frames)]])
+        if frame_size is not None: stack = FrameEngine.resize_nearest(stack, frame_size, frame_size)
+        return stack
+
+    @staticmethod
+    def anchor_box(frames: np.ndarray, rows: int, cols: int, frame_size: Optional[int] = None) -> np.ndarray:
+        """
+        Il metodo calcola, una riga della griglia alla volta, l'unione dei rettangoli di tutti i frame (la centratura comune).
+        """
+
+        return FrameEngine.union_bbox(np.concatenate([FrameEngine.bboxes(FrameEngine.cells(frames, rows, cols, row, frame_size))
+                                                      for row in range(rows)]))
+
+    @staticmethod
+    def band(frames: np.ndarray, rows: int, cols: int, row: int, frame_size: Optional[int] = None, center: bool = False,
+             box: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Il metodo compone la fascia della riga row della spritesheet, di forma (frame_size, cols * frame_size, 4).
+
+        Args:
+            - box: il rettangolo comune della centratura (vedi anchor_box), oppure None per centrare ogni frame sul proprio contenuto.
+        """
+
+        stack: np.ndarray = FrameEngine.cells(frames, rows, cols, row, frame_size)
+        if center: stack = FrameEngine.center(stack, box = box)
+        return FrameEngine.sheet(stack, 1, cols)
@@ -0,0 +1,198 @@
+"""
+Il modulo legge le immagini salvate con il primo backend disponibile, scelto al primo utilizzo e senza installare nulla
+"""
+
+from typing import Any, Optional
+import importlib.util
+import os
+import struct
+import zlib
+import numpy as np
+
+
+class PngDecoder:
+    """
+    La classe decodifica i PNG non interlacciati (scala di grigi, RGB, palette, con o senza alpha, 8 o 16 bit) con zlib e NumPy.
+    I filtri None, Sub e Up sono vettoriali; Average e Paeth, che dipendono dal pixel a sinistra, vengono calcolati byte per byte.
+    """
+
+    CHANNELS: dict[int, int] = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # tipo di colore -> canali
+    SIGNATURE: bytes = b"\x89PNG\r\n\x1a\n"
+
+    @staticmethod
+    def is_png(path: str) -> bool:
+        """
+        Il metodo controlla la firma del file.
+        """
+
+        with open(path, "rb") as file:
+            return file.read(8) == PngDecoder.SIGNATURE
+
+    @staticmethod
+    def read(path: str) -> np.ndarray:
+        """
+        Il metodo legge un PNG in un array RGBA uint8 di forma (altezza, larghezza, 4).
+        """
+
+        with open(path, "rb") as file:
+            data: bytes = file.read()
+        if data[:8] != PngDecoder.SIGNATURE: raise ValueError(f"'{path}' non è un PNG")
+
+        chunks: dict[bytes, bytes] = {}
+        compressed: list[bytes] = []
+        offset: int = 8
+        while offset < len(data):
+            length, tag = struct.unpack(">I4s", data[offset:offset + 8])
+            body: bytes = data[offset + 8:offset + 8 + length]
+            if tag == b"IDAT": compressed.append(body)
+            else: chunks.setdefault(tag, body)
+            offset += length + 12
+
+        width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", chunks[b"IHDR"])
+        if interlace or depth not in (8, 16) or color not in PngDecoder.CHANNELS:
+            raise ValueError(f"PNG non supportato: profondità {depth}, colore {color}, interlacciato {interlace}")
+
+        channels: int = PngDecoder.CHANNELS[color]
+        bpp: int = channels * depth // 8
+        raw: np.ndarray = np.frombuffer(zlib.decompress(b"".join(compressed)), dtype = np.uint8).reshape(height, width * bpp + 1)
+        samples: np.ndarray = PngDecoder.unfilter(raw, bpp)
+        if depth == 16: samples = samples[:, 0::2]  # byte più significativo
+        samples = samples.reshape(height, width, channels)
+
+        if color == 3:
+            palette: np.ndarray = np.frombuffer(chunks[b"PLTE"], dtype = np.uint8).reshape(-1, 3)
+            alpha: np.ndarray = np.full(256, 255, dtype = np.uint8)
+            transparency: bytes = chunks.get(b"tRNS", b"")
+            alpha[:len(transparency)] = np.frombuffer(transparency, dtype = np.uint8)
+            table: np.ndarray = np.zeros((256, 4), dtype = np.uint8)
+            table[:len(palette), :3] = palette
+            table[:, 3] = alpha
+            return table[samples[..., 0]]
+
+        rgba: np.ndarray = np.empty((height, width, 4), dtype = np.uint8)
+        rgba[..., :3] = samples[..., :1] if channels < 3 else samples[..., :3]
+        rgba[..., 3] = samples[..., -1] if channels in (2, 4) else 255
+        return rgba
+
+    @staticmethod
+    def unfilter(raw: np.ndarray, bpp: int) -> np.ndarray:
+        """
+        Il metodo annulla i filtri delle righe (il primo byte di ogni riga indica il filtro).
+        """
+
+        rows: np.ndarray = raw[:, 1:].copy()
+        previous: np.ndarray = np.zeros(rows.shape[1], dtype = np.uint8)
+        for y, kind in enumerate(raw[:, 0]):
+            line: np.ndarray = rows[y]
+            if kind == 1: line[:] = np.cumsum(line.reshape(-1, bpp), axis = 0, dtype = np.uint8).ravel()  # somma modulo 256
+            elif kind == 2: line += previous
+            elif kind in (3, 4): line[:] = PngDecoder.unfilter_line(line.tobytes(), previous.tobytes(), bpp, kind)
+            elif kind != 0: raise ValueError(f"filtro PNG {kind} non valido")
+            previous = line
+        return rows
+
+    @staticmethod
+    def unfilter_line(line: bytes, previous: bytes, bpp: int, kind: int) -> np.ndarray:
+        """
+        Il metodo annulla i filtri Average (3) e Paeth (4) di una riga.
+        """
+
+        out: bytearray = bytearray(line)
+        for i in range(len(out)):
+            left: int = out[i - bpp] if i >= bpp else 0
+            up: int = previous[i]
+            if kind == 3:
+                out[i] = (out[i] + ((left + up) >> 1)) & 0xFF
+                continue
+            corner: int = previous[i - bpp] if i >= bpp else 0
+            estimate: int = left + up - corner
+            da, db, dc = abs(estimate - left), abs(estimate - up), abs(estimate - corner)
+            predictor: int = left if da <= db and da <= dc else (up if db <= dc else corner)
+            out[i] = (out[i] + predictor) & 0xFF
+        return np.frombuffer(bytes(out), dtype = np.uint8)
+
+
+class ImagingUtils:
+    """
+    La classe raccoglie la lettura delle immagini, con il backend scelto al primo utilizzo:
+    - PIL: Pillow, se già installato (non viene mai installato dall'add-on);
+    - NUMPY: il decoder PNG interno (vedi PngDecoder), sempre disponibile e usato per i PNG quando Pillow manca;
+    - BLENDER: le API delle immagini di Blender (solo dal thread principale, dentro Blender), solo per i formati diversi dal PNG.
+    Il decoder interno viene preferito a Blender perché legge i valori del file così come sono: Blender converte
+    i PNG a 16 bit in float lineari con alpha premoltiplicato (vedi load_blender).
+    La variabile d'ambiente ENVIRONMENT forza un backend.
+    """
+
+    BACKENDS: tuple[str, ...] = ("PIL", "NUMPY", "BLENDER")
+    ENVIRONMENT: str = "PIXELIZE_IMAGING"
+    _backend: Optional[str] = None
+
+    @staticmethod
+    def detect() -> str:
+        """
+        Il metodo sceglie il backend controllando solo i moduli installati (nessun accesso alla rete, nessun import).
+        """
+
+        forced: str = os.environ.get(ImagingUtils.ENVIRONMENT, "").upper()
+        if forced in ImagingUtils.BACKENDS: return forced
+        if importlib.util.find_spec("PIL") is not None: return "PIL"
+        return "NUMPY"
+
+    @staticmethod
+    def backend() -> str:
+        """
+        Il backend in uso, scelto alla prima chiamata.
+        """
+
+        if ImagingUtils._backend is None: ImagingUtils._backend = ImagingUtils.detect()
+        return ImagingUtils._backend
+
+    @staticmethod
+    def load(path: str) -> np.ndarray:
+        """
+        Il metodo legge un'immagine in un array RGBA uint8 di forma (altezza, larghezza, 4), con le righe dall'alto verso il basso.
+        """
+
+        backend: str = ImagingUtils.backend()
+        if backend == "PIL":
+            from PIL import Image  # caricato solo al primo utilizzo
+            with Image.open(path) as img:
+                return np.asarray(img.convert("RGBA"))
+        if backend == "BLENDER" or not PngDecoder.is_png(path): return ImagingUtils.load_blender(path)
+        return PngDecoder.read(path)
+
+    @staticmethod
+    def load_blender(path: str) -> np.ndarray:
+        """
+        Il metodo legge un'immagine con le API di Blender; l'immagine caricata viene rimossa subito dopo.
+        Blender carica i file a più di 8 bit (is_float) come float lineari con alpha premoltiplicato: lo spazio colore
+        'Non-Color' e l'alpha 'CHANNEL_PACKED' lasciano i valori del file invariati, come per le immagini a 8 bit.
+        """
+
+        import bpy
+        image = bpy.data.images.load(path, check_existing = False)
+        try:
+            image.colorspace_settings.name = "Non-Color"  # nessuna conversione da sRGB a lineare
+            image.alpha_mode = "CHANNEL_PACKED"  # colore e alpha indipendenti: nessuna premoltiplicazione
+            width, height = image.size
+            channels: int = image.channels
+            pixels: np.ndarray = np.empty(width * height * channels, dtype = np.float32)
+            image.pixels.foreach_get(pixels)  # valori del file normalizzati tra 0 e 1, righe dal basso verso l'alto
+        finally:
+            bpy.data.images.remove(image)
+
+        samples: np.ndarray = np.rint(np.clip(pixels.reshape(height, width, channels)[::-1], 0, 1) * 255).astype(np.uint8)
+        rgba: np.ndarray = np.empty((height, width, 4), dtype = np.uint8)
+        rgba[..., :3] = samples[..., :1] if channels < 3 else samples[..., :3]
+        rgba[..., 3] = samples[..., -1] if channels in (2, 4) else 255
+        return rgba
+
+    @staticmethod
+    def like(image: Any, pixels: np.ndarray) -> Any:
+        """
+        Il metodo restituisce i pixel RGBA nello stesso tipo di image: un'immagine Pillow oppure un array.
+        """
+
+        if isinstance(image, np.ndarray): return pixels
+        from PIL import Image
+        return Image.fromarray(pixels, "RGBA")
@@ -0,0 +1,139 @@
+"""
+Il modulo contiene la conversione degli sprite in immagini a colori indicizzati (PNG in modalità palette)
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Optional
+import numpy as np
+
+from . import sheet
+
+
+@dataclass
+class IndexedPalette:
+    """
+    classe che contiene i colori di uscita di una palette pixelize: l'indice 0 è il colore trasparente,
+    seguito dai colori dei gradienti e dei bordi di ogni materiale (senza ripetizioni).
+    """
+
+    colors: np.ndarray  # (K, 3) colori sRGB uint8, K <= 256
+    alpha: np.ndarray  # (K,) opacità (0 per la trasparenza, 255 per gli altri)
+
+    TRANSPARENT: ClassVar[int] = 0  # l'indice del colore trasparente
+
+    @staticmethod
+    def hex_to_rgb(hex_color: str) -> tuple[int, int, int]:
+        """
+        Il metodo converte un colore esadecimale nei suoi tre canali uint8.
+        """
+
+        hex_color = hex_color.lstrip("#")
+        return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+
+    @staticmethod
+    def from_palette(palette: dict[str, dict[str, Any]]) -> "IndexedPalette":
+        """
+        Il metodo raccoglie i colori di una palette nel formato di ImportColorPalette.
+        I colori chiaro e scuro della scacchiera non compaiono negli sprite (spostano solo il livello della color ramp).
+        """
+
+        colors: list[tuple[int, int, int]] = []
+        for entry in palette.values():
+            hexes: list[str] = [color for _, color in sorted((float(level), color) for level, color in entry["gradients"].items())]
+            for rgb in map(IndexedPalette.hex_to_rgb, hexes + [entry["border"]]):
+                if rgb not in colors: colors.append(rgb)
+
+        if len(colors) > 255: raise ValueError(f"la palette ha {len(colors)} colori, al massimo 255 oltre alla trasparenza")
+        return IndexedPalette(
+            colors = np.array([(0, 0, 0)] + colors, dtype = np.uint8).reshape(-1, 3),
+            alpha = np.array([0] + [255] * len(colors), dtype = np.uint8),
+        )
+
+
+@dataclass
+class IndexedEncoder:
+    """
+    La classe converte pixel RGBA uint8 negli indici della palette con operazioni vettoriali:
+    - i pixel con alpha sotto alpha_threshold diventano trasparenti;
+    - i colori della palette (a meno di tolerance per canale, per gli arrotondamenti della conversione sRGB) vengono indicizzati;
+    - gli altri colori vengono associati al colore più vicino e segnalati in unknown.
+    """
+
+    palette: IndexedPalette
+    tolerance: int = 1
+    alpha_threshold: int = 128
+    unknown: dict[tuple[int, int, int], int] = field(default_factory = dict)  # colori estranei alla palette e numero di pixel
+
+    def encode(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        Il metodo restituisce gli indici uint8 dei pixel RGBA di forma (..., 4).
+        """
+
+        opaque: np.ndarray = pixels[..., 3] >= self.alpha_threshold
+        rgb: np.ndarray = pixels[..., :3][opaque].astype(np.int32)
+        keys: np.ndarray = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+        unique, inverse, counts = np.unique(keys, return_inverse = True, return_counts = True)
+
+        # ... i confronti riguardano solo i colori distinti, pochi in uno sprite pixelize ...
+        unique_rgb: np.ndarray = np.stack(((unique >> 16) & 255, (unique >> 8) & 255, unique & 255), axis = -1)
+        distance: np.ndarray = np.abs(unique_rgb[:, None, :] - self.palette.colors[None, 1:, :].astype(np.int32))  # (U, K - 1, 3)
+        nearest: np.ndarray = distance.sum(axis = -1).argmin(axis = -1)
+        outside: np.ndarray = distance[np.arange(len(unique)), nearest].max(axis = -1) > self.tolerance
+
+        for color, count in zip(map(tuple, unique_rgb[outside].tolist()), counts[outside].tolist()):
+            self.unknown[color] = self.unknown.get(color, 0) + count
+
+        indices: np.ndarray = np.full(pixels.shape[:-1], IndexedPalette.TRANSPARENT, dtype = np.uint8)
+        indices[opaque] = (nearest + 1)[inverse.reshape(-1)]
+        return indices
+
+    def report(self, limit: int = 8) -> str:
+        """
+        Il metodo descrive i colori estranei alla palette, dal più frequente.
+        """
+
+        if not self.unknown: return ""
+        colors: list[tuple[tuple[int, int, int], int]] = sorted(self.unknown.items(), key = lambda item: -item[1])
+        listed: str = ", ".join(f"#{r:02x}{g:02x}{b:02x} ({count} px)" for (r, g, b), count in colors[:limit])
+        return f"{len(colors)} colori fuori palette: {listed}" + (", ..." if len(colors) > limit else "")
+
+
+class IndexedWriter:
+    """
+    La classe adatta sheet.SheetWriter ai colori indicizzati: riceve fasce RGBA e scrive un PNG in modalità palette.
+    """
+
+    def __init__(self, path: str, width: int, height: int, encoder: IndexedEncoder, compression: int = 6, band_rows: Optional[int] = None):
+        self.encoder: IndexedEncoder = encoder
+        self.writer: sheet.SheetWriter = sheet.SheetWriter(path, width, height, "INDEXED", compression,
+                                                           palette = encoder.palette.colors, alpha = encoder.palette.alpha, band_rows = band_rows)
+
+    def __enter__(self) -> "IndexedWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.writer.__exit__(*args)
+
+    def write(self, rows: np.ndarray) -> None:
+        """
+        Il metodo converte e scrive la fascia RGBA successiva, di forma (n, width, 4).
+        """
+
+        self.writer.write(self.encoder.encode(rows))
+
+    def close(self) -> None:
+        """
+        Il metodo completa il file.
+        """
+
+        self.writer.close()
+
+
+def open_writer(path: str, width: int, height: int, encoder: Optional[IndexedEncoder] = None, band_rows: Optional[int] = None):
+    """
+    Restituisce il writer adatto al percorso: indicizzato se è presente l'encoder (solo per i PNG), altrimenti PNG o RAW in base all'estensione.
+    Con band_rows i PNG vengono scritti a fasce indipendenti, aggiornabili con sheet.SheetPatcher.
+    """
+
+    if encoder is not None and sheet.SheetWriter.format_for(path) == "PNG": return IndexedWriter(path, width, height, encoder, band_rows = band_rows)
+    return sheet.SheetWriter(path, width, height, sheet.SheetWriter.format_for(path), band_rows = band_rows)
@@ -0,0 +1,171 @@
+"""
+Il modulo contiene il motore dei contorni in spazio immagine, che sostituisce i rendering di Freestyle e del bordo
+"""
+
+from dataclasses import dataclass
+import math
+import numpy as np
+
+
+@dataclass
+class OutlineSettings:
+    """
+    classe che raccoglie i parametri dei contorni
+    """
+
+    inside: int = 1  # spessore in pixel del contorno all'interno della sagoma
+    outside: int = 0  # spessore in pixel del contorno all'esterno della sagoma
+    depth_step: float = 4.0  # salto di profondità (in pixel della camera) che genera un contorno
+    crease_angle: float = 134.43  # angolo diedro (in gradi) sotto il quale si traccia una piega, come in Freestyle
+    material_boundaries: bool = False  # traccia il contorno anche tra materiali diversi
+
+
+class OutlineEngine:
+    """
+    La classe ricava i contorni da alpha, profondità e indice del materiale con operazioni vettoriali NumPy.
+    Le immagini hanno forma (altezza, larghezza); le normali, quando non disponibili, vengono ricostruite dalla profondità.
+    """
+
+    NEIGHBOURS: tuple[tuple[int, int], ...] = ((-1, 0), (1, 0), (0, -1), (0, 1))  # i quattro vicini
+
+    @staticmethod
+    def shift(array: np.ndarray, dy: int, dx: int, fill) -> np.ndarray:
+        """
+        Il metodo restituisce l'array traslato di (dy, dx), riempiendo i bordi con fill:
+        il risultato in (y, x) contiene il valore di array in (y + dy, x + dx).
+        """
+
+        height, width = array.shape[:2]
+        result: np.ndarray = np.full_like(array, fill)
+        ys, yd = (slice(dy, height), slice(0, height - dy)) if dy >= 0 else (slice(0, height + dy), slice(-dy, height))
+        xs, xd = (slice(dx, width), slice(0, width - dx)) if dx >= 0 else (slice(0, width + dx), slice(-dx, width))
+        result[yd, xd] = array[ys, xs]
+        return result
+
+    @staticmethod
+    def dilate(mask: np.ndarray, radius: int, ids: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Il metodo espande la maschera di radius pixel (vicinato a 4), propagando facoltativamente gli indici.
+
+        Returns:
+            - la maschera espansa e gli indici propagati (o None).
+        """
+
+        mask = mask.copy()
+        if ids is not None: ids = np.where(mask, ids, 0)
+
+        for _ in range(radius):
+            grown: np.ndarray = mask.copy()
+            for dy, dx in OutlineEngine.NEIGHBOURS:
+                neighbour: np.ndarray = OutlineEngine.shift(mask, dy, dx, False)
+                new: np.ndarray = neighbour & ~grown
+                if ids is not None: ids = np.where(new, OutlineEngine.shift(ids, dy, dx, 0), ids)
+                grown |= neighbour
+            mask = grown
+
+        return mask, ids
+
+    @staticmethod
+    def derivative(depth: np.ndarray, dy: int, dx: int, depth_step: float) -> np.ndarray:
+        """
+        Il metodo calcola la derivata della profondità lungo (dy, dx), usando solo i vicini sulla stessa superficie.
+        Tra le due differenze (in avanti e all'indietro) viene scelta la minore, così la derivata non attraversa le pieghe.
+        """
+
+        with np.errstate(invalid = "ignore"):  # i valori nan indicano lo sfondo
+            forward: np.ndarray = OutlineEngine.shift(depth, dy, dx, np.nan) - depth
+            backward: np.ndarray = depth - OutlineEngine.shift(depth, -dy, -dx, np.nan)
+            forward = np.where(np.abs(forward) <= depth_step, forward, np.inf)
+            backward = np.where(np.abs(backward) <= depth_step, backward, np.inf)
+
+        derivative: np.ndarray = np.where(np.abs(forward) <= np.abs(backward), forward, backward)
+        return np.where(np.isfinite(derivative), derivative, 0)
+
+    @staticmethod
+    def normals_from_depth(depth: np.ndarray, inside: np.ndarray, pixel_size: float, depth_step: float) -> np.ndarray:
+        """
+        Il metodo ricostruisce le normali in spazio camera dalle derivate della profondità (camera ortografica).
+        """
+
+        surface: np.ndarray = np.where(inside, depth, np.nan).astype(np.float32)
+        dz_dx: np.ndarray = OutlineEngine.derivative(surface, 0, 1, depth_step) / pixel_size
+        dz_dy: np.ndarray = OutlineEngine.derivative(surface, 1, 0, depth_step) / pixel_size
+        normals: np.ndarray = np.stack((-dz_dx, -dz_dy, np.ones_like(surface)), axis = -1)
+        normals /= np.linalg.norm(normals, axis = -1, keepdims = True)
+        return normals
+
+    @staticmethod
+    def edges(alpha: np.ndarray, depth: np.ndarray, ids: np.ndarray, pixel_size: float, settings: OutlineSettings,
+              normals: np.ndarray = None) -> np.ndarray:
+        """
+        Il metodo individua i pixel di partenza dei contorni: sagoma, salti di profondità, pieghe ed eventualmente cambi di materiale.
+        """
+
+        inside: np.ndarray = alpha > 0
+        far_depth: np.ndarray = np.where(inside, depth, np.inf)
+        depth_step: float = settings.depth_step * pixel_size
+        if normals is None: normals = OutlineEngine.normals_from_depth(depth, inside, pixel_size, depth_step)
+        crease_cos: float = math.cos(math.radians(180.0 - settings.crease_angle))  # deviazione massima tra le normali
+
+        mask: np.ndarray = np.zeros_like(inside)
+        for dy, dx in OutlineEngine.NEIGHBOURS:
+            neighbour_inside: np.ndarray = OutlineEngine.shift(inside, dy, dx, False)
+            neighbour_depth: np.ndarray = OutlineEngine.shift(far_depth, dy, dx, np.inf)
+            with np.errstate(invalid = "ignore"):  # inf - inf sullo sfondo
+                farther: np.ndarray = neighbour_depth - far_depth > depth_step
+                continuous: np.ndarray = neighbour_inside & (np.abs(neighbour_depth - far_depth) <= depth_step)
+
+            mask |= ~neighbour_inside  # sagoma
+            mask |= farther  # il vicino è una superficie più lontana
+
+            cosine: np.ndarray = (normals * OutlineEngine.shift(normals, dy, dx, 0)).sum(axis = -1)
+            mask |= continuous & (cosine < crease_cos)  # piega
+
+            if settings.material_boundaries:
+                mask |= neighbour_inside & (OutlineEngine.shift(ids, dy, dx, 0) != ids)
+
+        return mask & inside
+
+    @staticmethod
+    def outline(alpha: np.ndarray, depth: np.ndarray, ids: np.ndarray, pixel_size: float, settings: OutlineSettings,
+                normals: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Il metodo calcola i pixel dei contorni con gli spessori richiesti.
+
+        Returns:
+            - la maschera dei contorni e, per ogni pixel, l'indice del materiale di cui usare il colore del bordo.
+        """
+
+        inside: np.ndarray = alpha > 0
+        mask: np.ndarray = np.zeros_like(inside)
+        line_ids: np.ndarray = np.zeros_like(ids)
+
+        if settings.inside > 0:
+            seeds: np.ndarray = OutlineEngine.edges(alpha, depth, ids, pixel_size, settings, normals)
+            inner, _ = OutlineEngine.dilate(seeds, settings.inside - 1)
+            mask |= inner & inside
+            line_ids = np.where(mask, ids, line_ids)
+
+        if settings.outside > 0:
+            outer, outer_ids = OutlineEngine.dilate(inside, settings.outside, ids)
+            outer &= ~inside
+            mask |= outer
+            line_ids = np.where(outer, outer_ids, line_ids)
+
+        return mask, line_ids
+
+    @staticmethod
+    def apply(sprite: np.ndarray, mask: np.ndarray, line_ids: np.ndarray, border: np.ndarray) -> np.ndarray:
+        """
+        Il metodo colora i contorni dello sprite RGBA con il colore del bordo dei materiali.
+
+        Args:
+            - sprite: lo sprite di forma (altezza, larghezza, 4), modificato sul posto.
+            - mask: la maschera dei contorni.
+            - line_ids: gli indici dei materiali dei contorni.
+            - border: i colori del bordo indicizzati per materiale, di forma (M, 3).
+        """
+
+        sprite[mask, :3] = border[line_ids[mask]]
+        sprite[mask, 3] = 1.0
+        return sprite
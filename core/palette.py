@@ -0,0 +1,278 @@
+"""
+Il modulo gestisce la risoluzione differita delle palette: gli sprite vengono ricolorati dai dati di illuminazione salvati,
+senza ripetere il rendering
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Optional
+import json
+import numpy as np
+
+from . import outline
+
+
+@dataclass
+class PixelizeColor:
+    """
+    classe che incapsula i dati sul colore del materiale pixelize (colori lineari della scena)
+    """
+
+    gradients: dict[float, tuple[float, float, float]]  # associa ai livelli della color map i colori
+    border: tuple[float, float, float]  # il colore del bordo
+    dithering: float  # il valore di dithering da applicare
+    light: Optional[tuple[float, float, float]]  # il colore da usare per la sfumatura chiara
+    dark: Optional[tuple[float, float, float]]  # il colore da usare per la sfumatura scura
+
+
+@dataclass
+class PaletteTable:
+    """
+    classe che raccoglie, in array indicizzati per materiale, i dati necessari a ricostruire i colori dello sprite.
+    L'indice 0 è riservato allo sfondo.
+    """
+
+    positions: np.ndarray  # (M, K) posizioni dei livelli della color ramp, completate con +inf
+    colors: np.ndarray  # (M, K, 3) colori lineari dei livelli
+    border: np.ndarray  # (M, 3) colore del bordo
+    dithering: np.ndarray  # (M,) intensità del dithering
+    light: np.ndarray  # (M,) luminanza del colore chiaro della scacchiera
+    dark: np.ndarray  # (M,) luminanza del colore scuro della scacchiera
+    names: list[str] = field(default_factory = list)  # (M,) nomi dei materiali ("" per lo sfondo)
+
+    ARRAYS: ClassVar[tuple[str, ...]] = ("positions", "colors", "border", "dithering", "light", "dark")  # campi salvati come array
+
+    @staticmethod
+    def empty(size: int, levels: int) -> "PaletteTable":
+        """
+        Il metodo crea una tabella con size materiali e levels livelli; lo sfondo ha un solo livello nero.
+        """
+
+        table: PaletteTable = PaletteTable(
+            positions = np.full((size, levels), np.inf, dtype = np.float32),
+            colors = np.zeros((size, levels, 3), dtype = np.float32),
+            border = np.zeros((size, 3), dtype = np.float32),
+            dithering = np.zeros(size, dtype = np.float32),
+            light = np.zeros(size, dtype = np.float32),
+            dark = np.zeros(size, dtype = np.float32),
+            names = [""] * size,
+        )
+        table.positions[0, 0] = 0
+        return table
+
+
+@dataclass
+class LightingData:
+    """
+    classe che contiene i dati di un frame necessari a risolvere qualunque palette.
+    Le immagini hanno forma (altezza, larghezza) con le righe dal basso verso l'alto, come i buffer di Blender.
+    """
+
+    light: np.ndarray  # illuminazione prima del dithering (float16)
+    ids: np.ndarray  # indice del materiale (uint16)
+    alpha: np.ndarray  # copertura del pixel (float16)
+    lines: np.ndarray  # pixel dei contorni (bool)
+    line_ids: np.ndarray  # indice del materiale di cui usare il colore del bordo (uint16)
+    table: PaletteTable  # la palette usata al momento del rendering
+
+    def save(self, path: str) -> None:
+        """
+        Il metodo salva i dati in un archivio NumPy compresso.
+        """
+
+        arrays: dict[str, np.ndarray] = {f"table_{name}": getattr(self.table, name) for name in PaletteTable.ARRAYS}
+        with open(path, "wb") as file:
+            np.savez_compressed(file, light = self.light, ids = self.ids, alpha = self.alpha, lines = self.lines,
+                                line_ids = self.line_ids, names = np.array(self.table.names), **arrays)
+
+    @staticmethod
+    def load(path: str) -> "LightingData":
+        """
+        Il metodo carica i dati salvati con save.
+        """
+
+        with np.load(path) as data:
+            table: PaletteTable = PaletteTable(**{name: data[f"table_{name}"] for name in PaletteTable.ARRAYS}, names = data["names"].tolist())
+            return LightingData(light = data["light"], ids = data["ids"], alpha = data["alpha"], lines = data["lines"],
+                                line_ids = data["line_ids"], table = table)
+
+    @staticmethod
+    def pack(light: np.ndarray, ids: np.ndarray, alpha: np.ndarray, lines: np.ndarray, line_ids: np.ndarray, table: PaletteTable) -> "LightingData":
+        """
+        Il metodo converte i canali ricavati dal G-buffer nei tipi compatti usati per il salvataggio.
+        """
+
+        return LightingData(
+            light = light.astype(np.float16),
+            ids = ids.astype(np.uint16),
+            alpha = alpha.astype(np.float16),
+            lines = lines.astype(bool),
+            line_ids = line_ids.astype(np.uint16),
+            table = table,
+        )
+
+
+class PaletteUtils:
+    """
+    La classe raccoglie le funzionalità per leggere le palette (nel formato di ImportColorPalette) e applicarle
+    ai dati di illuminazione con operazioni vettoriali.
+    """
+
+    LUMINANCE: np.ndarray = np.array([0.2126, 0.7152, 0.0722], dtype = np.float32)  # coefficienti di luminanza della scena
+    LIGHT_DEFAULT: tuple[float, float, float] = (255, 255, 255)  # colori usati da ImportColorPalette quando light o dark mancano
+    DARK_DEFAULT: tuple[float, float, float] = (0, 0, 0)
+
+    @staticmethod
+    def hex_to_linear(hex_color: str) -> np.ndarray:
+        """
+        Il metodo converte un colore esadecimale sRGB nel colore lineare della scena.
+        """
+
+        hex_color = hex_color.lstrip("#")
+        srgb: np.ndarray = np.array([int(hex_color[i:i + 2], 16) / 255 for i in (0, 2, 4)], dtype = np.float32)
+        return PaletteUtils.srgb_to_linear(srgb)
+
+    @staticmethod
+    def srgb_to_linear(srgb: np.ndarray) -> np.ndarray:
+        """
+        Il metodo converte valori sRGB in [0, 1] nei valori lineari della scena.
+        """
+
+        srgb = np.asarray(srgb, dtype = np.float32)
+        return np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4).astype(np.float32)
+
+    @staticmethod
+    def linear_to_srgb(linear: np.ndarray) -> np.ndarray:
+        """
+        Il metodo converte valori lineari della scena nei valori sRGB in [0, 1] (i valori vengono limitati a [0, 1]).
+        """
+
+        linear = np.clip(np.asarray(linear, dtype = np.float32), 0, 1)
+        return np.where(linear <= 0.0031308, linear * 12.92, 1.055 * np.power(linear, 1 / 2.4) - 0.055).astype(np.float32)
+
+    @staticmethod
+    def hex_to_color(hex_color: str) -> tuple[float, float, float]:
+        """
+        Il metodo converte un colore esadecimale sRGB nella terna del colore lineare della scena (vedi hex_to_linear).
+        """
+
+        return tuple(PaletteUtils.hex_to_linear(hex_color).tolist())
+
+    @staticmethod
+    def encode_bytes(pixels: np.ndarray) -> np.ndarray:
+        """
+        Il metodo codifica i pixel RGBA lineari negli 8 bit di un buffer BYTE: i colori in sRGB, alpha così com'è.
+        """
+
+        pixels = np.asarray(pixels, dtype = np.float32)
+        encoded: np.ndarray = np.empty(pixels.shape, dtype = np.float32)
+        encoded[..., :3] = PaletteUtils.linear_to_srgb(pixels[..., :3])
+        encoded[..., 3:] = np.clip(pixels[..., 3:], 0, 1)
+        return np.rint(encoded * 255).astype(np.uint8)
+
+    @staticmethod
+    def decode_bytes(pixels: np.ndarray) -> np.ndarray:
+        """
+        Il metodo riporta i pixel codificati con encode_bytes nei valori lineari della scena.
+        """
+
+        decoded: np.ndarray = np.asarray(pixels, dtype = np.float32) / 255
+        decoded[..., :3] = PaletteUtils.srgb_to_linear(decoded[..., :3])
+        return decoded
+
+    @staticmethod
+    def read_palette(path: str) -> dict[str, dict[str, Any]]:
+        """
+        Il metodo legge un file di palette: a ogni nome di materiale associa gradienti, bordo, dithering e colori della scacchiera.
+        """
+
+        with open(path, "r") as file:
+            return json.load(file)
+
+    @staticmethod
+    def read_colors(path: str) -> dict[str, PixelizeColor]:
+        """
+        Il metodo legge un file di palette e converte i colori esadecimali nei colori lineari della scena.
+
+        Returns:
+            - a ogni nome di materiale associa il suo PixelizeColor.
+        """
+
+        colors: dict[str, PixelizeColor] = {}
+        for name, entry in PaletteUtils.read_palette(path).items():
+            colors[name] = PixelizeColor(
+                gradients = {float(level): PaletteUtils.hex_to_color(color) for level, color in entry["gradients"].items()},
+                border = PaletteUtils.hex_to_color(entry["border"]),
+                dithering = entry["dithering"],
+                light = PaletteUtils.hex_to_color(entry["light"]) if entry.get("light") is not None else PaletteUtils.LIGHT_DEFAULT,
+                dark = PaletteUtils.hex_to_color(entry["dark"]) if entry.get("dark") is not None else PaletteUtils.DARK_DEFAULT,
+            )
+        return colors
+
+    @staticmethod
+    def table(palette: dict[str, dict[str, Any]], base: PaletteTable) -> PaletteTable:
+        """
+        Il metodo costruisce la tabella della palette con gli indici di base: i materiali della palette sostituiscono
+        quelli con lo stesso nome, gli altri mantengono i colori del rendering.
+        """
+
+        levels: int = max([base.positions.shape[1]] + [len(entry["gradients"]) for entry in palette.values()])
+        table: PaletteTable = PaletteTable.empty(len(base.names), levels)
+        table.names = list(base.names)
+        for name in PaletteTable.ARRAYS:
+            target: np.ndarray = getattr(table, name)
+            source: np.ndarray = getattr(base, name)
+            target[(slice(None), slice(0, source.shape[1])) if name in ("positions", "colors") else slice(None)] = source
+
+        for idx, name in enumerate(base.names):
+            if idx == 0 or name not in palette: continue
+            entry: dict[str, Any] = palette[name]
+            gradients: list[tuple[float, str]] = sorted((float(level), color) for level, color in entry["gradients"].items())
+
+            table.positions[idx] = np.inf
+            table.colors[idx] = 0
+            for level, (position, color) in enumerate(gradients):
+                table.positions[idx, level] = position
+                table.colors[idx, level] = PaletteUtils.hex_to_linear(color)
+
+            light: np.ndarray = PaletteUtils.hex_to_linear(entry["light"]) if entry.get("light") is not None else np.array(PaletteUtils.LIGHT_DEFAULT)
+            dark: np.ndarray = PaletteUtils.hex_to_linear(entry["dark"]) if entry.get("dark") is not None else np.array(PaletteUtils.DARK_DEFAULT)
+            table.border[idx] = PaletteUtils.hex_to_linear(entry["border"])
+            table.dithering[idx] = entry["dithering"]
+            table.light[idx] = np.dot(light, PaletteUtils.LUMINANCE)
+            table.dark[idx] = np.dot(dark, PaletteUtils.LUMINANCE)
+
+        return table
+
+    @staticmethod
+    def resolve(light: np.ndarray, ids: np.ndarray, alpha: np.ndarray, lines: np.ndarray, line_ids: np.ndarray, table: PaletteTable) -> np.ndarray:
+        """
+        Il metodo ricostruisce lo sprite replicando dither, color ramp e bordo dei materiali pixelize.
+
+        Returns:
+            - lo sprite RGBA lineare di forma (altezza, larghezza, 4).
+        """
+
+        # ... dithering a scacchiera: il colore chiaro cade sui pixel con parità di x e y diversa ...
+        height, width = light.shape
+        parity: np.ndarray = (np.arange(height)[:, None] + np.arange(width)[None, :]) & 1
+        checker: np.ndarray = np.where(parity == 1, table.light[ids], table.dark[ids])
+        fac: np.ndarray = light.astype(np.float32) + table.dithering[ids] * checker
+
+        # ... color ramp costante: il livello è l'ultimo con posizione <= fac ...
+        level: np.ndarray = np.maximum((table.positions[ids] <= fac[..., None]).sum(axis = -1) - 1, 0)
+
+        sprite: np.ndarray = np.empty((height, width, 4), dtype = np.float32)
+        sprite[..., :3] = table.colors[ids, level]
+        sprite[..., 3] = alpha
+
+        # ... contorni con il colore del bordo del materiale ...
+        return outline.OutlineEngine.apply(sprite, lines, line_ids, table.border)
+
+    @staticmethod
+    def resolve_data(data: LightingData, palette: dict[str, dict[str, Any]] = None) -> np.ndarray:
+        """
+        Il metodo risolve i dati di illuminazione con la palette indicata (o con quella del rendering).
+        """
+
+        table: PaletteTable = data.table if palette is None else PaletteUtils.table(palette, data.table)
+        return PaletteUtils.resolve(data.light, data.ids, data.alpha, data.lines, data.line_ids, table)
@@ -0,0 +1,164 @@
+"""
+Il modulo contiene la pipeline produttore/consumatore che compone la spritesheet mentre Blender renderizza i frame successivi
+"""
+
+from typing import Any, Optional
+import queue
+import threading
+import numpy as np
+
+from . import frames as frame_engine
+from .profiling import Profiler
+
+
+class SheetPipeline:
+    """
+    La classe compone la spritesheet in parallelo al rendering, leggendo i frame da un archivio mappato in memoria (vedi store.FrameStore).
+    Il rendering (produttore) consegna a una coda limitata l'indice di ogni sprite appena scritto nell'archivio; un gruppo di thread
+    (consumatori) tiene il conto delle celle pronte di ogni fascia e, appena la prossima fascia da scrivere è completa, la compone
+    dall'archivio (ridimensionamento e centratura) e la consegna al writer (vedi sheet.SheetWriter).
+    Se la coda è piena il produttore attende.
+
+    I frame sono disposti per colonne, come in frames.FrameEngine.sheet: il frame idx va nella colonna idx // rows e nella riga idx % rows.
+    I pixel restano nell'archivio: in memoria c'è solo la fascia in composizione, qualunque sia l'ordine di arrivo degli sprite
+    (nelle animazioni multi-angolo le fasce si completano con l'ultimo frame e vengono composte una alla volta alla chiusura).
+    Con la centratura comune (anchor) durante il rendering vengono raccolti solo i rettangoli dei frame.
+    """
+
+    WORKERS: int = 2  # thread che elaborano i frame durante il rendering
+    QUEUE: int = 16  # frame in attesa di elaborazione, oltre i quali il rendering attende
+    _STOP: object = object()  # segnala ai consumatori la fine dei frame
+
+    def __init__(self, frames: np.ndarray, rows: int, cols: int, frame_size: int, center: bool = False, anchor: bool = False,
+                 workers: int = WORKERS, capacity: int = QUEUE, writer: Any = None):
+        """
+        Args:
+            - frames: i frame RGBA uint8 di forma (N, altezza, larghezza, 4), ad esempio store.FrameStore.frames.
+            - rows, cols: le dimensioni della griglia.
+            - frame_size: il lato delle celle.
+            - center: centra il contenuto dei frame.
+            - anchor: centra tutti i frame sull'unione dei contenuti (applicato alla chiusura, quando sono noti tutti i frame).
+            - workers: il numero di thread consumatori.
+            - capacity: il numero massimo di frame in attesa nella coda.
+            - writer: riceve le fasce della spritesheet, dall'alto verso il basso, appena sono complete
+              (senza writer le fasce vengono conservate e restituite da result).
+        """
+
+        self.frames: np.ndarray = frames
+        self.rows: int = rows
+        self.cols: int = cols
+        self.frame_size: int = frame_size
+        self.center: bool = center
+        self.anchor: bool = anchor
+        self.writer: Any = writer
+
+        self._queue: queue.Queue = queue.Queue(maxsize = max(1, capacity))
+        self._threads: list[threading.Thread] = [threading.Thread(target = self._consume, daemon = True) for _ in range(max(1, workers))]
+        self._errors: list[BaseException] = []
+        self._closed: bool = False
+        self._lock: threading.Lock = threading.Lock()
+        self._filled: list[int] = [0] * rows  # celle pronte per fascia
+        self._next_band: int = 0  # la prossima fascia da consegnare al writer
+        self._written: list[np.ndarray] = []  # le fasce completate, senza writer
+        self._boxes: list[np.ndarray] = []  # con anchor: i rettangoli dei frame ridimensionati
+
+    # ... ciclo di vita ...
+    def __enter__(self) -> "SheetPipeline":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        self.close(wait = exc_type is None)
+
+    def start(self) -> None:
+        """
+        Il metodo avvia i consumatori.
+        """
+
+        for thread in self._threads: thread.start()
+
+    def submit(self, idx: int) -> None:
+        """
+        Il metodo accoda lo sprite idx appena scritto nei frame; attende se la coda è piena.
+        """
+
+        if self._errors: raise self._errors[0]
+        self._queue.put(idx)
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Il metodo attende che tutti i frame accodati siano stati elaborati e ferma i consumatori.
+        """
+
+        if not self._closed:
+            self._closed = True
+            for _ in self._threads: self._queue.put(SheetPipeline._STOP)
+        if wait:
+            for thread in self._threads: thread.join()
+
+    def result(self) -> Optional[np.ndarray]:
+        """
+        Il metodo compone e consegna al writer, una alla volta, le fasce rimaste (incomplete o in attesa della centratura comune).
+
+        Returns:
+            - senza writer, la spritesheet completa di forma (rows * frame_size, cols * frame_size, 4); altrimenti None.
+        """
+
+        self.close()
+        if self._errors: raise self._errors[0]
+
+        box: Optional[np.ndarray] = None
+        if self.center and self.anchor:
+            with Profiler.span("anchor_center", "post"):
+                box = frame_engine.FrameEngine.union_bbox(np.array(self._boxes).reshape(-1, 4))
+        self._flush_bands(force = True, box = box)
+
+        if self.writer is not None: return None
+        return np.concatenate(self._written) if self._written else np.zeros((0, self.cols * self.frame_size, 4), dtype = np.uint8)
+
+    # ... fasce ...
+    def _flush_bands(self, force: bool = False, box: Optional[np.ndarray] = None) -> None:
+        """
+        Il metodo compone dai frame e consegna al writer, nell'ordine, le fasce complete (tutte se force).
+        """
+
+        with self._lock:
+            while self._next_band < self.rows and (force or self._filled[self._next_band] == self.cols):
+                row: int = self._next_band
+                band: np.ndarray = frame_engine.FrameEngine.band(self.frames, self.rows, self.cols, row, self.frame_size, self.center, box)
+                with Profiler.span("write_band", "sheet", band = row):
+                    if self.writer is not None: self.writer.write(band)
+                    else: self._written.append(band)
+                self._next_band += 1
+
+    # ... consumatori ...
+    def place(self, idx: int) -> None:
+        """
+        Il metodo segna come pronta la cella del frame idx e scrive le fasce completate.
+        Con la centratura comune ricorda solo il rettangolo del frame: le fasce vengono composte alla chiusura.
+        """
+
+        if self.center and self.anchor:
+            with Profiler.span("place_frame", "post", idx = idx):
+                stack: np.ndarray = frame_engine.FrameEngine.resize_nearest(np.asarray(self.frames[idx])[None], self.frame_size, self.frame_size)
+                box: np.ndarray = frame_engine.FrameEngine.bboxes(stack)[0]
+            with self._lock: self._boxes.append(box)
+            return
+
+        with self._lock: self._filled[idx % self.rows] += 1
+        self._flush_bands()
+
+    def _consume(self) -> None:
+        """
+        Il metodo eseguito dai consumatori: elabora i frame finché non riceve il segnale di fine.
+        """
+
+        while True:
+            task: Optional[int] = self._queue.get()
+            if task is SheetPipeline._STOP: return
+            if self._errors: continue  # dopo un errore i frame rimanenti vengono scartati
+
+            try:
+                self.place(task)
+            except BaseException as error:
+                self._errors.append(error)
@@ -0,0 +1,257 @@
+"""
+Il modulo misura i tempi e la memoria dei job: intervalli annidati, campioni di memoria e dei datablock,
+esportati come trace JSON (formato Trace Event di Chrome, apribile con chrome://tracing o Perfetto) e come tabella riassuntiva
+"""
+
+from typing import Any, ClassVar, Optional
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+
+class NullSpan:
+    """
+    La classe è l'intervallo restituito quando la profilazione non è attiva: non misura nulla.
+    """
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+NULL_SPAN: NullSpan = NullSpan()
+
+
+class Span:
+    """
+    La classe misura un intervallo del job e lo registra nel profiler alla chiusura.
+    """
+
+    __slots__ = ("profiler", "name", "category", "args", "begin")
+
+    def __init__(self, profiler: "Profiler", name: str, category: str, args: dict[str, Any]):
+        self.profiler: Profiler = profiler
+        self.name: str = name
+        self.category: str = category
+        self.args: dict[str, Any] = args
+        self.begin: int = 0
+
+    def __enter__(self) -> "Span":
+        self.begin = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args) -> None:
+        end: int = time.perf_counter_ns()
+        self.profiler.spans.append((self.name, self.category, self.begin, end - self.begin, threading.get_ident(), self.args))
+
+
+class Profiler:
+    """
+    La classe raccoglie le misure di un job. Le categorie degli intervalli usate dall'add-on sono:
+    - "pass": i rendering dei pass (diffuse, freestyle, border, gbuffer, composite);
+    - "buffer": la copia dei risultati nei buffer e gli snapshot dei gruppi;
+    - "state": i cambi di stato della scena (impostazioni dei pass, frame e rotazione, inizio e fine della sessione);
+    - "post": l'elaborazione degli sprite renderizzati (conversione, archivio, cache, quantizzazione);
+    - "sheet": la scrittura delle spritesheet e degli atlanti.
+
+    Il profiler attivo è uno solo (active): span e frame sono metodi statici che, senza profiler attivo, costano un solo confronto.
+    Un profiler aperto mentre un altro è attivo non fa nulla, così i job annidati finiscono nella misura di quello esterno.
+    """
+
+    active: ClassVar[Optional["Profiler"]] = None
+    DATABLOCKS: ClassVar[tuple[str, ...]] = ("objects", "meshes", "materials", "images", "node_groups")  # collezioni di bpy.data campionate
+
+    def __init__(self, name: str, trace_path: Optional[str] = None, verbose: bool = True):
+        """
+        Args:
+            - name: il nome del job, usato nel trace e nel riepilogo.
+            - trace_path: il file del trace JSON scritto alla chiusura (None per non scriverlo).
+            - verbose: stampa il riepilogo (vedi summary) alla chiusura.
+        """
+
+        self.name: str = name
+        self.trace_path: Optional[str] = trace_path
+        self.verbose: bool = verbose
+        self.spans: list[tuple[str, str, int, int, int, dict[str, Any]]] = []  # (nome, categoria, inizio ns, durata ns, thread, argomenti)
+        self.samples: list[tuple[int, Optional[int], dict[str, int]]] = []  # (istante ns, picco RSS in byte, datablock)
+        self.frames: int = 0
+        self.begin: int = 0
+        self.end: int = 0
+        self.owner: bool = False  # False se un altro profiler era già attivo
+
+    def __enter__(self) -> "Profiler":
+        self.owner = Profiler.active is None
+        if not self.owner: return self
+        self.begin = time.perf_counter_ns()
+        Profiler.active = self
+        self.sample()
+        return self
+
+    def __exit__(self, *args) -> None:
+        if not self.owner: return
+        self.sample()
+        self.end = time.perf_counter_ns()
+        Profiler.active = None
+        if self.trace_path is not None: self.write(self.trace_path)
+        if self.verbose: print(self.summary() + (f"\n  trace: {self.trace_path}" if self.trace_path is not None else ""))
+
+    # ... misure ...
+    @staticmethod
+    def span(name: str, category: str, **args: Any) -> Any:
+        """
+        Il metodo restituisce il contesto che misura un intervallo del profiler attivo (NULL_SPAN se non è attivo).
+        """
+
+        profiler: Optional[Profiler] = Profiler.active
+        if profiler is None: return NULL_SPAN
+        return Span(profiler, name, category, args)
+
+    @staticmethod
+    def frame() -> None:
+        """
+        Il metodo conta uno sprite completato e campiona la memoria.
+        """
+
+        profiler: Optional[Profiler] = Profiler.active
+        if profiler is None: return
+        profiler.frames += 1
+        profiler.sample()
+
+    def sample(self) -> None:
+        """
+        Il metodo campiona il picco di memoria del processo e, dal thread principale, il numero di datablock.
+        """
+
+        blocks: dict[str, int] = Profiler.datablocks() if threading.current_thread() is threading.main_thread() else {}
+        self.samples.append((time.perf_counter_ns(), Profiler.peak_rss(), blocks))
+
+    @staticmethod
+    def peak_rss() -> Optional[int]:
+        """
+        Il metodo restituisce il picco della memoria residente del processo in byte (None se non è disponibile).
+        """
+
+        try:
+            import resource
+        except ImportError:  # Windows
+            return Profiler.peak_rss_windows()
+        usage: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024  # macOS in byte, Linux in KiB
+
+    @staticmethod
+    def peak_rss_windows() -> Optional[int]:
+        """
+        Il metodo restituisce il picco del working set del processo su Windows (PROCESS_MEMORY_COUNTERS.PeakWorkingSetSize).
+        """
+
+        try:
+            import ctypes
+            from ctypes import wintypes
+        except ImportError:
+            return None
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in ("PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                                                     "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters: Counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        try:
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb): return None
+        except (AttributeError, OSError):
+            return None
+        return counters.PeakWorkingSetSize
+
+    @staticmethod
+    def datablocks() -> dict[str, int]:
+        """
+        Il metodo conta i datablock delle collezioni DATABLOCKS (vuoto fuori da Blender).
+        """
+
+        bpy: Any = sys.modules.get("bpy")  # già importato dentro Blender: nessun import a ogni campione
+        if bpy is None: return {}
+        return {name: len(getattr(bpy.data, name)) for name in Profiler.DATABLOCKS}
+
+    # ... risultati ...
+    def seconds(self) -> float:
+        """
+        La durata del job in secondi (fino a ora se il job è ancora aperto).
+        """
+
+        return ((self.end or time.perf_counter_ns()) - self.begin) / 1e9
+
+    def stats(self) -> list[dict[str, Any]]:
+        """
+        Il metodo raggruppa gli intervalli per categoria e nome.
+
+        Returns:
+            - per ogni gruppo: categoria, nome, numero, totale, media e 95° percentile in millisecondi.
+        """
+
+        groups: dict[tuple[str, str], list[int]] = {}
+        for name, category, _, duration, _, _ in self.spans:
+            groups.setdefault((category, name), []).append(duration)
+
+        rows: list[dict[str, Any]] = []
+        for (category, name), durations in sorted(groups.items(), key = lambda group: -sum(group[1])):
+            durations.sort()
+            p95: int = durations[max(0, math.ceil(0.95 * len(durations)) - 1)]  # metodo nearest-rank
+            rows.append({"category": category, "name": name, "count": len(durations), "total_ms": sum(durations) / 1e6,
+                         "mean_ms": sum(durations) / len(durations) / 1e6, "p95_ms": p95 / 1e6})
+        return rows
+
+    def summary(self) -> str:
+        """
+        Il metodo restituisce la tabella riassuntiva del job: tempi per intervallo, sprite al secondo, picco di memoria e datablock.
+        """
+
+        lines: list[str] = [f"Pixelize profile: {self.name}",
+                            f"  {'category':<10}{'span':<28}{'count':>7}{'total ms':>11}{'mean ms':>10}{'p95 ms':>10}"]
+        for row in self.stats():
+            lines.append(f"  {row['category']:<10}{row['name']:<28}{row['count']:>7}{row['total_ms']:>11.1f}{row['mean_ms']:>10.2f}{row['p95_ms']:>10.2f}")
+
+        seconds: float = self.seconds()
+        rate: float = self.frames / seconds if seconds > 0 else 0.0
+        lines.append(f"  {self.frames} sprite in {seconds:.2f} s ({rate:.2f} sprite/s)")
+        peaks: list[int] = [peak for _, peak, _ in self.samples if peak is not None]
+        if peaks: lines.append(f"  picco RSS {max(peaks) / 2 ** 20:.1f} MiB")
+        blocks: list[dict[str, int]] = [blocks for _, _, blocks in self.samples if blocks]
+        if blocks:
+            counts: str = ", ".join(f"{name} {blocks[0][name]}->{blocks[-1][name]} (max {max(sample[name] for sample in blocks)})"
+                                    for name in Profiler.DATABLOCKS)
+            lines.append(f"  datablock: {counts}")
+        return "\n".join(lines)
+
+    def trace(self) -> dict[str, Any]:
+        """
+        Il metodo restituisce il trace nel formato Trace Event di Chrome: un evento completo ("X") per intervallo
+        e contatori ("C") per memoria e datablock; i tempi sono in microsecondi dall'inizio del job.
+        """
+
+        pid: int = os.getpid()
+        events: list[dict[str, Any]] = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"Pixelize {self.name}"}}]
+        for name, category, begin, duration, thread, args in self.spans:
+            events.append({"name": name, "cat": category, "ph": "X", "ts": (begin - self.begin) / 1e3, "dur": duration / 1e3,
+                           "pid": pid, "tid": thread, "args": args})
+        for instant, peak, blocks in self.samples:
+            ts: float = (instant - self.begin) / 1e3
+            if peak is not None: events.append({"name": "peak_rss_mib", "ph": "C", "ts": ts, "pid": pid, "args": {"peak": peak / 2 ** 20}})
+            if blocks: events.append({"name": "datablocks", "ph": "C", "ts": ts, "pid": pid, "args": blocks})
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"job": self.name, "frames": self.frames, "seconds": self.seconds(), "stats": self.stats()}}
+
+    def write(self, path: str) -> None:
+        """
+        Il metodo salva il trace JSON.
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        with open(path, "w") as file:
+            json.dump(self.trace(), file)
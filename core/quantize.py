@@ -0,0 +1,213 @@
+"""
+Il modulo contiene la quantizzazione degli sprite sulla palette tramite una tabella di ricerca 3D precalcolata
+"""
+
+from typing import Any, ClassVar, Iterable, Optional
+import hashlib
+import os
+import numpy as np
+
+
+class PaletteLUT:
+    """
+    La classe associa a ogni cella di una griglia RGB di bins x bins x bins l'indice del colore della palette più vicino.
+    Le distanze sono calcolate una sola volta nello spazio percettivo OKLab; la quantizzazione di una pila di frame
+    è poi una sola lettura vettoriale della tabella, indipendente dal numero di colori della palette.
+
+    Le tabelle vengono memorizzate per hash del file della palette e numero di celle, così i rendering successivi non le ricalcolano.
+    """
+
+    BLOCK: ClassVar[int] = 1 << 16  # celle elaborate insieme durante la costruzione
+    _cache: ClassVar[dict[tuple[str, int], "PaletteLUT"]] = {}
+
+    def __init__(self, colors: np.ndarray, bins: int = 64, table: Optional[np.ndarray] = None):
+        """
+        Args:
+            - colors: i colori sRGB uint8 della palette, di forma (K, 3) con K <= 256.
+            - bins: le celle per canale (da 2 a 256): con 256 la tabella è esatta, con meno celle occupa meno memoria.
+            - table: la tabella già calcolata (ad esempio letta dalla cache su disco).
+        """
+
+        if not 0 < len(colors) <= 256: raise ValueError("la palette deve avere da 1 a 256 colori")
+        if not 2 <= bins <= 256: raise ValueError(f"numero di celle {bins} non valido (da 2 a 256)")
+
+        self.colors: np.ndarray = np.ascontiguousarray(colors, dtype = np.uint8).reshape(-1, 3)
+        self.bins: int = bins
+        self.table: np.ndarray = table if table is not None else PaletteLUT.build(self.colors, bins)  # (bins, bins, bins) uint8
+        self._words: Optional[np.ndarray] = None  # (bins ** 3,) colori delle celle
+        palette_words: np.ndarray = np.pad(self.colors, ((0, 0), (0, 1))).view("<u4")[:, 0]  # colori della palette come parole RGB
+        self._order: np.ndarray = np.argsort(palette_words, kind = "stable").astype(np.uint8)  # indici della palette per parola crescente
+        self._exact: np.ndarray = palette_words[self._order]
+
+    # ... costruzione ...
+    @staticmethod
+    def oklab(srgb: np.ndarray) -> np.ndarray:
+        """
+        Il metodo converte colori sRGB in [0, 1] nello spazio OKLab, in cui la distanza euclidea approssima quella percepita.
+        """
+
+        linear: np.ndarray = np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+        lms: np.ndarray = linear @ np.array([
+            [0.4122214708, 0.2119034982, 0.0883024619],
+            [0.5363325363, 0.6806995451, 0.2817188376],
+            [0.0514459929, 0.1073969566, 0.6299787005],
+        ])
+        return np.cbrt(lms) @ np.array([
+            [0.2104542553, 1.9779984951, 0.0259040371],
+            [0.7936177850, -2.4285922050, 0.7827717662],
+            [-0.0040720468, 0.4505937099, -0.8086757660],
+        ])
+
+    @staticmethod
+    def build(colors: np.ndarray, bins: int) -> np.ndarray:
+        """
+        Il metodo calcola la tabella: il centro di ogni cella viene associato al colore della palette più vicino in OKLab.
+        """
+
+        palette_lab: np.ndarray = PaletteLUT.oklab(colors.astype(np.float64) / 255)  # (K, 3)
+        centers: np.ndarray = (np.arange(bins) + 0.5) / bins
+        table: np.ndarray = np.empty(bins ** 3, dtype = np.uint8)
+
+        for start in range(0, bins ** 3, PaletteLUT.BLOCK):
+            cells: np.ndarray = np.arange(start, min(start + PaletteLUT.BLOCK, bins ** 3))
+            rgb: np.ndarray = np.stack((centers[cells // (bins * bins)], centers[cells // bins % bins], centers[cells % bins]), axis = -1)
+            distance: np.ndarray = ((PaletteLUT.oklab(rgb)[:, None, :] - palette_lab[None, :, :]) ** 2).sum(axis = -1)
+            table[start:start + len(cells)] = distance.argmin(axis = -1)
+
+        return table.reshape(bins, bins, bins)
+
+    @staticmethod
+    def palette_colors(palette: dict[str, Any]) -> np.ndarray:
+        """
+        Il metodo raccoglie i colori sRGB uint8 (gradienti e bordi, senza ripetizioni) di una palette letta da
+        palette.PaletteUtils.read_colors: i colori lineari della scena vengono riportati in sRGB.
+        """
+
+        colors: list[tuple[int, int, int]] = []
+        for entry in palette.values():
+            for color in [entry.gradients[level] for level in sorted(entry.gradients)] + [entry.border]:
+                linear: np.ndarray = np.clip(np.array(tuple(color)[:3], dtype = np.float64), 0, 1)
+                srgb: np.ndarray = np.where(linear <= 0.0031308, linear * 12.92, 1.055 * np.power(linear, 1 / 2.4) - 0.055)
+                rgb: tuple[int, int, int] = tuple(int(value) for value in np.rint(srgb * 255))
+                if rgb not in colors: colors.append(rgb)
+
+        return np.array(colors, dtype = np.uint8).reshape(-1, 3)
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        """
+        Il metodo restituisce l'hash del contenuto del file della palette.
+        """
+
+        with open(path, "rb") as file:
+            return hashlib.blake2b(file.read(), digest_size = 16).hexdigest()
+
+    @staticmethod
+    def cached(path: str, colors: Iterable, bins: int = 64, cache_dir: Optional[str] = None) -> "PaletteLUT":
+        """
+        Il metodo restituisce la tabella della palette salvata in path, calcolandola solo se il file è cambiato.
+
+        Args:
+            - path: il file della palette, usato come chiave della cache tramite il suo hash.
+            - colors: i colori sRGB uint8 della palette (vedi palette_colors).
+            - bins: le celle per canale.
+            - cache_dir: se indicata, la cartella in cui salvare le tabelle tra una sessione e l'altra.
+        """
+
+        key: tuple[str, int] = (PaletteLUT.file_hash(path), bins)
+        if key in PaletteLUT._cache: return PaletteLUT._cache[key]
+
+        colors = np.asarray(colors, dtype = np.uint8).reshape(-1, 3)
+        cache_path: Optional[str] = os.path.join(cache_dir, f"{key[0]}_{bins}.npz") if cache_dir else None
+        lut: Optional[PaletteLUT] = None
+        if cache_path is not None and os.path.exists(cache_path):
+            with np.load(cache_path) as data:
+                if np.array_equal(data["colors"], colors): lut = PaletteLUT(colors, bins, data["table"])
+
+        if lut is None:
+            lut = PaletteLUT(colors, bins)
+            if cache_path is not None:
+                os.makedirs(cache_dir, exist_ok = True)
+                np.savez_compressed(cache_path, colors = lut.colors, table = lut.table)
+
+        PaletteLUT._cache[key] = lut
+        return lut
+
+    # ... quantizzazione ...
+    def cells(self, words: np.ndarray) -> np.ndarray:
+        """
+        Il metodo restituisce la cella della tabella (indice lineare) di ogni pixel, dato come parola RGBA little endian (vedi snap).
+        """
+
+        r, g, b = (((words >> shift) & 255) * self.bins >> 8 for shift in (0, 8, 16))
+        return (r * self.bins + g) * self.bins + b
+
+    def matches(self, words: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Il metodo cerca il colore di ogni pixel (parola RGBA, vedi snap) tra i colori della palette, con una ricerca binaria.
+
+        Returns:
+            - la maschera dei pixel con un colore della palette e, per questi, l'indice del colore.
+        """
+
+        rgb: np.ndarray = words & 0xFFFFFF
+        position: np.ndarray = np.minimum(np.searchsorted(self._exact, rgb), len(self._exact) - 1)
+        return self._exact[position] == rgb, self._order[position]
+
+    def indices(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        Il metodo restituisce l'indice del colore della palette di ogni pixel RGBA uint8, di forma (..., 4).
+        """
+
+        words: np.ndarray = np.ascontiguousarray(pixels, dtype = np.uint8).view("<u4")[..., 0]
+        exact, index = self.matches(words)
+        return np.where(exact, index, self.table.reshape(-1)[self.cells(words)])
+
+    def snap(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        Il metodo sostituisce ogni pixel visibile con il colore della palette più vicino; alpha resta invariato.
+        Accetta pile di frame di qualsiasi forma (..., 4) e restituisce un nuovo array.
+        Ogni pixel viene letto come una parola di 32 bit, così la lettura della tabella copia i tre canali insieme.
+        I pixel che hanno già un colore della palette restano invariati: con poche celle per canale due colori vicini
+        possono cadere nella stessa cella, che ne rappresenta solo uno.
+        """
+
+        if self._words is None:  # il colore di ogni cella, come parola RGBA con alpha nullo
+            rgba: np.ndarray = np.zeros((self.bins ** 3, 4), dtype = np.uint8)
+            rgba[:, :3] = self.colors[self.table.reshape(-1)]
+            self._words = rgba.view("<u4")[:, 0]
+
+        words: np.ndarray = np.ascontiguousarray(pixels, dtype = np.uint8).view("<u4")[..., 0]
+        exact: np.ndarray = self.matches(words)[0]
+        snapped: np.ndarray = np.where((words > 0xFFFFFF) & ~exact, self._words[self.cells(words)] | (words & 0xFF000000), words)  # alpha > 0
+        return snapped.astype("<u4", copy = False).view(np.uint8).reshape(pixels.shape)
+
+
+class QuantizedWriter:
+    """
+    La classe quantizza sulla palette le fasce RGBA prima di consegnarle a un altro writer (vedi sheet.SheetWriter e indexed.IndexedWriter).
+    """
+
+    def __init__(self, writer: Any, lut: PaletteLUT):
+        self.writer: Any = writer
+        self.lut: PaletteLUT = lut
+
+    def __enter__(self) -> "QuantizedWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.writer.__exit__(*args)
+
+    def write(self, rows: np.ndarray) -> None:
+        """
+        Il metodo quantizza e scrive la fascia successiva, di forma (n, width, 4).
+        """
+
+        self.writer.write(self.lut.snap(rows))
+
+    def close(self) -> None:
+        """
+        Il metodo completa il file.
+        """
+
+        self.writer.close()
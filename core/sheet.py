@@ -0,0 +1,347 @@
+"""
+Il modulo contiene la scrittura in streaming delle spritesheet, una fascia di righe alla volta
+"""
+
+from typing import Any, BinaryIO, Iterator, Optional
+import json
+import os
+import struct
+import zlib
+import numpy as np
+
+
+class SheetWriter:
+    """
+    La classe scrive una spritesheet RGBA uint8 riga per riga, senza mai tenere in memoria l'intera immagine.
+    Le righe vanno fornite dall'alto verso il basso; la memoria occupata dipende solo dalla fascia ricevuta.
+
+    Formati supportati:
+    - PNG: RGBA a 8 bit, compresso in streaming con zlib (nessun limite di dimensione oltre a quelli del formato);
+    - RAW: i pixel RGBA in sequenza, senza intestazione;
+    - INDEXED: PNG a colori indicizzati (8 bit per pixel) con la palette fornita; le righe contengono gli indici, di forma (n, width).
+
+    Con band_rows i PNG vengono scritti a fasce indipendenti (vedi SheetPatcher): ogni fascia di band_rows righe è compressa
+    a partire da un dizionario vuoto e occupa blocchi IDAT propri, e un blocco privato INDEX_TAG ne registra lunghezza e checksum.
+    Il file resta un PNG valido per qualsiasi lettore.
+    """
+
+    FORMATS: tuple[str, ...] = ("PNG", "RAW", "INDEXED")
+    PNG_SIGNATURE: bytes = b"\x89PNG\r\n\x1a\n"
+    PNG_MAX_SIZE: int = 2 ** 31 - 1  # dimensione massima di un lato nel formato PNG
+    CHUNK_SIZE: int = 1 << 20  # dimensione dei blocchi IDAT scritti nel file
+    ZLIB_HEADER: bytes = b"\x78\x9c"  # intestazione dello stream zlib (deflate, finestra di 32 KB)
+    INDEX_TAG: bytes = b"pxBd"  # blocco privato, ignorato dai lettori, con l'indice delle fasce
+
+    def __init__(self, path: str, width: int, height: int, file_format: str = "PNG", compression: int = 6,
+                 palette: Optional[np.ndarray] = None, alpha: Optional[np.ndarray] = None, band_rows: Optional[int] = None):
+        """
+        Args:
+            - path: il percorso del file.
+            - width, height: le dimensioni della spritesheet in pixel.
+            - file_format: uno di FORMATS.
+            - compression: il livello di compressione zlib (solo PNG e INDEXED).
+            - palette: i colori RGB uint8 della palette, di forma (K, 3) con K <= 256 (solo INDEXED).
+            - alpha: l'opacità di ogni colore della palette, di forma (K,) (solo INDEXED).
+            - band_rows: le righe di ogni fascia indipendente (solo PNG e INDEXED), di solito il lato delle celle.
+        """
+
+        if file_format not in SheetWriter.FORMATS: raise ValueError(f"formato '{file_format}' non supportato")
+        if file_format == "INDEXED" and (palette is None or not 0 < len(palette) <= 256):
+            raise ValueError("il formato indicizzato richiede una palette da 1 a 256 colori")
+        if file_format != "RAW" and not (0 < width <= SheetWriter.PNG_MAX_SIZE and 0 < height <= SheetWriter.PNG_MAX_SIZE):
+            raise ValueError(f"dimensioni {width}x{height} non valide per il formato PNG")
+
+        self.path: str = path
+        self.width: int = width
+        self.height: int = height
+        self.file_format: str = file_format
+        self.rows_written: int = 0
+        self.band_rows: Optional[int] = band_rows if file_format != "RAW" else None
+        self.bands: list[list[int]] = []  # (byte non compressi, adler32, blocchi IDAT) di ogni fascia completata
+
+        self._file: BinaryIO = open(path, "wb")
+        self._compressor = None if file_format == "RAW" else zlib.compressobj(compression, zlib.DEFLATED, -15 if self.band_rows else 15)
+        self._band: list[int] = [0, 1, 0]  # la fascia in corso
+        self._pending: list[bytes] = []  # dati compressi non ancora scritti
+        self._pending_size: int = 0
+
+        if file_format == "PNG":
+            self._file.write(SheetWriter.PNG_SIGNATURE)
+            self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))  # 8 bit, RGBA
+        elif file_format == "INDEXED":
+            self._file.write(SheetWriter.PNG_SIGNATURE)
+            self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0))  # 8 bit, palette
+            self._chunk(b"PLTE", np.ascontiguousarray(palette, dtype = np.uint8).tobytes())
+            if alpha is not None: self._chunk(b"tRNS", np.ascontiguousarray(alpha, dtype = np.uint8).tobytes())
+        if self.band_rows: self._chunk(b"IDAT", SheetWriter.ZLIB_HEADER)  # con le fasce lo stream deflate è senza intestazione
+
+    def __enter__(self) -> "SheetWriter":
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        if exc_type is None: self.close()
+        else: self._file.close()
+
+    def _chunk(self, tag: bytes, data: bytes) -> None:
+        """
+        Il metodo scrive un blocco PNG (lunghezza, tipo, dati e CRC).
+        """
+
+        self._file.write(SheetWriter.chunk_bytes(tag, data))
+
+    @staticmethod
+    def chunk_bytes(tag: bytes, data: bytes) -> bytes:
+        """
+        Il metodo restituisce un blocco PNG completo.
+        """
+
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(data, zlib.crc32(tag)) & 0xFFFFFFFF)
+
+    def _emit(self, data: bytes, force: bool = False) -> None:
+        """
+        Il metodo accumula i dati compressi e li scrive in blocchi IDAT di CHUNK_SIZE byte.
+        """
+
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+
+        if self._pending_size >= SheetWriter.CHUNK_SIZE or (force and self._pending_size):
+            self._chunk(b"IDAT", b"".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+            self._band[2] += 1
+
+    def write(self, rows: np.ndarray) -> None:
+        """
+        Il metodo scrive la fascia di righe successiva, di forma (n, width, 4) oppure (n, width) per il formato indicizzato.
+        """
+
+        rows = np.ascontiguousarray(rows, dtype = np.uint8)
+        expected: tuple[int, ...] = (self.width,) if self.file_format == "INDEXED" else (self.width, 4)
+        if rows.shape[1:] != expected: raise ValueError(f"fascia di forma {rows.shape}, attesa (n, {', '.join(map(str, expected))})")
+        if self.rows_written + len(rows) > self.height: raise ValueError("la fascia supera l'altezza della spritesheet")
+
+        if self.file_format == "RAW":
+            self._file.write(rows.tobytes())
+        elif self.band_rows is None:
+            self._emit(self._compressor.compress(SheetWriter.filter_rows(rows)))
+        else:
+            start: int = 0
+            while start < len(rows):  # la fascia ricevuta può attraversare più fasce del file
+                row: int = self.rows_written + start
+                end: int = start + min(len(rows) - start, self.band_rows - row % self.band_rows)
+                data: bytes = SheetWriter.filter_rows(rows[start:end])
+                self._band[0] += len(data)
+                self._band[1] = zlib.adler32(data, self._band[1])
+                self._emit(self._compressor.compress(data))
+                if (row + end - start) % self.band_rows == 0 or row + end - start == self.height: self._end_band()
+                start = end
+
+        self.rows_written += len(rows)
+
+    def _end_band(self) -> None:
+        """
+        Il metodo chiude la fascia in corso: lo stream viene svuotato e il dizionario azzerato (Z_FULL_FLUSH),
+        così i suoi dati compressi non dipendono da quelli delle altre fasce.
+        """
+
+        self._emit(self._compressor.flush(zlib.Z_FULL_FLUSH), force = True)
+        self.bands.append(self._band)
+        self._band = [0, 1, 0]
+
+    @staticmethod
+    def filter_rows(rows: np.ndarray) -> bytes:
+        """
+        Il metodo restituisce le righe nel formato dei dati PNG: ogni riga inizia con il filtro 0 (nessuno),
+        quindi le righe non dipendono dalle precedenti.
+        """
+
+        filtered: np.ndarray = np.zeros((len(rows), rows[0].size + 1), dtype = np.uint8)
+        filtered[:, 1:] = rows.reshape(len(rows), -1)
+        return filtered.tobytes()
+
+    @staticmethod
+    def combine_adler(adler1: int, adler2: int, length2: int) -> int:
+        """
+        Il metodo restituisce l'adler32 della concatenazione di due blocchi di dati, noti i loro adler32 e la lunghezza del secondo.
+        """
+
+        a1, b1 = adler1 & 0xFFFF, adler1 >> 16
+        a2, b2 = adler2 & 0xFFFF, adler2 >> 16
+        a: int = (a1 + a2 - 1) % 65521
+        b: int = (b1 + b2 + length2 * (a1 - 1)) % 65521
+        return (b << 16) | a
+
+    @staticmethod
+    def trailer(bands: list[list[int]]) -> bytes:
+        """
+        Il metodo restituisce la fine dello stream deflate a fasce: un blocco finale vuoto e l'adler32 di tutte le fasce.
+        """
+
+        adler: int = 1
+        for length, band_adler, _ in bands: adler = SheetWriter.combine_adler(adler, band_adler, length)
+        return b"\x03\x00" + struct.pack(">I", adler)
+
+    def close(self) -> None:
+        """
+        Il metodo completa il file; le righe mancanti vengono scritte trasparenti.
+        """
+
+        if self._file.closed: return
+        blank: np.ndarray = np.zeros((min(64, self.height), self.width) + (() if self.file_format == "INDEXED" else (4,)), dtype = np.uint8)
+        while self.rows_written < self.height: self.write(blank[:self.height - self.rows_written])
+
+        if self.band_rows:
+            self._chunk(b"IDAT", SheetWriter.trailer(self.bands))
+            self._chunk(SheetWriter.INDEX_TAG, json.dumps({"rows": self.band_rows, "bands": self.bands}).encode())
+            self._chunk(b"IEND", b"")
+        elif self.file_format != "RAW":
+            self._emit(self._compressor.flush(), force = True)
+            self._chunk(b"IEND", b"")
+        self._file.close()
+
+    @staticmethod
+    def format_for(path: str) -> str:
+        """
+        Il metodo ricava il formato dall'estensione del file (RAW per '.raw' e '.rgba', altrimenti PNG).
+        """
+
+        return "RAW" if path.lower().endswith((".raw", ".rgba")) else "PNG"
+
+
+class SheetPatcher:
+    """
+    La classe sostituisce alcune fasce di una spritesheet già scritta, senza decodificare né ricomprimere le altre:
+    - RAW: le righe vengono sovrascritte nel file;
+    - PNG e INDEXED scritti a fasce (vedi SheetWriter.band_rows): il file viene riscritto copiando così come sono i blocchi IDAT
+      delle fasce invariate, comprimendo solo quelle nuove e aggiornando checksum finale e indice.
+    """
+
+    @staticmethod
+    def chunks(file: BinaryIO) -> Iterator[tuple[bytes, int, int]]:
+        """
+        Il metodo restituisce (tipo, posizione, lunghezza dei dati) di ogni blocco di un PNG.
+        """
+
+        offset: int = len(SheetWriter.PNG_SIGNATURE)
+        while True:
+            file.seek(offset)
+            header: bytes = file.read(8)
+            if len(header) < 8: return
+            length, tag = struct.unpack(">I", header[:4])[0], header[4:]
+            yield tag, offset, length
+            offset += length + 12
+
+    @staticmethod
+    def index(path: str) -> Optional[dict[str, Any]]:
+        """
+        Il metodo legge l'indice delle fasce e l'intestazione di un PNG; restituisce None se il file non è scritto a fasce.
+
+        Returns:
+            - {"rows", "bands", "header": i dati di IHDR, "palette": i dati di PLTE o None}.
+        """
+
+        blocks: dict[bytes, bytes] = {}
+        with open(path, "rb") as file:
+            if file.read(len(SheetWriter.PNG_SIGNATURE)) != SheetWriter.PNG_SIGNATURE: return None
+            for tag, offset, length in SheetPatcher.chunks(file):
+                if tag in (b"IHDR", b"PLTE", SheetWriter.INDEX_TAG):
+                    file.seek(offset + 8)
+                    blocks[tag] = file.read(length)
+        if SheetWriter.INDEX_TAG not in blocks: return None
+
+        index: dict[str, Any] = json.loads(blocks[SheetWriter.INDEX_TAG])
+        index.update(header = blocks[b"IHDR"], palette = blocks.get(b"PLTE"))
+        return index
+
+    @staticmethod
+    def compatible(path: str, width: int, height: int, band_rows: int, palette: Optional[np.ndarray] = None) -> bool:
+        """
+        Il metodo verifica che la spritesheet esistente possa essere aggiornata a fasce: stesse dimensioni, fasce e formato
+        (per i PNG indicizzati, la stessa palette).
+        """
+
+        if not os.path.exists(path): return False
+        if SheetWriter.format_for(path) == "RAW": return os.path.getsize(path) == width * height * 4
+
+        index: Optional[dict[str, Any]] = SheetPatcher.index(path)
+        if index is None or index["rows"] != band_rows: return False
+        expected: bytes = struct.pack(">IIBBBBB", width, height, 8, 3 if palette is not None else 6, 0, 0, 0)
+        if index["header"] != expected: return False
+        return palette is None or index["palette"] == np.ascontiguousarray(palette, dtype = np.uint8).tobytes()
+
+    @staticmethod
+    def patch(path: str, bands: dict[int, np.ndarray], compression: int = 6) -> None:
+        """
+        Il metodo sostituisce le fasce indicate (indice della fascia -> righe, già nel formato del file: RGBA oppure indici).
+        """
+
+        if SheetWriter.format_for(path) == "RAW":
+            with open(path, "r+b") as file:
+                for band, rows in sorted(bands.items()):
+                    file.seek(band * rows.nbytes)
+                    file.write(np.ascontiguousarray(rows, dtype = np.uint8).tobytes())
+            return
+
+        index: Optional[dict[str, Any]] = SheetPatcher.index(path)
+        if index is None: raise ValueError(f"'{path}' non è scritta a fasce: va ricomposta")
+        band_list: list[list[int]] = [list(band) for band in index["bands"]]
+        partial: str = path + ".patch"
+
+        with open(path, "rb") as source, open(partial, "wb") as target:
+            chunks: list[tuple[bytes, int, int]] = list(SheetPatcher.chunks(source))
+            data: list[tuple[bytes, int, int]] = [chunk for chunk in chunks if chunk[0] == b"IDAT"]
+
+            target.write(SheetWriter.PNG_SIGNATURE)
+            for tag, offset, length in chunks:  # intestazione e blocchi precedenti ai dati
+                if tag == b"IDAT": break
+                SheetPatcher._copy(source, target, offset, length + 12)
+            SheetPatcher._copy(source, target, data[0][1], data[0][2] + 12)  # intestazione zlib
+
+            position: int = 1
+            for band, (_, _, count) in enumerate(index["bands"]):
+                if band not in bands:  # blocchi copiati così come sono
+                    for _, offset, length in data[position:position + count]: SheetPatcher._copy(source, target, offset, length + 12)
+                else:
+                    band_list[band] = SheetPatcher._write_band(target, bands[band], compression)
+                position += count
+
+            target.write(SheetWriter.chunk_bytes(b"IDAT", SheetWriter.trailer(band_list)))
+            target.write(SheetWriter.chunk_bytes(SheetWriter.INDEX_TAG, json.dumps({"rows": index["rows"], "bands": band_list}).encode()))
+            for tag, offset, length in chunks:  # blocchi successivi ai dati (tranne l'indice, riscritto)
+                if tag == SheetWriter.INDEX_TAG or offset <= data[-1][1]: continue
+                SheetPatcher._copy(source, target, offset, length + 12)
+
+        os.replace(partial, path)  # il file aggiornato compare completo o non compare
+
+    @staticmethod
+    def _write_band(target: BinaryIO, rows: np.ndarray, compression: int) -> list[int]:
+        """
+        Il metodo comprime e scrive una fascia in blocchi IDAT di al più CHUNK_SIZE byte.
+
+        Returns:
+            - la voce dell'indice della fascia.
+        """
+
+        data: bytes = SheetWriter.filter_rows(np.ascontiguousarray(rows, dtype = np.uint8))
+        compressor = zlib.compressobj(compression, zlib.DEFLATED, -15)
+        compressed: bytes = compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+        count: int = 0
+        for start in range(0, len(compressed), SheetWriter.CHUNK_SIZE):
+            target.write(SheetWriter.chunk_bytes(b"IDAT", compressed[start:start + SheetWriter.CHUNK_SIZE]))
+            count += 1
+        return [len(data), zlib.adler32(data), count]
+
+    @staticmethod
+    def _copy(source: BinaryIO, target: BinaryIO, offset: int, size: int) -> None:
+        """
+        Il metodo copia size byte di source, a partire da offset, in coda a target.
+        """
+
+        source.seek(offset)
+        while size > 0:
+            block: bytes = source.read(min(size, SheetWriter.CHUNK_SIZE))
+            if not block: raise ValueError("file PNG troncato")
+            target.write(block)
+            size -= len(block)
@@ -0,0 +1,121 @@
+"""
+Il modulo contiene le operazioni sulle immagini degli sprite e la composizione delle spritesheet, senza dipendere da Blender
+"""
+
+from typing import Any, Optional
+import os
+import numpy as np
+
+from . import frames as frame_engine
+from . import imaging
+from . import indexed
+from . import quantize
+from . import sheet as sheet_writer
+from .profiling import Profiler
+
+
+class SpritesheetUtils:
+    """
+    La classe raccoglie lettura, centratura e scrittura degli sprite salvati e la composizione delle spritesheet a griglia.
+    Gli operatori di render la usano sui file prodotti da Blender; gli stessi metodi funzionano in un processo Python qualunque.
+    """
+
+    @staticmethod
+    def center_image(img: Any) -> Any:
+        """
+        Il metodo centra l'immagine (un'immagine Pillow oppure un array RGBA) e la restituisce dello stesso tipo.
+        """
+
+        pixels: np.ndarray = (img if isinstance(img, np.ndarray) else np.asarray(img.convert("RGBA")))[None]  # pila di un solo frame
+        return imaging.ImagingUtils.like(img, frame_engine.FrameEngine.center(pixels)[0])
+
+    @staticmethod
+    def load_frame(path: str) -> np.ndarray:
+        """
+        Il metodo legge un frame salvato in un array RGBA di forma (altezza, larghezza, 4).
+        """
+
+        return imaging.ImagingUtils.load(path)
+
+    @staticmethod
+    def load_frames(frames: list[str]) -> np.ndarray:
+        """
+        Il metodo legge i frame salvati in una pila RGBA di forma (N, altezza, larghezza, 4).
+
+        Args:
+            - frames: i percorsi dei frame senza estensione ('.png').
+        """
+
+        return np.stack([SpritesheetUtils.load_frame(path + ".png") for path in frames])
+
+    @staticmethod
+    def sheet_path(directory: str, name: str, sheet_format: str) -> str:
+        """
+        Il metodo restituisce il percorso della spritesheet nel formato indicato ('PNG' o 'RAW').
+        """
+
+        return os.path.join(directory, name + (".rgba" if sheet_format == "RAW" else ".png"))
+
+    @staticmethod
+    def open_writer(path: str, width: int, height: int, encoder: Optional[indexed.IndexedEncoder] = None,
+                    lut: Optional[quantize.PaletteLUT] = None, band_rows: Optional[int] = None):
+        """
+        Il metodo apre il writer di una spritesheet: quantizzazione sulla palette (se indicata), poi PNG indicizzato, PNG o RAW.
+        Le spritesheet a griglia vengono scritte a fasce di band_rows righe (una riga di celle), aggiornabili con sheet.SheetPatcher.
+        """
+
+        writer = indexed.open_writer(path, width, height, encoder, band_rows)
+        return quantize.QuantizedWriter(writer, lut) if lut is not None else writer
+
+    @staticmethod
+    def convert_frames(frames: list[str], encoder: Optional[indexed.IndexedEncoder] = None, lut: Optional[quantize.PaletteLUT] = None) -> None:
+        """
+        Il metodo quantizza e/o riscrive a colori indicizzati gli sprite già salvati.
+
+        Args:
+            - frames: i percorsi completi dei file salvati (ad esempio quelli restituiti da session.RenderSession.render).
+        """
+
+        if encoder is None and lut is None: return
+        for path in frames:
+            with Profiler.span("convert_frame", "post"):
+                pixels: np.ndarray = SpritesheetUtils.load_frame(path)
+                with SpritesheetUtils.open_writer(path, pixels.shape[1], pixels.shape[0], encoder, lut) as writer:
+                    writer.write(pixels)
+
+    @staticmethod
+    def sheet_palette(path: str, encoder: Optional[indexed.IndexedEncoder] = None) -> Optional[np.ndarray]:
+        """
+        Il metodo restituisce la palette con cui viene scritta la spritesheet (None se non è a colori indicizzati).
+        """
+
+        return encoder.palette.colors if encoder is not None and sheet_writer.SheetWriter.format_for(path) == "PNG" else None
+
+    @staticmethod
+    def encode_rows(path: str, rows: np.ndarray, encoder: Optional[indexed.IndexedEncoder] = None,
+                    lut: Optional[quantize.PaletteLUT] = None) -> np.ndarray:
+        """
+        Il metodo converte righe RGBA nel formato dei dati della spritesheet, come i writer di open_writer:
+        quantizzazione sulla palette e, per i PNG indicizzati, indici della palette.
+        """
+
+        if lut is not None: rows = lut.snap(rows)
+        return encoder.encode(rows) if SpritesheetUtils.sheet_palette(path, encoder) is not None else rows
+
+    @staticmethod
+    def create_spritesheet(frames: list[str], rows: int, cols: int, output_path: str, frame_size: int, center_frame: bool, anchor_frames: bool = False,
+                           encoder: Optional[indexed.IndexedEncoder] = None, lut: Optional[quantize.PaletteLUT] = None) -> None:
+        """
+        Il metodo consente di sintetizzare una spritesheet a partire da una lista di immagini.
+        Ridimensionamento, centratura e composizione vengono eseguiti su tutta la pila di frame con operazioni vettoriali.
+
+        Args:
+            - frames: i percorsi dei frame senza estensione, disposti per colonne (il frame idx va nella colonna idx // rows).
+            - anchor_frames: centra tutti i frame rispetto all'unione dei loro contenuti, così l'animazione non tremola.
+        """
+
+        with Profiler.span("load_frames", "post", count = len(frames)):
+            stack: np.ndarray = SpritesheetUtils.load_frames(frames)
+        with Profiler.span("create_spritesheet", "sheet"):
+            with SpritesheetUtils.open_writer(output_path, cols * frame_size, rows * frame_size, encoder, lut, frame_size) as writer:
+                frame_engine.FrameEngine.stream(stack, rows, cols, writer, frame_size, center_frame, anchor_frames)
@@ -0,0 +1,224 @@
+"""
+Il modulo contiene la farm di rendering locale: più processi 'blender -b' renderizzano in parallelo le porzioni di un job
+"""
+
+import bpy
+from bpy.types import Scene
+from typing import Any, IO, Optional
+import json
+import math
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from . import const
+from . import scheduler
+from . import session
+from . import store as frame_store
+from . import workqueue
+
+
+class FarmWorker:
+    """
+    La classe contiene il lato worker della farm, eseguito in un processo 'blender -b' sulla copia salvata del progetto.
+
+    Protocollo (una riga JSON per messaggio):
+    - dal coordinatore, su stdin: {"shard", "start", "items"} per renderizzare una porzione, {"quit": true} per terminare;
+    - dal worker, su stdout con il prefisso PREFIX: {"ready": true} all'avvio, {"shard", "seconds"} alla fine di ogni porzione.
+    Gli sprite vengono scritti direttamente nell'archivio di frame del job, nella posizione indicata da start.
+    """
+
+    PREFIX: str = "PIXELIZE_FARM "  # distingue i messaggi dai log di Blender
+
+    @staticmethod
+    def command(blend_path: str, store_path: str, threads: int) -> list[str]:
+        """
+        Il metodo restituisce la riga di comando di un worker.
+        """
+
+        return [bpy.app.binary_path, "-b", blend_path, "--addons", __package__,
+                "--python-expr", f"import {__package__}.farm as farm; farm.FarmWorker.main()", "--", store_path, str(threads)]
+
+    @staticmethod
+    def send(message: dict[str, Any]) -> None:
+        """
+        Il metodo invia un messaggio al coordinatore.
+        """
+
+        sys.stdout.write(FarmWorker.PREFIX + json.dumps(message) + "\n")
+        sys.stdout.flush()
+
+    @staticmethod
+    def main() -> None:
+        """
+        Il metodo esegue il worker: apre l'archivio e renderizza le porzioni ricevute in una sola sessione, fino a {"quit": true}.
+        """
+
+        store_path, threads = sys.argv[sys.argv.index("--") + 1:][:2]
+        scene: Scene = bpy.context.scene
+        scene.render.threads_mode = "FIXED"
+        scene.render.threads = int(threads)
+        props = scene.pixel_props
+
+        with frame_store.FrameStore.open(store_path, "r+") as store, \
+                session.RenderSession(scene, props.final_samples, props.subject, store = store) as render_session:
+            FarmWorker.send({"ready": True})
+            for line in sys.stdin:
+                message: dict[str, Any] = json.loads(line)
+                if message.get("quit"): break
+
+                begin: float = time.perf_counter()
+                render_session.render([session.RenderItem(*item) for item in message["items"]], start = message["start"])
+                store.flush()
+                FarmWorker.send({"shard": message["shard"], "seconds": time.perf_counter() - begin})
+
+
+class RenderFarm:
+    """
+    La classe coordina i worker della farm: avvia i processi, assegna le porzioni con lo scheduler e
+    riassegna quelle dei worker terminati in modo anomalo.
+    """
+
+    QUIT_TIMEOUT: float = 30.0  # secondi concessi ai worker per chiudersi prima di essere terminati
+
+    def __init__(self, blend_path: str, store_path: str, plan: scheduler.FarmPlan):
+        """
+        Args:
+            - blend_path: il progetto salvato aperto dai worker.
+            - store_path: l'archivio di frame del job, già creato.
+            - plan: il numero di worker e di thread per worker.
+        """
+
+        self.blend_path: str = blend_path
+        self.store_path: str = store_path
+        self.plan: scheduler.FarmPlan = plan
+        self._processes: list[subprocess.Popen] = []
+        self._events: queue.Queue = queue.Queue()  # (worker, messaggio o None se il processo è terminato)
+
+    def _read(self, worker: int, stream: IO[str]) -> None:
+        """
+        Il metodo inoltra al coordinatore i messaggi di un worker, ignorando i log di Blender.
+        """
+
+        for line in stream:
+            if line.startswith(FarmWorker.PREFIX): self._events.put((worker, json.loads(line[len(FarmWorker.PREFIX):])))
+        self._events.put((worker, None))
+
+    def _send(self, worker: int, message: dict[str, Any]) -> bool:
+        """
+        Il metodo invia un messaggio a un worker; restituisce False se il processo non è più raggiungibile.
+        """
+
+        try:
+            self._processes[worker].stdin.write(json.dumps(message) + "\n")
+            self._processes[worker].stdin.flush()
+            return True
+        except (BrokenPipeError, OSError):
+            return False
+
+    def run(self, shards: list[scheduler.Shard]) -> scheduler.WorkStealingScheduler:
+        """
+        Il metodo renderizza tutte le porzioni e restituisce lo scheduler, con le durate misurate.
+        """
+
+        work: scheduler.WorkStealingScheduler = scheduler.WorkStealingScheduler(shards, self.plan.workers)
+        idle: set[int] = set()  # worker pronti senza lavoro da assegnare
+
+        def dispatch(worker: int) -> None:
+            shard: Optional[scheduler.Shard] = work.next(worker)
+            if shard is None:
+                idle.add(worker)
+                return
+            idle.discard(worker)
+            self._send(worker, {"shard": shard.id, "start": shard.start, "items": shard.items})  # un invio fallito viene gestito alla chiusura del processo
+
+        for worker in range(self.plan.workers):
+            process: subprocess.Popen = subprocess.Popen(FarmWorker.command(self.blend_path, self.store_path, self.plan.threads),
+                                                         stdin = subprocess.PIPE, stdout = subprocess.PIPE, text = True, bufsize = 1)
+            self._processes.append(process)
+            threading.Thread(target = self._read, args = (worker, process.stdout), daemon = True).start()
+
+        try:
+            while not work.done():
+                worker, message = self._events.get()
+                if message is None:  # processo terminato: il suo lavoro passa agli altri
+                    if not work.alive[worker]: continue
+                    idle.discard(worker)
+                    work.failed(worker)
+                    for other in list(idle): dispatch(other)
+                elif message.get("ready"):
+                    dispatch(worker)
+                else:
+                    work.finished(worker, message["seconds"])
+                    dispatch(worker)
+        finally:
+            self.stop()
+
+        return work
+
+    def stop(self) -> None:
+        """
+        Il metodo chiude i worker, terminando quelli che non rispondono.
+        """
+
+        for worker, process in enumerate(self._processes):
+            if process.poll() is None: self._send(worker, {"quit": True})
+
+        deadline: float = time.monotonic() + RenderFarm.QUIT_TIMEOUT
+        for process in self._processes:
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+class QueueWorker:
+    """
+    La classe contiene il worker della coda su filesystem condiviso (vedi workqueue.WorkQueue), eseguito con
+    'blender -b' sulla copia del progetto salvata nella coda, su qualsiasi macchina che vede la cartella.
+    """
+
+    @staticmethod
+    def command(blend_path: str, queue_dir: str, lease: float) -> list[str]:
+        """
+        Il metodo restituisce la riga di comando di un worker.
+        """
+
+        return [bpy.app.binary_path, "-b", blend_path, "--addons", __package__,
+                "--python-expr", f"import {__package__}.farm as farm; farm.QueueWorker.main()", "--", queue_dir, str(lease)]
+
+    @staticmethod
+    def render(item: workqueue.WorkItem, directory: str) -> str:
+        """
+        Il metodo renderizza uno sprite della coda con RenderUtils.render_pixel_art, applicando le impostazioni del pass.
+
+        Returns:
+            - il percorso dello sprite salvato nella cartella locale.
+        """
+
+        from . import render  # render importa questo modulo
+
+        scene: Scene = bpy.context.scene
+        props = scene.pixel_props
+        props.pipeline_mode = item.config.get("pipeline_mode", props.pipeline_mode)
+        props.outline_mode = item.config.get("outline_mode", props.outline_mode)
+        scene.frame_current = item.frame
+        if props.subject is not None and item.angle is not None: props.subject.rotation_euler[2] = math.radians(item.angle)
+        scene.render.filepath = os.path.join(directory, item.id)
+        return render.RenderUtils.render_pixel_art(item.config.get("samples", props.final_samples))
+
+    @staticmethod
+    def main() -> None:
+        """
+        Il metodo esegue il worker con gli argomenti che seguono '--' (cartella della coda e scadenza dei lock) fino alla fine della coda.
+        """
+
+        queue_dir, lease = sys.argv[sys.argv.index("--") + 1:][:2]
+        directory: str = os.path.join(bpy.app.tempdir or os.path.dirname(bpy.data.filepath), "pixelize_queue")
+        os.makedirs(directory, exist_ok = True)
+        work: workqueue.WorkQueue = workqueue.WorkQueue(queue_dir, float(lease))
+        work.run(lambda item: QueueWorker.render(item, directory), const.QUEUE_POLL)
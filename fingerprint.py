@@ -0,0 +1,227 @@
+"""
+Il modulo calcola l'impronta degli sprite: l'hash di tutto ciò che determina il risultato di un rendering, usato come chiave della cache
+"""
+
+import bpy
+from bpy.types import Scene, Object, NodeTree, Depsgraph
+from typing import Any, Optional
+import hashlib
+import os
+import numpy as np
+
+from . import const
+from . import registry
+
+
+class SpriteFingerprint:
+    """
+    La classe calcola la chiave di cache di ogni sprite di un job, combinando:
+    - la parte comune al job (calcolata una volta): impostazioni di rendering e del pass, proprietà pixelize, camera,
+      gruppo CameraMapping, materiali pixelize, mondo e contenuto del file della palette;
+    - la geometria valutata degli oggetti renderizzabili (calcolata una volta per frame);
+    - le trasformazioni degli oggetti e i dati delle luci (per ogni sprite, perché l'angolo ruota il soggetto).
+    La scena deve essere già nello stato dello sprite (vedi session.RenderSession.goto).
+    La visibilità delle luci viene presa da quella salvata all'inizio del job: i pass di sola emissione le nascondono
+    e lo stato corrente dipende dall'ultimo pass eseguito.
+    """
+
+    RENDER_PATHS: tuple[str, ...] = (
+        "scene.render.engine",
+        "scene.render.resolution_x",
+        "scene.render.resolution_y",
+        "scene.render.resolution_percentage",
+        "scene.render.film_transparent",
+        "scene.render.line_thickness_mode",
+        "scene.render.line_thickness",
+        "scene.render.image_settings.color_depth",
+        "scene.view_settings.view_transform",
+        "scene.view_settings.look",
+        "scene.view_settings.exposure",
+        "scene.view_settings.gamma",
+        "scene.cycles.use_animated_seed",
+        "scene.cycles.seed",
+        "scene.cycles.filter_width",
+        "scene.cycles.denoiser",
+    )  # impostazioni della scena che cambiano il rendering
+    IGNORED_PROPS: frozenset[str] = frozenset({
+        "rna_type", "name", "preview_samples", "frame_size", "center_frame", "anchor_frames", "sheet_format", "sheet_layout",
+        "atlas_max_size", "atlas_padding", "indexed_output", "quantize_output", "quantize_bins", "farm_mode", "farm_workers",
+        "queue_dir", "queue_lease", "queue_local_workers", "cache_enabled", "cache_dir", "cache_size",
+        "patch_sheet", "patch_frames", "patch_angles", "profile_enabled", "profile_dir", "lighting_dir",
+    })  # proprietà pixelize che riguardano solo la composizione della spritesheet o l'esecuzione
+    GEOMETRY_TYPES: frozenset[str] = frozenset({"MESH", "CURVE", "CURVES", "SURFACE", "META", "FONT", "POINTCLOUD", "VOLUME", "GREASEPENCIL"})
+
+    def __init__(self, scene: Scene, hidden: Optional[dict[str, bool]] = None):
+        """
+        Args:
+            - hidden: la visibilità originale (hide_render) degli oggetti che la sessione cambia durante il job, cioè le luci.
+        """
+
+        self.scene: Scene = scene
+        self.hidden: dict[str, bool] = dict(hidden or {})
+        self.job: bytes = SpriteFingerprint.job_digest(scene)
+        self._frame: Optional[int] = None
+        self._geometry: bytes = b""
+
+    def key(self, frame: int) -> str:
+        """
+        Il metodo restituisce la chiave dello sprite corrente, nello stato attuale della scena.
+        """
+
+        depsgraph: Depsgraph = bpy.context.evaluated_depsgraph_get()
+        if frame != self._frame:  # la geometria non dipende dall'angolo
+            self._geometry = SpriteFingerprint.geometry_digest(self.scene, depsgraph, self.hidden)
+            self._frame = frame
+
+        hasher = hashlib.blake2b(self.job, digest_size = 20)
+        hasher.update(self._geometry)
+        hasher.update(SpriteFingerprint.transforms_digest(self.scene, depsgraph, self.hidden))
+        if self.scene.cycles.use_animated_seed: hasher.update(str(frame).encode())  # il rumore cambia a ogni frame
+        return hasher.hexdigest()
+
+    # ... parte comune al job ...
+    @staticmethod
+    def feed(hasher: Any, value: Any) -> None:
+        """
+        Il metodo aggiunge all'hash un valore di RNA (numeri, stringhe, vettori, colori, matrici, ID per nome).
+        """
+
+        if isinstance(value, (tuple, list)):
+            for item in value: SpriteFingerprint.feed(hasher, item)
+            return
+
+        if isinstance(value, bpy.types.ID): value = ("ID", value.name)
+        elif isinstance(value, float): value = round(value, 6)
+        elif isinstance(value, (set, frozenset)): value = sorted(value)  # enum con più valori
+        elif hasattr(value, "__len__") and not isinstance(value, str):  # vettori, colori, matrici
+            value = tuple(np.asarray(value, dtype = np.float64).round(6).ravel())
+        hasher.update(repr(value).encode())
+        hasher.update(b"\0")
+
+    @staticmethod
+    def feed_tree(hasher: Any, tree: Optional[NodeTree], visited: Optional[set[str]] = None) -> None:
+        """
+        Il metodo aggiunge all'hash un albero di nodi: nodi, valori degli ingressi, color ramp, collegamenti e gruppi annidati.
+        """
+
+        if tree is None: return
+        visited = visited if visited is not None else set()
+        if tree.name in visited: return
+        visited.add(tree.name)
+
+        for node in sorted(tree.nodes, key = lambda node: node.name):
+            if node.name == const.VIEWER_NODE: continue  # creato e collegato dalla sessione stessa
+            SpriteFingerprint.feed(hasher, (node.bl_idname, node.name, node.label, node.mute))
+            for socket in node.inputs:
+                if hasattr(socket, "default_value"): SpriteFingerprint.feed(hasher, socket.default_value)
+            for attribute in ("operation", "blend_type", "data_type", "interpolation", "attribute_name", "attribute_type"):
+                if hasattr(node, attribute): SpriteFingerprint.feed(hasher, getattr(node, attribute))
+            if node.bl_idname == "ShaderNodeValToRGB":
+                ramp = node.color_ramp
+                SpriteFingerprint.feed(hasher, (ramp.interpolation, ramp.color_mode))
+                for element in ramp.elements: SpriteFingerprint.feed(hasher, (element.position, tuple(element.color)))
+            if getattr(node, "node_tree", None) is not None: SpriteFingerprint.feed_tree(hasher, node.node_tree, visited)
+            if getattr(node, "image", None) is not None: SpriteFingerprint.feed(hasher, node.image.name)
+
+        for link in sorted(tree.links, key = lambda link: (link.to_node.name, link.to_socket.identifier)):
+            if link.to_node.name == const.VIEWER_NODE: continue
+            SpriteFingerprint.feed(hasher, (link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier))
+
+    @staticmethod
+    def job_digest(scene: Scene) -> bytes:
+        """
+        Il metodo calcola l'hash della parte comune a tutti gli sprite del job.
+        """
+
+        hasher = hashlib.blake2b(digest_size = 20)
+        hasher.update(const.CACHE_VERSION.encode())
+
+        # ... impostazioni di rendering e proprietà pixelize ...
+        for path, value in sorted(registry.RenderState.capture(scene, list(SpriteFingerprint.RENDER_PATHS)).items()):
+            SpriteFingerprint.feed(hasher, (path, value))
+        props = scene.pixel_props
+        for prop in props.bl_rna.properties:
+            if prop.identifier not in SpriteFingerprint.IGNORED_PROPS: SpriteFingerprint.feed(hasher, (prop.identifier, getattr(props, prop.identifier)))
+
+        # ... camera ...
+        camera: Optional[Object] = scene.camera
+        if camera is not None:  # la posizione è nelle trasformazioni di ogni sprite
+            data = camera.data
+            for attribute in ("type", "ortho_scale", "lens", "sensor_width", "sensor_fit", "shift_x", "shift_y", "clip_start", "clip_end"):
+                SpriteFingerprint.feed(hasher, getattr(data, attribute))
+
+        # ... materiali, mapping e mondo ...
+        SpriteFingerprint.feed_tree(hasher, bpy.data.node_groups.get(const.CAMERA_MAPPING_GROUP))
+        for material in sorted(registry.NodeRegistry.materials(), key = lambda material: material.name):
+            SpriteFingerprint.feed(hasher, material.name)
+            SpriteFingerprint.feed_tree(hasher, material.node_tree)
+        for name in (const.DIFFUSE_MATERIAL, const.EMISSION_MATERIAL):
+            if name in bpy.data.materials: SpriteFingerprint.feed_tree(hasher, bpy.data.materials[name].node_tree)
+        if scene.world is not None: SpriteFingerprint.feed_tree(hasher, scene.world.node_tree)
+        if scene.node_tree is not None: SpriteFingerprint.feed_tree(hasher, scene.node_tree)  # compositor
+
+        # ... palette ...
+        palette_path: str = bpy.path.abspath(props.color_palette) if props.color_palette else ""
+        if palette_path and os.path.exists(palette_path):
+            with open(palette_path, "rb") as file:
+                hasher.update(file.read())
+
+        return hasher.digest()
+
+    # ... parte di ogni sprite ...
+    @staticmethod
+    def renderable(scene: Scene, hidden: Optional[dict[str, bool]] = None) -> list[Object]:
+        """
+        Il metodo restituisce gli oggetti visibili nel rendering, in ordine di nome.
+
+        Args:
+            - hidden: la visibilità da usare al posto di hide_render per gli oggetti indicati.
+        """
+
+        hidden = hidden or {}
+        return sorted((obj for obj in scene.objects if not hidden.get(obj.name, obj.hide_render)), key = lambda obj: obj.name)
+
+    @staticmethod
+    def geometry_digest(scene: Scene, depsgraph: Depsgraph, hidden: Optional[dict[str, bool]] = None) -> bytes:
+        """
+        Il metodo calcola l'hash della geometria valutata (modificatori, armature, shape key) degli oggetti renderizzabili.
+        """
+
+        hasher = hashlib.blake2b(digest_size = 20)
+        for obj in SpriteFingerprint.renderable(scene, hidden):
+            if obj.type not in SpriteFingerprint.GEOMETRY_TYPES: continue
+            evaluated: Object = obj.evaluated_get(depsgraph)
+            SpriteFingerprint.feed(hasher, (obj.name, [slot.material for slot in obj.material_slots]))
+            try:
+                mesh = evaluated.to_mesh()
+            except RuntimeError:  # oggetti senza mesh (volumi, ...): conta solo il tipo
+                continue
+            if mesh is None: continue
+
+            coords: np.ndarray = np.empty(len(mesh.vertices) * 3, dtype = np.float32)
+            mesh.vertices.foreach_get("co", coords)
+            materials: np.ndarray = np.empty(len(mesh.polygons), dtype = np.int32)
+            mesh.polygons.foreach_get("material_index", materials)
+            hasher.update(coords.tobytes())
+            hasher.update(materials.tobytes())
+            hasher.update(np.array((len(mesh.edges), len(mesh.loops)), dtype = np.int64).tobytes())
+            evaluated.to_mesh_clear()
+
+        return hasher.digest()
+
+    @staticmethod
+    def transforms_digest(scene: Scene, depsgraph: Depsgraph, hidden: Optional[dict[str, bool]] = None) -> bytes:
+        """
+        Il metodo calcola l'hash delle trasformazioni degli oggetti renderizzabili e dei dati delle luci.
+        """
+
+        hasher = hashlib.blake2b(digest_size = 20)
+        for obj in SpriteFingerprint.renderable(scene, hidden):
+            evaluated: Object = obj.evaluated_get(depsgraph)
+            SpriteFingerprint.feed(hasher, (obj.name, obj.type))
+            SpriteFingerprint.feed(hasher, evaluated.matrix_world)
+            if obj.type == "LIGHT":
+                light = evaluated.data
+                SpriteFingerprint.feed(hasher, (light.type, light.energy, tuple(light.color), getattr(light, "shadow_soft_size", 0.0)))
+
+        return hasher.digest()
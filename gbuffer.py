@@ -0,0 +1,294 @@
+"""
+Il modulo gestisce la pipeline G-buffer: un solo rendering per frame, dai cui pass viene ricostruito lo sprite
+"""
+
+import bpy
+from bpy.types import Scene, Node, NodeTree, NodeSocket, Material, ViewLayer, Operator, Context
+from typing import Any
+import numpy as np
+import os
+
+from . import const
+from . import buffers
+from . import materials
+from . import registry
+from .core import outline
+from .core import palette
+from .core.palette import PaletteTable
+
+
+class GBufferUtils:
+    """
+    La classe raccoglie le funzionalità per il rendering e la ricostruzione dello sprite a partire dal G-buffer.
+    Il rendering usa il materiale diffuso bianco integrato nei materiali pixelize e il compositor impacchetta i pass
+    nei canali del viewer: R = luminanza dell'illuminazione, G = indice del materiale, B = profondità, A = alpha.
+    """
+
+    @staticmethod
+    def palette_table() -> PaletteTable:
+        """
+        Il metodo legge dai materiali pixelize i dati della palette, indicizzati con il pass index del materiale.
+        """
+
+        pixel_materials: list[Material] = [material for material in registry.NodeRegistry.materials() if material.pass_index > 0]
+        size: int = max((material.pass_index for material in pixel_materials), default = 0) + 1
+        levels: int = max((len(GBufferUtils._find_node(material, "ShaderNodeValToRGB").color_ramp.elements) for material in pixel_materials), default = 1)
+
+        table: PaletteTable = PaletteTable.empty(size, levels)
+        for material in pixel_materials:
+            idx: int = material.pass_index
+            table.names[idx] = material.name
+            ramp: Node = GBufferUtils._find_node(material, "ShaderNodeValToRGB")
+            checker: Node = GBufferUtils._find_node(material, "ShaderNodeTexChecker")
+
+            for level, element in enumerate(ramp.color_ramp.elements):
+                table.positions[idx, level] = element.position
+                table.colors[idx, level] = element.color[:3]
+
+            for node in registry.NodeRegistry.material_nodes(material, "ShaderNodeMixRGB"):
+                if node.blend_type == "ADD": table.dithering[idx] = node.inputs[0].default_value
+                else: table.border[idx] = node.inputs[2].default_value[:3]
+
+            table.light[idx] = np.dot(checker.inputs[1].default_value[:3], palette.PaletteUtils.LUMINANCE)
+            table.dark[idx] = np.dot(checker.inputs[2].default_value[:3], palette.PaletteUtils.LUMINANCE)
+
+        return table
+
+    @staticmethod
+    def _find_node(material: Material, bl_idname: str) -> Node:
+        """
+        Il metodo restituisce il primo nodo del tipo richiesto nel materiale.
+        """
+
+        return registry.NodeRegistry.material_nodes(material, bl_idname)[0]
+
+    @staticmethod
+    def setup(scene: Scene) -> NodeSocket:
+        """
+        Il metodo abilita i pass necessari e predispone nel compositor i nodi che li impacchettano.
+
+        Returns:
+            - l'uscita da collegare al viewer.
+        """
+
+        view_layer: ViewLayer = bpy.context.view_layer
+        view_layer.use_pass_z = True
+        if const.GBUFFER_AOV not in view_layer.aovs:
+            aov = view_layer.aovs.add()
+            aov.name = const.GBUFFER_AOV
+            aov.type = "VALUE"
+
+        outdated: list[Material] = [material for material in registry.NodeRegistry.materials()
+                                    if not registry.NodeRegistry.material_nodes(material, "ShaderNodeOutputAOV")]
+        for material in outdated: materials.PixelArtMaterialsUtils.set_gbuffer_nodes(material)  # materiali delle versioni precedenti
+        if outdated: registry.NodeRegistry.invalidate()
+
+        if scene.node_tree is None: scene.use_nodes = True
+        tree: NodeTree = scene.node_tree
+        render_node: Node = tree.nodes["Render Layers"]
+
+        light_node: Node = tree.nodes.get(const.GBUFFER_LIGHT_NODE)
+        if light_node is None:
+            light_node = tree.nodes.new("CompositorNodeRGBToBW")
+            light_node.name = const.GBUFFER_LIGHT_NODE
+            light_node.location = (-300, -600)
+
+        pack_node: Node = tree.nodes.get(const.GBUFFER_PACK_NODE)
+        if pack_node is None:
+            pack_node = tree.nodes.new("CompositorNodeCombineColor")
+            pack_node.name = const.GBUFFER_PACK_NODE
+            pack_node.location = (-150, -600)
+            pack_node.mode = "RGB"
+
+        # ... collegamenti (ricreati solo se mancano) ...
+        wanted: list[tuple[NodeSocket, NodeSocket]] = [
+            (render_node.outputs["Image"], light_node.inputs[0]),
+            (light_node.outputs[0], pack_node.inputs[0]),
+            (render_node.outputs[const.GBUFFER_AOV], pack_node.inputs[1]),
+            (render_node.outputs["Depth"], pack_node.inputs[2]),
+            (render_node.outputs["Alpha"], pack_node.inputs[3]),
+        ]
+        for source, target in wanted:
+            if not target.is_linked or target.links[0].from_socket != source: tree.links.new(source, target)
+
+        return pack_node.outputs[0]
+
+    @staticmethod
+    def capture(scene: Scene) -> np.ndarray:
+        """
+        Il metodo esegue l'unico rendering del frame e restituisce il G-buffer, di forma (altezza, larghezza, 4).
+        """
+
+        buffers.BufferUtils.set_viewer(scene, GBufferUtils.setup(scene))
+
+        use_nodes: bool = scene.use_nodes
+        scene.use_nodes = True
+        bpy.ops.render.render(use_viewport = True)
+        scene.use_nodes = use_nodes
+
+        buffers.BufferUtils.copy_render_result(const.GBUFFER_BUFFER)
+        return buffers.BufferPool.read(const.GBUFFER_BUFFER)
+
+    @staticmethod
+    def outline_settings(scene: Scene) -> outline.OutlineSettings:
+        """
+        Il metodo legge dalle proprietà della scena i parametri dei contorni.
+        """
+
+        props = scene.pixel_props
+        return outline.OutlineSettings(
+            inside = props.outline_inside,
+            outside = props.outline_outside,
+            depth_step = props.outline_depth,
+            crease_angle = props.outline_crease,
+            material_boundaries = props.outline_material_boundaries,
+        )
+
+    @staticmethod
+    def pixel_size(scene: Scene) -> float:
+        """
+        Il metodo restituisce la dimensione di un pixel in unità della scena (camera ortografica).
+        """
+
+        return scene.camera.data.ortho_scale / max(scene.render.resolution_x, scene.render.resolution_y)
+
+    @staticmethod
+    def unpack(gbuffer: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Il metodo separa i canali del G-buffer.
+
+        Returns:
+            - illuminazione, indici dei materiali (limitati a size - 1), profondità e alpha.
+        """
+
+        ids: np.ndarray = np.clip(np.rint(gbuffer[..., 1]).astype(np.int32), 0, size - 1)
+        return gbuffer[..., 0], ids, gbuffer[..., 2], gbuffer[..., 3]
+
+    @staticmethod
+    def lighting_data(gbuffer: np.ndarray, table: PaletteTable, pixel_size: float, settings: outline.OutlineSettings) -> palette.LightingData:
+        """
+        Il metodo ricava dal G-buffer i dati di illuminazione del frame, da cui si può risolvere qualunque palette.
+
+        Args:
+            - gbuffer: il G-buffer di forma (altezza, larghezza, 4), con le righe dal basso verso l'alto.
+            - table: i dati della palette indicizzati per materiale.
+            - pixel_size: la dimensione di un pixel in unità della scena.
+            - settings: i parametri dei contorni.
+        """
+
+        light, ids, depth, alpha = GBufferUtils.unpack(gbuffer, len(table.dithering))
+        lines, line_ids = outline.OutlineEngine.outline(alpha, depth, ids, pixel_size, settings)
+        return palette.LightingData.pack(light, ids, alpha, lines, line_ids, table)
+
+    @staticmethod
+    def lighting_path(scene: Scene) -> str:
+        """
+        Il metodo restituisce il percorso dei dati di illuminazione associati al rendering corrente.
+        """
+
+        return bpy.path.abspath(scene.render.filepath) + const.LIGHTING_SUFFIX
+
+    @staticmethod
+    def render_sprite(scene: Scene, save: bool = True) -> str:
+        """
+        Il metodo esegue il rendering G-buffer del frame corrente e salva lo sprite nel percorso di output della scena,
+        insieme ai dati di illuminazione se richiesto.
+
+        Args:
+            - scene: la scena da renderizzare.
+            - save: se False lo sprite resta solo nel buffer SPRITE_BUFFER.
+
+        Returns:
+            - il percorso del file salvato.
+        """
+
+        data: palette.LightingData = GBufferUtils.lighting_data(GBufferUtils.capture(scene), GBufferUtils.palette_table(),
+                                                                GBufferUtils.pixel_size(scene), GBufferUtils.outline_settings(scene))
+        if scene.pixel_props.store_lighting: data.save(GBufferUtils.lighting_path(scene))
+
+        buffers.BufferPool.write(const.SPRITE_BUFFER, palette.PaletteUtils.resolve_data(data))
+        if not save: return buffers.BufferUtils.still_path(scene)
+        return buffers.BufferUtils.save_still(const.SPRITE_BUFFER, scene)
+
+    @staticmethod
+    def render_buffers(scene: Scene) -> None:
+        """
+        Il metodo sostituisce i pass diffuse, freestyle e bordo della pipeline multi-pass con un solo rendering G-buffer:
+        - DiffuseBuffer riceve l'illuminazione;
+        - FreeStyleBuffer vale 1 sulla sagoma e 0 sulle linee, come il rendering Freestyle con il materiale di emissione;
+        - BorderBuffer contiene il colore del bordo dei materiali, anche sui contorni esterni alla sagoma.
+        """
+
+        data: palette.LightingData = GBufferUtils.lighting_data(GBufferUtils.capture(scene), GBufferUtils.palette_table(),
+                                                                GBufferUtils.pixel_size(scene), GBufferUtils.outline_settings(scene))
+        if scene.pixel_props.store_lighting: data.save(GBufferUtils.lighting_path(scene))
+        inside: np.ndarray = data.alpha > 0
+
+        pixels: np.ndarray = np.empty(data.light.shape + (4,), dtype = np.float32)
+        pixels[..., :3] = data.light[..., None]
+        pixels[..., 3] = data.alpha
+        buffers.BufferPool.write(const.DIFFUSE_BUFFER, pixels)
+
+        pixels[:] = (inside & ~data.lines)[..., None]
+        buffers.BufferPool.write(const.FREESTYLE_BUFFER, pixels)
+
+        pixels[..., :3] = data.table.border[np.where(data.lines, data.line_ids, data.ids)]
+        pixels[..., 3] = inside | data.lines
+        buffers.BufferPool.write(const.BORDER_BUFFER, pixels)
+
+
+class ResolvePalette(Operator):
+    """
+    Operatore che ricolora gli sprite con la palette selezionata, a partire dai dati di illuminazione salvati
+    accanto agli sprite, senza ripetere il rendering
+    """
+
+    bl_idname: str = "render.pixelart_resolve_palette"
+    bl_label: str = "Resolve Palette"
+
+    @staticmethod
+    def directories(scene: Scene) -> list[str]:
+        """
+        Il metodo restituisce le cartelle esistenti in cui cercare i dati di illuminazione: quella scelta (lighting_dir) oppure
+        quelle in cui i job salvano gli sprite, cioè l'uscita della scena (sprite singoli) e la cartella del progetto
+        (animazioni e job multi-angolo).
+        """
+
+        props = scene.pixel_props
+        candidates: list[str] = ([bpy.path.abspath(props.lighting_dir)] if props.lighting_dir
+                                 else [os.path.dirname(bpy.path.abspath(scene.render.filepath)), os.path.dirname(bpy.data.filepath)])
+        directories: list[str] = []
+        for directory in (os.path.normpath(directory) for directory in candidates if directory):
+            if os.path.isdir(directory) and directory not in directories: directories.append(directory)
+        return directories
+
+    def execute(self, context: Context):
+        """
+        Il metodo salva, per ogni file di illuminazione, lo sprite '<nome>_<palette>' con la palette indicata.
+        """
+
+        scene: Scene = context.scene
+        path: str = bpy.path.abspath(scene.pixel_props.color_palette)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"il file '{path}' non esiste")
+
+        variant: dict[str, dict[str, Any]] = palette.PaletteUtils.read_palette(path)
+        suffix: str = os.path.splitext(os.path.basename(path))[0]
+        directories: list[str] = ResolvePalette.directories(scene)
+        if not directories:
+            self.report({"ERROR"}, "nessuna cartella con i dati di illuminazione: scegli 'Lighting Directory'")
+            return {'CANCELLED'}
+
+        count: int = 0
+        for directory in directories:
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(const.LIGHTING_SUFFIX): continue
+                data: palette.LightingData = palette.LightingData.load(os.path.join(directory, name))
+                buffers.BufferPool.write(const.SPRITE_BUFFER, palette.PaletteUtils.resolve_data(data, variant))
+
+                output: str = os.path.join(directory, f"{name[:-len(const.LIGHTING_SUFFIX)]}_{suffix}{scene.render.file_extension}")
+                bpy.data.images[const.SPRITE_BUFFER].save_render(output, scene = scene)
+                count += 1
+
+        self.report({"INFO"}, f"{count} sprite ricolorati con la palette '{suffix}' ({', '.join(directories)})")
+        return {'FINISHED'}
@@ -0,0 +1,124 @@
+"""
+Il modulo esegue i job di Pixelize descritti da dizionari, senza passare dagli operatori (vedi server e cli)
+"""
+
+import bpy
+from bpy.types import Scene
+from typing import Any, Callable, Optional
+import os
+
+from . import registry
+from . import render
+from . import session
+from .core.spritesheet import SpritesheetUtils
+
+
+class JobRunner:
+    """
+    La classe esegue un job sulla scena corrente con le stesse funzioni degli operatori.
+
+    Campi del job (tutti facoltativi tranne "type"):
+    - "type": uno di JOB_TYPES;
+    - "frame", "start", "end" oppure "frames" (lista o testo come '1-10, 12'): i frame da renderizzare;
+    - "angles": gli angoli in gradi dei job multi-angolo (gli 8 multipli di 45 se assente);
+    - "output": il percorso dello sprite o la cartella della spritesheet;
+    - "samples" oppure "preview" (usa i campioni di anteprima);
+    - le impostazioni in OVERRIDES, applicate solo per la durata del job.
+    """
+
+    JOB_TYPES: tuple[str, ...] = ("sprite", "animation", "multiangle", "multiangle_animation", "patch")
+    OVERRIDES: dict[str, str] = {
+        "subject": "scene.pixel_props.subject",
+        "frame_size": "scene.pixel_props.frame_size",
+        "format": "scene.pixel_props.sheet_format",
+        "layout": "scene.pixel_props.sheet_layout",
+        "pipeline": "scene.pixel_props.pipeline_mode",
+        "center": "scene.pixel_props.center_frame",
+        "anchor": "scene.pixel_props.anchor_frames",
+        "samples": "scene.pixel_props.final_samples",
+        "profile": "scene.pixel_props.profile_enabled",
+    }  # campo del job -> proprietà della scena
+
+    @staticmethod
+    def overrides(scene: Scene, job: dict[str, Any]) -> dict[str, Any]:
+        """
+        Il metodo restituisce le proprietà da applicare per il job (il soggetto viene cercato per nome).
+        """
+
+        desired: dict[str, Any] = {JobRunner.OVERRIDES[key]: value for key, value in job.items() if key in JobRunner.OVERRIDES}
+        if job.get("preview"): desired[JobRunner.OVERRIDES["samples"]] = scene.pixel_props.preview_samples
+        if "subject" in job:
+            if job["subject"] not in bpy.data.objects: raise ValueError(f"oggetto '{job['subject']}' non trovato")
+            desired[JobRunner.OVERRIDES["subject"]] = bpy.data.objects[job["subject"]]
+        return desired
+
+    @staticmethod
+    def frames(scene: Scene, job: dict[str, Any], animation: bool, inclusive: bool = True) -> list[int]:
+        """
+        Il metodo restituisce i frame del job: "frames", altrimenti l'intervallo start-end per le animazioni o "frame".
+
+        Args:
+            - inclusive: include il frame finale (come RenderMultiAngleAnimation; RenderPixelArtAnimation lo esclude).
+        """
+
+        frames: Any = job.get("frames")
+        if isinstance(frames, str): return render.RenderUtils.parse_frames(frames)
+        if frames is not None: return [int(frame) for frame in frames]
+        if animation: return list(range(job.get("start", scene.frame_start), job.get("end", scene.frame_end) + inclusive))
+        return [job.get("frame", scene.frame_current)]
+
+    @staticmethod
+    def run(scene: Scene, job: dict[str, Any], blend_path: str, progress: Optional[Callable[[int, str], None]] = None) -> list[str]:
+        """
+        Il metodo applica le impostazioni del job, lo esegue e ripristina le impostazioni della scena.
+
+        Returns:
+            - i percorsi dei file prodotti (sprite o spritesheet).
+        """
+
+        if job.get("type") not in JobRunner.JOB_TYPES: raise ValueError(f"tipo di job '{job.get('type')}' non supportato")
+        desired: dict[str, Any] = JobRunner.overrides(scene, job)
+        saved: dict[str, Any] = registry.RenderState.capture(scene, list(desired))
+        registry.RenderState.apply(scene, desired)
+        try:
+            with render.RenderUtils.profiler(scene, job["type"]):
+                return JobRunner.execute(scene, job, blend_path, progress)
+        finally:
+            registry.RenderState.apply(scene, saved)
+
+    @staticmethod
+    def execute(scene: Scene, job: dict[str, Any], blend_path: str, progress: Optional[Callable[[int, str], None]] = None) -> list[str]:
+        """
+        Il metodo esegue il job con le impostazioni già applicate.
+        """
+
+        props = scene.pixel_props
+        kind: str = job["type"]
+        encoder = render.RenderUtils.indexed_encoder(props)
+        lut = render.RenderUtils.palette_lut(props)
+
+        if kind in ("sprite", "animation"):
+            output: str = job.get("output", scene.render.filepath if kind == "sprite" else blend_path)
+            frames: list[int] = JobRunner.frames(scene, job, kind == "animation", inclusive = False)
+            items: list[session.RenderItem] = ([session.RenderItem(frames[0], None, output)] if kind == "sprite"
+                                               else [session.RenderItem(frame, None, output + str(frame)) for frame in frames])
+            with session.RenderSession(scene, props.final_samples, on_saved = progress) as render_session:
+                paths: list[str] = render_session.render(items)
+            SpritesheetUtils.convert_frames(paths, encoder, lut)
+            return paths
+
+        if props.subject is None: raise ValueError("i job multi-angolo richiedono un soggetto")
+        frames = JobRunner.frames(scene, job, kind == "multiangle_animation")
+        angles: Optional[list[int]] = [int(angle) % 360 for angle in job["angles"]] if job.get("angles") else None
+        output_dir: str = job.get("output", os.path.dirname(blend_path))
+        name: str = "multiangle" if kind == "multiangle" else "animation"
+        output_path: str = SpritesheetUtils.sheet_path(output_dir, job.get("sheet", name), props.sheet_format)
+
+        if kind == "patch":
+            cells: list[tuple[int, int]] = [(frame, angle) for frame in frames for angle in (angles or [phi * 45 for phi in range(8)])]
+            render.RenderUtils.patch_spritesheet(scene, output_path, cells, encoder, lut)
+            return [output_path]
+
+        items = render.RenderUtils.multiangle_items(output_dir, frames, angles)
+        render.RenderUtils.render_spritesheet(scene, items, props.subject, len(angles or range(8)), len(frames), output_path, encoder, lut, progress)
+        return [output_path]
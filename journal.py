@@ -0,0 +1,149 @@
+"""
+Il modulo contiene il journal dei job: il registro su disco degli sprite completati, per riprendere un job interrotto
+"""
+
+from typing import Any, IO, Optional
+import hashlib
+import json
+import os
+import numpy as np
+
+
+class JobJournal:
+    """
+    La classe gestisce il journal di un job, un file JSON a righe scritto solo in coda:
+    - la prima riga contiene i parametri del job ({"job": ...});
+    - ogni riga successiva uno sprite completato ({"idx", "frame", "angle", "checksum"}), scritta appena lo sprite è nell'archivio.
+
+    Un job rilanciato con gli stessi parametri riprende dal journal: gli sprite registrati il cui contenuto nell'archivio
+    corrisponde ancora al checksum non vengono renderizzati di nuovo. Una riga incompleta (scritta durante un crash) viene ignorata.
+    Il journal viene rimosso alla fine del job, così un nuovo rendering non riusa gli sprite di un job già concluso.
+    """
+
+    def __init__(self, path: str, params: dict[str, Any]):
+        """
+        Args:
+            - path: il file del journal.
+            - params: i parametri del job (serializzabili in JSON); un journal con parametri diversi viene scartato.
+        """
+
+        self.path: str = path
+        self.params: dict[str, Any] = json.loads(json.dumps(params))  # confrontabili con quelli riletti dal file
+        self.entries: dict[int, dict[str, Any]] = {}  # indice -> sprite registrato
+        self._file: Optional[IO[str]] = None
+
+    def __enter__(self) -> "JobJournal":
+        self.open()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def open(self) -> bool:
+        """
+        Il metodo apre il journal, rileggendo gli sprite registrati se i parametri corrispondono, altrimenti ne inizia uno nuovo.
+
+        Returns:
+            - True se il job viene ripreso.
+        """
+
+        self.entries = self.read() if os.path.exists(self.path) else {}
+        resumed: bool = bool(self.entries)
+        if not resumed:
+            self.restart()
+            return False
+
+        with open(self.path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            complete: bool = file.read(1) == b"\n"
+        self._file = open(self.path, "a", encoding = "utf-8")
+        if not complete: self._file.write("\n")  # la riga interrotta resta isolata
+        return True
+
+    def restart(self) -> None:
+        """
+        Il metodo scarta gli sprite registrati e ricomincia il journal.
+        """
+
+        self.close()
+        self.entries = {}
+        self._file = open(self.path, "w", encoding = "utf-8")
+        self.append({"job": self.params})
+
+    def read(self) -> dict[int, dict[str, Any]]:
+        """
+        Il metodo legge gli sprite registrati nel journal; restituisce un dizionario vuoto se il journal è di un altro job.
+        """
+
+        entries: dict[int, dict[str, Any]] = {}
+        with open(self.path, "r", encoding = "utf-8") as file:
+            for number, line in enumerate(file):
+                try:
+                    record: dict[str, Any] = json.loads(line)
+                except json.JSONDecodeError:  # riga interrotta da un crash
+                    if number == 0: return {}
+                    continue
+                if number == 0:
+                    if record.get("job") != self.params: return {}
+                    continue
+                entries[record["idx"]] = record
+        return entries
+
+    def append(self, record: dict[str, Any]) -> None:
+        """
+        Il metodo aggiunge una riga al journal e la forza su disco.
+        """
+
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, idx: int, frame: int, angle: Optional[int], pixels: np.ndarray) -> None:
+        """
+        Il metodo registra lo sprite idx completato, con il checksum dei suoi pixel (se non è già registrato con lo stesso contenuto).
+        """
+
+        checksum: str = JobJournal.checksum(pixels)
+        if self.entries.get(idx, {}).get("checksum") == checksum: return
+        entry: dict[str, Any] = {"idx": idx, "frame": frame, "angle": angle, "checksum": checksum}
+        self.append(entry)
+        self.entries[idx] = entry
+
+    def verify(self, frames: np.ndarray, written: np.ndarray) -> set[int]:
+        """
+        Il metodo confronta gli sprite registrati con quelli dell'archivio.
+
+        Returns:
+            - gli indici degli sprite presenti e integri, che non vanno renderizzati di nuovo.
+        """
+
+        valid: set[int] = set()
+        for idx, entry in self.entries.items():
+            if idx < len(written) and written[idx] and JobJournal.checksum(frames[idx]) == entry["checksum"]: valid.add(idx)
+        self.entries = {idx: self.entries[idx] for idx in valid}  # gli altri vengono registrati di nuovo
+        return valid
+
+    def close(self) -> None:
+        """
+        Il metodo chiude il journal, che resta su disco per riprendere il job.
+        """
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self) -> None:
+        """
+        Il metodo chiude e rimuove il journal di un job concluso.
+        """
+
+        self.close()
+        if os.path.exists(self.path): os.remove(self.path)
+
+    @staticmethod
+    def checksum(pixels: np.ndarray) -> str:
+        """
+        Il metodo restituisce il checksum dei pixel di uno sprite.
+        """
+
+        return hashlib.blake2b(np.ascontiguousarray(pixels).data, digest_size = 16).hexdigest()
@@ -3,27 +3,14 @@ Il modulo contiene le funzionalità necessarie per la gestione dei materiali.
 """
 
 from mathutils import Color
-from bpy.types import Node, Material, Operator, Panel, Context, UILayout, Scene
+from bpy.types import Node, NodeTree, Material, Operator, Panel, Context, UILayout, Scene
 import bpy
 import os
-from dataclasses import dataclass
 from typing import Optional, Any
-import json
 
 from . import const
-
-@dataclass
-class PixelizeColor:
-    """
-    classe che incapsula i dati sul colore del materiale pixelize
-    """
-    
-    gradients: dict[float, Color]  # associa ai livelli della color map i colori
-    border: Color  # il colore del bordo
-    dithering: float  # il valore di dithering da applicare
-    light: Optional[Color] # il colore da usare per la sfumatura chiara
-    dark: Optional[Color]  # il colore da usare per la sfumatura scura
-     
+from .core import palette
+from .core.palette import PixelizeColor
 
 class PixelArtMaterialsUtils:
     """
@@ -43,13 +30,27 @@ class PixelArtMaterialsUtils:
         Returns:
             - il colore corrispondente al codice esadecimale.
         """
-        # Rimuove il simbolo '#' se presente
-        print(hex_color)
-        hex_color = hex_color.lstrip('#')
+        return Color(palette.PaletteUtils.hex_to_color(hex_color))  # conversione nel colore lineare della scena (vedi core.palette)
+    
+    @staticmethod
+    def new_param_node(tree: NodeTree, label: str) -> Node:
+        """
+        Il metodo crea un nodo che legge un parametro di rendering dall'attributo dell'oggetto.
+        Il valore viene scritto sugli oggetti e non nel grafo, quindi cambiarlo non ricompila gli shader.
         
-        r, g, b = [int(hex_color[i:i+2], 16)  / 255 for i in (0, 2, 4)]
+        Args:
+            - tree: l'albero in cui creare il nodo.
+            - label: l'etichetta del parametro (una chiave di const.SHADER_PARAMS).
+            
+        Returns:
+            - il nodo attributo; il valore è sull'uscita "Fac".
+        """
         
-        return Color((r, g, b)).from_srgb_to_scene_linear()  # per mantenere la coerenza con il colore
+        node: Node = tree.nodes.new("ShaderNodeAttribute")
+        node.attribute_type = "OBJECT"
+        node.attribute_name = const.SHADER_PARAMS[label]
+        node.label = label
+        return node
     
     @staticmethod
     def new_material(name: str, material_type) -> Material:
@@ -106,7 +107,7 @@ class PixelArtMaterialsUtils:
         
         mix_node: Node = material.node_tree.nodes.new("ShaderNodeMixRGB")
         color: Color = color_gradient.border
-        mix_node.inputs[2].default_value = color.r, color.g, color.b, 1  # il colore del bordo dell'immagine
+        mix_node.inputs[2].default_value = (*color, 1)  # il colore del bordo dell'immagine
         mix_node.location = (-400, 0)
         return mix_node
     
@@ -115,10 +116,8 @@ class PixelArtMaterialsUtils:
         """
         Il metodo genera il nodo per la gestione del bordo
         """
-        border_node: Node = material.node_tree.nodes.new("ShaderNodeValue")
+        border_node: Node = PixelArtMaterialsUtils.new_param_node(material.node_tree, "IsBorder")
         border_node.location = (-700, 100)
-        border_node.label = "IsBorder"
-        border_node.outputs[0].default_value = 0
         return border_node
     
     @staticmethod
@@ -142,7 +141,7 @@ class PixelArtMaterialsUtils:
         # Impostiamo i colori
         for i, (position, color) in enumerate(sorted_gradients):
             ramp_node.color_ramp.elements[i].position = position
-            ramp_node.color_ramp.elements[i].color = (color.r, color.g, color.b, 1)
+            ramp_node.color_ramp.elements[i].color = (*color, 1)
 
         return ramp_node
     
@@ -170,8 +169,8 @@ class PixelArtMaterialsUtils:
         node: Node = material.node_tree.nodes.new("ShaderNodeTexChecker")
         node.location = (-1300, -1000)
         
-        node.inputs[1].default_value = color.light.r, color.light.g, color.light.b, 1
-        node.inputs[2].default_value = color.dark.r, color.dark.g, color.dark.b, 1
+        node.inputs[1].default_value = (*color.light, 1)
+        node.inputs[2].default_value = (*color.dark, 1)
         
         return node
     
@@ -213,9 +212,8 @@ class PixelArtMaterialsUtils:
         Il metodo setta il nodo che contiene la risoluzione x dell'immagine
         """ 
         
-        node: Node = material.node_tree.nodes.new("ShaderNodeValue")
+        node: Node = PixelArtMaterialsUtils.new_param_node(material.node_tree, "ResolutionX")
         node.location = (-1900, -800)
-        node.label = "ResolutionX"
         return node
     
     @staticmethod
@@ -234,9 +232,8 @@ class PixelArtMaterialsUtils:
         Il metodo setta il nodo che contiene la risoluzione y dell'immagine
         """
         
-        node: Node = material.node_tree.nodes.new("ShaderNodeValue")
+        node: Node = PixelArtMaterialsUtils.new_param_node(material.node_tree, "ResolutionY")
         node.location = (-1900, -1400)
-        node.label = "ResolutionY"
         return node
     
     @staticmethod
@@ -249,6 +246,63 @@ class PixelArtMaterialsUtils:
         node.location = (-2100, -1400)
         return node
     
+    @staticmethod
+    def is_pixelize(material: Material) -> bool:
+        """
+        Il metodo verifica se il materiale è un materiale pixelize (cioè se usa il gruppo di mapping della camera).
+        """
+        
+        if not material.use_nodes or material.node_tree is None: return False
+        return any(node.bl_idname == "ShaderNodeGroup" and node.node_tree is not None and node.node_tree.name == const.CAMERA_MAPPING_GROUP
+                   for node in material.node_tree.nodes)
+    
+    @staticmethod
+    def next_pass_index() -> int:
+        """
+        Il metodo restituisce il primo indice di pass libero per i materiali pixelize (lo 0 è riservato allo sfondo).
+        """
+        
+        indices: list[int] = [material.pass_index for material in bpy.data.materials if PixelArtMaterialsUtils.is_pixelize(material)]
+        return max(indices, default = 0) + 1
+    
+    @staticmethod
+    def set_gbuffer_nodes(material: Material) -> None:
+        """
+        Il metodo aggiunge al materiale i nodi usati dalla pipeline G-buffer: uno shader diffuso bianco, selezionato
+        dall'attributo GBuffer al posto dell'emissione, e un'uscita AOV con l'indice del materiale.
+        I materiali creati dalle versioni precedenti vengono aggiornati alla prima esecuzione.
+        """
+        
+        nodes = material.node_tree.nodes
+        if any(node.bl_idname == "ShaderNodeOutputAOV" for node in nodes): return  # già predisposto
+        if material.pass_index == 0: material.pass_index = PixelArtMaterialsUtils.next_pass_index()
+        
+        emission_node: Node = nodes["Emission"]
+        output_node: Node = nodes["Material Output"]
+        
+        diffuse_node: Node = nodes.new("ShaderNodeBsdfPrincipled")
+        diffuse_node.location = (-500, 600)
+        diffuse_node.inputs[0].default_value = (1, 1, 1, 1)  # come il materiale di override diffuse
+        
+        gbuffer_node: Node = PixelArtMaterialsUtils.new_param_node(material.node_tree, "GBuffer")
+        gbuffer_node.location = (-200, 300)
+        
+        shader_mix_node: Node = nodes.new("ShaderNodeMixShader")
+        shader_mix_node.location = (0, 200)
+        
+        aov_node: Node = nodes.new("ShaderNodeOutputAOV")
+        aov_node.location = (200, -200)
+        aov_node.aov_name = const.GBUFFER_AOV
+        aov_node.inputs["Value"].default_value = material.pass_index
+        
+        output_node.location = (200, 0)
+        
+        links = material.node_tree.links
+        links.new(gbuffer_node.outputs["Fac"], shader_mix_node.inputs["Fac"])
+        links.new(emission_node.outputs["Emission"], shader_mix_node.inputs[1])
+        links.new(diffuse_node.outputs["BSDF"], shader_mix_node.inputs[2])
+        links.new(shader_mix_node.outputs["Shader"], output_node.inputs["Surface"])
+    
     @staticmethod
     def create_material(name: str, color: PixelizeColor) -> bool:
         """
@@ -282,9 +336,9 @@ class PixelArtMaterialsUtils:
         links = material.node_tree.links
         links.new(tex_coord_node.outputs["Window"], separate_node.inputs["Vector"])
         links.new(separate_node.outputs["X"], mul_x_node.inputs[0])
-        links.new(res_x_node.outputs["Value"], mul_x_node.inputs[1])
+        links.new(res_x_node.outputs["Fac"], mul_x_node.inputs[1])
         links.new(separate_node.outputs["Y"], mul_y_node.inputs[0])
-        links.new(res_y_node.outputs["Value"], mul_y_node.inputs[1])
+        links.new(res_y_node.outputs["Fac"], mul_y_node.inputs[1])
         links.new(mul_x_node.outputs["Value"], combine_node.inputs["X"])
         links.new(mul_y_node.outputs["Value"], combine_node.inputs["Y"])
         links.new(combine_node.outputs["Vector"], checker_node.inputs["Vector"])
@@ -292,9 +346,10 @@ class PixelArtMaterialsUtils:
         links.new(checker_node.outputs["Color"], add_node.inputs["Color2"])
         links.new(add_node.outputs["Color"], ramp_node.inputs["Fac"])
         links.new(ramp_node.outputs["Color"], mix_node.inputs["Color1"])
-        links.new(border_node.outputs["Value"], mix_node.inputs["Fac"])
+        links.new(border_node.outputs["Fac"], mix_node.inputs["Fac"])
         links.new(mix_node.outputs["Color"], material.node_tree.nodes["Emission"].inputs["Color"])
         
+        PixelArtMaterialsUtils.set_gbuffer_nodes(material)
         return True
     
     
@@ -307,7 +362,7 @@ class ImportColorPalette(Operator):
     bl_label: str = "Import Color Palette"
     
     @staticmethod
-    def read_palette_file(path: str) -> dict[str, Color]:
+    def read_palette_file(path: str) -> dict[str, PixelizeColor]:
         """
         Il metodo consente la lettura dei codici esadecimali da un file
         
@@ -315,30 +370,10 @@ class ImportColorPalette(Operator):
             - path: il path del file da aprire.
             
         Returns:
-            - la lista dei codice esadecimali.
+            - a ogni nome di materiale associa i suoi colori (vedi core.palette.PaletteUtils.read_colors).
         """
         
-        with open(path, "r") as file:
-            data: dict[str, Any] = json.load(file)  # carica i dati dal file
-            
-        palette: dict[str, Color] = {}
-        for color_name, material_data in data.items():
-            print(color_name)
-            print(material_data)
-            
-            material_color: PixelizeColor = PixelizeColor(
-                
-                gradients = {float(level): PixelArtMaterialsUtils.hex_to_color(material_data['gradients'][level]) for level in material_data['gradients']},  # carica i gradienti
-                border = PixelArtMaterialsUtils.hex_to_color(material_data['border']),
-                dithering = material_data['dithering'],
-                light = PixelArtMaterialsUtils.hex_to_color(material_data['light']) if material_data['light'] is not None else Color((255, 255, 255)),
-                dark = PixelArtMaterialsUtils.hex_to_color(material_data['dark']) if material_data['dark'] is not None else Color((0, 0, 0))
-                   
-            )
-            
-            palette[color_name] = material_color
-            
-        return palette
+        return palette.PaletteUtils.read_colors(path)
     
     @staticmethod
     def execute(self, context: Context):
@@ -351,8 +386,8 @@ class ImportColorPalette(Operator):
         if not os.path.exists(path): 
             raise FileNotFoundError(f"il file '{path}' non esiste")
         
-        palette: dict[str, PixelizeColor] = ImportColorPalette.read_palette_file(path)  # carica la palette
-        for name, color in palette.items():
+        colors: dict[str, PixelizeColor] = ImportColorPalette.read_palette_file(path)  # carica la palette
+        for name, color in colors.items():
             PixelArtMaterialsUtils.create_material(name, color)
         
         return {'FINISHED'}
@@ -35,6 +35,18 @@ class RenderingPanel(Panel):
         layout.prop(scene.pixel_props, "preview_samples")
         layout.prop(scene.pixel_props, "final_samples")
         layout.prop(scene.pixel_props, "center_frame")
+        if scene.pixel_props.center_frame: layout.prop(scene.pixel_props, "anchor_frames")
+        layout.prop(scene.pixel_props, "pipeline_mode")
+        
+        # ... contorni (la pipeline G-buffer li calcola sempre in spazio immagine) ...
+        if scene.pixel_props.pipeline_mode == "MULTIPASS": layout.prop(scene.pixel_props, "outline_mode")
+        if scene.pixel_props.pipeline_mode == "GBUFFER" or scene.pixel_props.outline_mode == "IMAGE":
+            layout.prop(scene.pixel_props, "outline_inside")
+            layout.prop(scene.pixel_props, "outline_outside")
+            layout.prop(scene.pixel_props, "outline_depth")
+            layout.prop(scene.pixel_props, "outline_crease")
+            layout.prop(scene.pixel_props, "outline_material_boundaries")
+            layout.prop(scene.pixel_props, "store_lighting")
         
         # ... tasto per il nuovo materiale ...
         layout.operator("render.pixelart_preview")
@@ -44,8 +56,45 @@ class RenderingPanel(Panel):
         # ... rendering avanzato ...
         layout.prop(scene.pixel_props, "subject")
         layout.prop(scene.pixel_props, "frame_size")
+        layout.prop(scene.pixel_props, "sheet_format")
+        if scene.pixel_props.sheet_format == "PNG":
+            layout.prop(scene.pixel_props, "indexed_output")
+        layout.prop(scene.pixel_props, "quantize_output")
+        if scene.pixel_props.quantize_output:
+            layout.prop(scene.pixel_props, "quantize_bins")
+        layout.prop(scene.pixel_props, "sheet_layout")
+        if scene.pixel_props.sheet_layout == "ATLAS":
+            layout.prop(scene.pixel_props, "atlas_max_size")
+            layout.prop(scene.pixel_props, "atlas_padding")
+        layout.prop(scene.pixel_props, "cache_enabled")
+        if scene.pixel_props.cache_enabled:
+            layout.prop(scene.pixel_props, "cache_dir")
+            layout.prop(scene.pixel_props, "cache_size")
         layout.operator("render.multi_angle")
+        layout.prop(scene.pixel_props, "farm_mode")
+        if scene.pixel_props.farm_mode:
+            layout.prop(scene.pixel_props, "farm_workers")
         layout.operator("render.multiangle_animation")
+        layout.operator("render.rebuild_spritesheets")
+        
+        # ... aggiornamento di alcuni sprite ...
+        layout.prop(scene.pixel_props, "patch_sheet")
+        layout.prop(scene.pixel_props, "patch_frames")
+        layout.prop(scene.pixel_props, "patch_angles")
+        layout.operator("render.patch_spritesheet")
+        
+        # ... coda di rendering condivisa ...
+        layout.prop(scene.pixel_props, "queue_dir")
+        if scene.pixel_props.queue_dir:
+            layout.prop(scene.pixel_props, "queue_lease")
+            layout.prop(scene.pixel_props, "queue_local_workers")
+            layout.operator("render.queue_submit")
+            layout.operator("render.queue_assemble")
+        
+        # ... profilazione dei job ...
+        layout.prop(scene.pixel_props, "profile_enabled")
+        if scene.pixel_props.profile_enabled:
+            layout.prop(scene.pixel_props, "profile_dir")
         
 
 class PixelArtMaterialPanel(Panel):
@@ -74,4 +123,11 @@ class PixelArtMaterialPanel(Panel):
         #layout.operator("material.create")
         layout.operator("material.palette")
         layout.operator("material.new_material")
+        layout.operator("render.pixelart_resolve_palette")
+        layout.prop(scene.pixel_props, "lighting_dir")
+        
+        # ... precisione dei buffer ...
+        layout.prop(scene.pixel_props, "diffuse_storage")
+        layout.prop(scene.pixel_props, "freestyle_storage")
+        layout.prop(scene.pixel_props, "border_storage")
         layout.operator("material.clear_buffers")
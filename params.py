@@ -0,0 +1,114 @@
+"""
+Il modulo gestisce i parametri di rendering letti dagli shader pixelize
+"""
+
+import bpy
+from bpy.types import Scene, Node, NodeTree, NodeSocket, Object
+
+from . import const
+from . import materials
+from . import registry
+
+
+class ShaderParams:
+    """
+    La classe raccoglie le funzionalità per passare agli shader i parametri di rendering (pass di bordo, G-buffer,
+    scala e risoluzione della camera) senza modificare i grafi dei materiali.
+    I valori vengono scritti come proprietà degli oggetti e letti dai nodi attributo: Cycles li aggiorna come dati
+    dell'oggetto, senza ricompilare gli shader.
+    """
+
+    @staticmethod
+    def migrate_tree(tree: NodeTree) -> bool:
+        """
+        Il metodo sostituisce i nodi Value etichettati, usati dalle versioni precedenti, con i nodi attributo.
+
+        Returns:
+            - True se il grafo è stato modificato.
+        """
+
+        changed: bool = False
+        for node in list(tree.nodes):
+            if node.bl_idname != "ShaderNodeValue" or node.label not in const.SHADER_PARAMS: continue
+
+            param_node: Node = materials.PixelArtMaterialsUtils.new_param_node(tree, node.label)
+            param_node.location = node.location
+            targets: list[NodeSocket] = [link.to_socket for link in node.outputs[0].links]
+            name: str = node.name
+
+            tree.nodes.remove(node)
+            param_node.name = name  # il gruppo di mapping cerca i nodi per nome
+            for socket in targets: tree.links.new(param_node.outputs["Fac"], socket)
+            changed = True
+
+        return changed
+
+    @staticmethod
+    def migrate() -> None:
+        """
+        Il metodo aggiorna i materiali pixelize e il gruppo di mapping creati dalle versioni precedenti.
+        L'indice dei nodi rende il controllo immediato quando non c'è nulla da convertire.
+        """
+
+        trees: dict[int, NodeTree] = {node.id_data.as_pointer(): node.id_data for node in registry.NodeRegistry.legacy_nodes()}
+        for tree in trees.values(): ShaderParams.migrate_tree(tree)
+        if trees: registry.NodeRegistry.invalidate()  # i nodi indicizzati sono stati sostituiti
+
+    @staticmethod
+    def values(scene: Scene, is_border: bool = False, use_gbuffer: bool = False) -> dict[str, float]:
+        """
+        Il metodo calcola il valore di ogni attributo letto dagli shader.
+        """
+
+        return {
+            const.SHADER_PARAMS["IsBorder"]: 1.0 if is_border else 0.0,
+            const.SHADER_PARAMS["GBuffer"]: 1.0 if use_gbuffer else 0.0,
+            const.SHADER_PARAMS["CameraScale"]: scene.camera.data.ortho_scale if scene.camera is not None else 1.0,
+            const.SHADER_PARAMS["ResolutionX"]: float(scene.render.resolution_x),
+            const.SHADER_PARAMS["ResolutionY"]: float(scene.render.resolution_y),
+        }
+
+    @staticmethod
+    def apply(scene: Scene, is_border: bool = False, use_gbuffer: bool = False) -> None:
+        """
+        Il metodo scrive i parametri sugli oggetti pixelize, toccando solo quelli il cui valore è cambiato.
+        """
+
+        values: dict[str, float] = ShaderParams.values(scene, is_border, use_gbuffer)
+        for obj in registry.NodeRegistry.targets(scene):
+            changed: bool = False
+            for key, value in values.items():
+                if obj.get(key) != value:
+                    obj[key] = value
+                    changed = True
+
+            if changed: obj.update_tag(refresh = {"OBJECT"})  # aggiorna solo i dati dell'oggetto, non la geometria
+
+    @staticmethod
+    def mapping_source(scene: Scene) -> NodeSocket:
+        """
+        Il metodo restituisce l'uscita che deve pilotare la texture del gruppo di mapping, in base al tipo di camera e all'orientamento.
+        """
+
+        nodes = bpy.data.node_groups[const.CAMERA_MAPPING_GROUP].nodes
+        is_landscape: bool = scene.render.resolution_x >= scene.render.resolution_y
+
+        if scene.camera.type == "ORTHO" and is_landscape: return nodes["Vector Math"].outputs[0]
+        return nodes["CoordNode"].outputs[5]  # CameraMappingGroupSetting.CAMERA_COORD_NODE
+
+    @staticmethod
+    def set_mapping_link(scene: Scene) -> bool:
+        """
+        Il metodo collega la texture del gruppo di mapping solo se il collegamento richiesto è cambiato.
+
+        Returns:
+            - True se il grafo è stato modificato.
+        """
+
+        group: NodeTree = bpy.data.node_groups[const.CAMERA_MAPPING_GROUP]
+        source: NodeSocket = ShaderParams.mapping_source(scene)
+        target: NodeSocket = group.nodes["Image Texture"].inputs[0]
+
+        if target.is_linked and target.links[0].from_socket == source: return False
+        group.links.new(source, target)
+        return True
@@ -5,6 +5,43 @@ Il modulo gestisce le proprietà aggiunte dall'add-on
 import bpy
 from bpy.types import Camera
 
+# ... precisioni disponibili per i buffer ...
+BUFFER_STORAGE_ITEMS: list[tuple[str, str, str]] = [
+    ("BYTE", "Byte", "8 bit per canale, valori limitati a [0, 1]"),
+    ("HALF", "Half", "buffer float, copie in memoria a 16 bit"),
+    ("FLOAT", "Float", "buffer float, copie in memoria a 32 bit"),
+]
+
+# ... pipeline di rendering disponibili ...
+PIPELINE_ITEMS: list[tuple[str, str, str]] = [
+    ("MULTIPASS", "Multi-Pass", "quattro rendering per frame: diffuse, freestyle, bordo e composizione"),
+    ("GBUFFER", "G-Buffer", "un solo rendering per frame, lo sprite viene ricostruito dai pass"),
+]
+
+# ... origine dei contorni nella pipeline multi-pass ...
+OUTLINE_ITEMS: list[tuple[str, str, str]] = [
+    ("FREESTYLE", "Freestyle", "linee e bordo da due rendering dedicati (Freestyle e IsBorder)"),
+    ("IMAGE", "Image", "linee e bordo calcolati in spazio immagine dai pass del G-buffer, senza rendering aggiuntivi"),
+]
+
+# ... formati delle spritesheet ...
+SHEET_FORMAT_ITEMS: list[tuple[str, str, str]] = [
+    ("PNG", "PNG", "PNG RGBA a 8 bit, scritto in streaming"),
+    ("RAW", "Raw RGBA", "pixel RGBA a 8 bit senza intestazione (.rgba)"),
+]
+
+# ... disposizione degli sprite ...
+SHEET_LAYOUT_ITEMS: list[tuple[str, str, str]] = [
+    ("GRID", "Grid", "una cella di frame_size pixel per ogni sprite"),
+    ("ATLAS", "Atlas", "sprite ritagliati, deduplicati e impacchettati in pagine, con un indice JSON"),
+]
+
+# ... spritesheet aggiornabili a fasce ...
+PATCH_SHEET_ITEMS: list[tuple[str, str, str]] = [
+    ("animation", "Animation", "la spritesheet di Render MultiAngle Animation"),
+    ("multiangle", "Multi-Angle", "la spritesheet di Multi-Angle Rendering"),
+]
+
 # ... proprietà per la GUI ...
 class PixelizeProperties(bpy.types.PropertyGroup):
     """
@@ -22,6 +59,43 @@ class PixelizeProperties(bpy.types.PropertyGroup):
     subject: bpy.props.PointerProperty(name="Subject", type = bpy.types.Object)
     frame_size: bpy.props.IntProperty(name = "Frame Size", default = 64)
     center_frame: bpy.props.BoolProperty(name = "Center Frame", default = False)
+    anchor_frames: bpy.props.BoolProperty(name = "Shared Anchor", default = False)  # centra i frame sull'unione dei contenuti
+    sheet_format: bpy.props.EnumProperty(name = "Sheet Format", items = SHEET_FORMAT_ITEMS, default = "PNG")
+    sheet_layout: bpy.props.EnumProperty(name = "Sheet Layout", items = SHEET_LAYOUT_ITEMS, default = "GRID")
+    indexed_output: bpy.props.BoolProperty(name = "Indexed Colors", default = False)  # PNG a colori indicizzati con la palette di color_palette
+    quantize_output: bpy.props.BoolProperty(name = "Snap to Palette", default = False)  # riporta sulla palette i colori prodotti da denoising e compositor
+    quantize_bins: bpy.props.IntProperty(name = "Palette LUT Bins", default = 64, min = 8, max = 256)
+    farm_mode: bpy.props.BoolProperty(name = "Render Farm", default = False)  # animazioni multi-angolo con più processi 'blender -b'
+    farm_workers: bpy.props.IntProperty(name = "Farm Workers", default = 0, min = 0, soft_max = 32)  # 0 per sceglierli in base a core e risoluzione
+    queue_dir: bpy.props.StringProperty(name = "Queue Directory", default = "", subtype = "DIR_PATH")  # cartella condivisa della coda di rendering
+    queue_lease: bpy.props.FloatProperty(name = "Queue Lease", default = 120.0, min = 5.0, unit = "TIME_ABSOLUTE")  # secondi prima che il lock di un worker scada
+    queue_local_workers: bpy.props.IntProperty(name = "Local Queue Workers", default = 0, min = 0, soft_max = 16)
+    cache_enabled: bpy.props.BoolProperty(name = "Sprite Cache", default = False)  # riusa gli sprite la cui impronta non è cambiata
+    cache_dir: bpy.props.StringProperty(name = "Cache Directory", default = "", subtype = "DIR_PATH")  # vuota per usare la cartella del progetto
+    cache_size: bpy.props.IntProperty(name = "Cache Size (MB)", default = 1024, min = 16)
+    patch_sheet: bpy.props.EnumProperty(name = "Patch Sheet", items = PATCH_SHEET_ITEMS, default = "animation")
+    patch_frames: bpy.props.StringProperty(name = "Patch Frames", default = "")  # ad esempio '40-55, 60'; vuoto per il frame corrente
+    patch_angles: bpy.props.StringProperty(name = "Patch Angles", default = "")  # in gradi, ad esempio '0, 45'; vuoto per tutti
+    profile_enabled: bpy.props.BoolProperty(name = "Profile Jobs", default = False)  # trace dei tempi e della memoria di ogni job
+    profile_dir: bpy.props.StringProperty(name = "Profile Directory", default = "", subtype = "DIR_PATH")  # vuota per usare la cartella del progetto
+    atlas_max_size: bpy.props.IntProperty(name = "Atlas Max Size", default = 2048, min = 16, soft_max = 16384)
+    atlas_padding: bpy.props.IntProperty(name = "Atlas Padding", default = 0, min = 0, soft_max = 8)
+    pipeline_mode: bpy.props.EnumProperty(name = "Pipeline", items = PIPELINE_ITEMS, default = "MULTIPASS")
+    
+    # proprietà per i contorni
+    outline_mode: bpy.props.EnumProperty(name = "Outline", items = OUTLINE_ITEMS, default = "FREESTYLE")
+    outline_inside: bpy.props.IntProperty(name = "Inside Thickness", default = 1, min = 0, soft_max = 8)
+    outline_outside: bpy.props.IntProperty(name = "Outside Thickness", default = 0, min = 0, soft_max = 8)
+    outline_depth: bpy.props.FloatProperty(name = "Depth Threshold", default = 4.0, min = 0.0, soft_max = 32.0)  # in pixel della camera
+    outline_crease: bpy.props.FloatProperty(name = "Crease Angle", default = 134.43, min = 0.0, max = 180.0)  # in gradi, come in Freestyle
+    outline_material_boundaries: bpy.props.BoolProperty(name = "Material Boundaries", default = False)
+    store_lighting: bpy.props.BoolProperty(name = "Store Lighting Data", default = False)  # salva illuminazione e materiali per ricolorare gli sprite
+    lighting_dir: bpy.props.StringProperty(name = "Lighting Directory", default = "", subtype = "DIR_PATH")  # vuota per le cartelle di output dei job
+    
+    # proprietà per i buffer
+    diffuse_storage: bpy.props.EnumProperty(name = "Diffuse Storage", items = BUFFER_STORAGE_ITEMS, default = "FLOAT")
+    freestyle_storage: bpy.props.EnumProperty(name = "FreeStyle Storage", items = BUFFER_STORAGE_ITEMS, default = "BYTE")
+    border_storage: bpy.props.EnumProperty(name = "Border Storage", items = BUFFER_STORAGE_ITEMS, default = "BYTE")
     
     # proprietà per i materiali
     color_palette: bpy.props.StringProperty(name = "Palette Path", default = "")
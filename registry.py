@@ -0,0 +1,216 @@
+"""
+Il modulo gestisce l'indice dei nodi pixelize e l'applicazione incrementale dello stato di rendering
+"""
+
+import bpy
+from bpy.types import Scene, Node, Material, Object
+from bpy.app.handlers import persistent
+from typing import Any, Optional
+
+from . import const
+
+
+class NodeRegistry:
+    """
+    La classe indicizza una sola volta i materiali pixelize e i loro nodi etichettati.
+    L'indice viene ricostruito quando vengono aggiunti o rimossi materiali o gruppi di nodi,
+    e invalidato al caricamento del file e dopo un undo/redo.
+    """
+
+    _signature: Optional[frozenset[int]] = None  # puntatori dei materiali e dei gruppi indicizzati
+    _materials: list[Material] = []  # materiali pixelize
+    _pointers: set[int] = set()  # puntatori dei materiali pixelize
+    _nodes: dict[str, list[Node]] = {}  # nodi etichettati, raggruppati per etichetta
+    _typed: dict[int, dict[str, list[Node]]] = {}  # nodi dei materiali pixelize, raggruppati per tipo
+
+    TYPED_NODES: set[str] = {"ShaderNodeValToRGB", "ShaderNodeTexChecker", "ShaderNodeMixRGB", "ShaderNodeOutputAOV"}  # tipi indicizzati
+
+    @staticmethod
+    def invalidate() -> None:
+        """
+        Il metodo forza la ricostruzione dell'indice al prossimo accesso.
+        """
+
+        NodeRegistry._signature = None
+        NodeRegistry._materials = []
+        NodeRegistry._pointers = set()
+        NodeRegistry._nodes = {}
+        NodeRegistry._typed = {}
+
+    @staticmethod
+    def _current_signature() -> frozenset[int]:
+        """
+        Il metodo calcola la firma dei datablock indicizzati.
+        """
+
+        return frozenset(material.as_pointer() for material in bpy.data.materials) | frozenset(group.as_pointer() for group in bpy.data.node_groups)
+
+    @staticmethod
+    def refresh() -> None:
+        """
+        Il metodo ricostruisce l'indice se i materiali o i gruppi di nodi sono cambiati.
+        """
+
+        signature: frozenset[int] = NodeRegistry._current_signature()
+        if signature == NodeRegistry._signature: return
+
+        NodeRegistry.invalidate()
+        trees: list = []
+        for material in bpy.data.materials:
+            if not material.use_nodes or material.node_tree is None: continue
+            if any(node.bl_idname == "ShaderNodeGroup" and node.node_tree is not None and node.node_tree.name == const.CAMERA_MAPPING_GROUP
+                   for node in material.node_tree.nodes):
+                NodeRegistry._materials.append(material)
+                NodeRegistry._pointers.add(material.as_pointer())
+                trees.append(material.node_tree)
+
+        if const.CAMERA_MAPPING_GROUP in bpy.data.node_groups: trees.append(bpy.data.node_groups[const.CAMERA_MAPPING_GROUP])
+
+        for tree in trees:
+            typed: dict[str, list[Node]] = NodeRegistry._typed.setdefault(tree.as_pointer(), {})
+            for node in tree.nodes:
+                if node.label in const.SHADER_PARAMS: NodeRegistry._nodes.setdefault(node.label, []).append(node)
+                if node.bl_idname in NodeRegistry.TYPED_NODES: typed.setdefault(node.bl_idname, []).append(node)
+
+        NodeRegistry._signature = signature
+
+    @staticmethod
+    def materials() -> list[Material]:
+        """
+        Il metodo restituisce i materiali pixelize.
+        """
+
+        NodeRegistry.refresh()
+        return NodeRegistry._materials
+
+    @staticmethod
+    def nodes(label: str) -> list[Node]:
+        """
+        Il metodo restituisce i nodi pixelize con l'etichetta indicata.
+        """
+
+        NodeRegistry.refresh()
+        return NodeRegistry._nodes.get(label, [])
+
+    @staticmethod
+    def material_nodes(material: Material, bl_idname: str) -> list[Node]:
+        """
+        Il metodo restituisce i nodi del tipo indicato (uno di TYPED_NODES) presenti nel materiale pixelize.
+        """
+
+        NodeRegistry.refresh()
+        return NodeRegistry._typed.get(material.node_tree.as_pointer(), {}).get(bl_idname, [])
+
+    @staticmethod
+    def legacy_nodes() -> list[Node]:
+        """
+        Il metodo restituisce i nodi Value etichettati delle versioni precedenti, ancora da convertire in attributi.
+        """
+
+        NodeRegistry.refresh()
+        return [node for nodes in NodeRegistry._nodes.values() for node in nodes if node.bl_idname == "ShaderNodeValue"]
+
+    @staticmethod
+    def is_pixelize(material: Material) -> bool:
+        """
+        Il metodo verifica, tramite l'indice, se il materiale è pixelize.
+        """
+
+        NodeRegistry.refresh()
+        return material.as_pointer() in NodeRegistry._pointers
+
+    @staticmethod
+    def targets(scene: Scene) -> list[Object]:
+        """
+        Il metodo restituisce gli oggetti della scena che usano almeno un materiale pixelize.
+        """
+
+        NodeRegistry.refresh()
+        pointers: set[int] = NodeRegistry._pointers
+        return [obj for obj in scene.objects
+                if any(slot.material is not None and slot.material.as_pointer() in pointers for slot in obj.material_slots)]
+
+
+class RenderState:
+    """
+    La classe applica lo stato di rendering desiderato confrontandolo con quello corrente
+    e scrivendo solo le proprietà che cambiano.
+    Lo stato è descritto da un dizionario che associa ai percorsi ('scene.cycles.samples', 'view_layer.material_override', ...) il valore richiesto.
+    """
+
+    @staticmethod
+    def _resolve(scene: Scene, path: str) -> tuple[Any, str]:
+        """
+        Il metodo risolve il percorso nella coppia (proprietario, attributo).
+        """
+
+        root, *attrs = path.split(".")
+        owner: Any = scene if root == "scene" else bpy.context.view_layer
+        for attr in attrs[:-1]: owner = getattr(owner, attr)
+        return owner, attrs[-1]
+
+    @staticmethod
+    def diff(scene: Scene, desired: dict[str, Any]) -> dict[str, Any]:
+        """
+        Il metodo restituisce le sole voci dello stato desiderato diverse dallo stato corrente.
+        """
+
+        changes: dict[str, Any] = {}
+        for path, value in desired.items():
+            owner, attr = RenderState._resolve(scene, path)
+            if getattr(owner, attr) != value: changes[path] = value
+        return changes
+
+    @staticmethod
+    def apply(scene: Scene, desired: dict[str, Any]) -> dict[str, Any]:
+        """
+        Il metodo scrive le proprietà cambiate.
+
+        Returns:
+            - le voci effettivamente scritte.
+        """
+
+        changes: dict[str, Any] = RenderState.diff(scene, desired)
+        for path, value in changes.items():
+            owner, attr = RenderState._resolve(scene, path)
+            setattr(owner, attr, value)
+        return changes
+
+    @staticmethod
+    def capture(scene: Scene, paths: list[str]) -> dict[str, Any]:
+        """
+        Il metodo legge lo stato corrente delle proprietà indicate (utile per ripristinarlo in seguito).
+        """
+
+        state: dict[str, Any] = {}
+        for path in paths:
+            owner, attr = RenderState._resolve(scene, path)
+            state[path] = getattr(owner, attr)
+        return state
+
+
+@persistent
+def _invalidate_handler(*args) -> None:
+    """
+    Handler che invalida l'indice quando i riferimenti ai dati non sono più validi.
+    """
+
+    NodeRegistry.invalidate()
+
+
+def register_handlers() -> None:
+    """
+    Registra gli handler che invalidano l'indice.
+    """
+
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if _invalidate_handler not in handlers: handlers.append(_invalidate_handler)
+
+
+def unregister_handlers() -> None:
+    """
+    Rimuove gli handler che invalidano l'indice.
+    """
+
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if _invalidate_handler in handlers: handlers.remove(_invalidate_handler)
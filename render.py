@@ -5,18 +5,27 @@ Il modulo offre le funzionalità necessarie per la gestione del rendering
 import bpy
 from bpy.types import Node, Scene, Operator, Context
 import subprocess
-from typing import Optional
+from typing import Any, Callable, Optional
 import os
-import math
-import sys
-
-# ... installazione di Pillow per il post processing (se manca) ...
-subprocess.check_call([sys.executable, "-m", "pip", "install", "Pillow"])
-from PIL import Image
+import time
+import numpy as np
 
+from . import cache as render_cache
+from . import fingerprint
 from . import const
-from . import buffers
-from . import camera
+from . import journal as job_journal
+from . import scheduler
+from . import session
+from . import store as frame_store
+from .core import atlas
+from .core import frames as frame_engine
+from .core import indexed
+from .core import palette
+from .core import pipeline
+from .core import quantize
+from .core import sheet as sheet_writer
+from .core.profiling import Profiler, NULL_SPAN
+from .core.spritesheet import SpritesheetUtils
 
 
 class RenderUtils:
@@ -25,144 +34,437 @@ class RenderUtils:
     """
     
     @staticmethod
-    def set_node_data(node: Node, is_border: bool) -> None:
+    def set_render_settings(samples: int = 1, denoising: bool = False, freestyle: bool = False, diffuse_override: bool = False,
+                                emission_override: bool = False, is_border: bool = False, use_compositor: bool = False, use_gbuffer: bool = False) -> None:
         """
-        Il metodo setta i dati del nodo
+        Il metodo setta i parametri di rendering
         """
-        camera_name: str = bpy.context.scene.camera.name
-        
-        if node.label == "IsBorder":
-            node.outputs[0].default_value = 1 if is_border else 0
-            
-        if node.label == "CameraScale":
-            node.outputs[0].default_value = bpy.data.cameras[camera_name].ortho_scale
             
-        if node.label == "ResolutionX":
-            node.outputs[0].default_value = bpy.data.scenes["Scene"].render.resolution_x
+        config: session.PassConfig = session.PassConfig("custom", None, use_samples = True, denoising = denoising, freestyle = freestyle,
+                                                        diffuse_override = diffuse_override, emission_override = emission_override,
+                                                        is_border = is_border, use_compositor = use_compositor, use_gbuffer = use_gbuffer)
+        session.RenderSession.apply_settings(bpy.context.scene, config, samples)
+        
+    @staticmethod
+    def render_pixel_art(samples, encoder: Optional[indexed.IndexedEncoder] = None, lut: Optional[quantize.PaletteLUT] = None) -> str:
+        """
+        Il metodo gestisce il rendering in pixel art del frame corrente
+        
+        Returns:
+            - il percorso dello sprite salvato.
+        """
             
-        if node.label == "ResolutionY":
-            node.outputs[0].default_value = bpy.data.scenes["Scene"].render.resolution_y 
+        assert bpy.data.filepath  # abort se il file non è salvato
+        scene: Scene = bpy.data.scenes["Scene"]
+        
+        with session.RenderSession(scene, samples) as render_session:
+            path: str = render_session.render([session.RenderItem(scene.frame_current, None, scene.render.filepath)])[0]
+        
+        SpritesheetUtils.convert_frames([path], encoder, lut)
+        return path
+        
+    @staticmethod
+    def indexed_encoder(props) -> Optional[indexed.IndexedEncoder]:
+        """
+        Il metodo restituisce l'encoder a colori indicizzati con la palette di color_palette, oppure None se l'uscita indicizzata non è attiva.
+        """
+        
+        if not props.indexed_output or props.sheet_format != "PNG": return None
+        if not props.color_palette: raise ValueError("l'uscita a colori indicizzati richiede una palette")
+        colors: indexed.IndexedPalette = indexed.IndexedPalette.from_palette(palette.PaletteUtils.read_palette(bpy.path.abspath(props.color_palette)))
+        return indexed.IndexedEncoder(colors)
+    
+    @staticmethod
+    def palette_lut(props) -> Optional[quantize.PaletteLUT]:
+        """
+        Il metodo restituisce la tabella di quantizzazione della palette di color_palette, oppure None se la quantizzazione non è attiva.
+        La tabella viene ricalcolata solo quando cambia il contenuto del file (vedi quantize.PaletteLUT.cached).
+        """
+        
+        if not props.quantize_output: return None
+        if not props.color_palette: raise ValueError("la quantizzazione richiede una palette")
+        path: str = bpy.path.abspath(props.color_palette)
+        colors: np.ndarray = quantize.PaletteLUT.palette_colors(palette.PaletteUtils.read_colors(path))
+        cache_dir: Optional[str] = os.path.join(os.path.dirname(bpy.data.filepath), const.LUT_CACHE_DIR) if bpy.data.filepath else None
+        return quantize.PaletteLUT.cached(path, colors, props.quantize_bins, cache_dir)
+    
+    @staticmethod
+    def report_palette(operator: Operator, encoder: Optional[indexed.IndexedEncoder]) -> None:
+        """
+        Il metodo segnala all'utente i colori degli sprite estranei alla palette (sostituiti con il colore più vicino).
+        """
+        
+        report: str = encoder.report() if encoder is not None else ""
+        if report: operator.report({'WARNING'}, report)
 
     @staticmethod
-    def center_image(img: Image) -> Image:
+    def multiangle_items(directory: str, frames: list[int], angles: Optional[list[int]] = None) -> list[session.RenderItem]:
         """
-        Il metodo centra l'immagine
+        Il metodo restituisce gli sprite di un job multi-angolo: gli angoli (in gradi, gli 8 multipli di 45 se None) di ogni frame,
+        con i percorsi 'frame_<indice>' nella cartella.
         """
         
-        if img.mode != 'RGBA': img = img.convert('RGBA')
-        width, height = img.size
-        pixels = img.load()  # carica i pixel
-        min_x, min_y = width, height  # inizializza i valori minimi
-        max_x, max_y = 0, 0  # inizializza i valori massimi
+        angles = angles if angles is not None else [phi * 45 for phi in range(8)]
+        return [session.RenderItem(frame, angle, os.path.join(directory, f"frame_{idx * len(angles) + phi}"))
+                for idx, frame in enumerate(frames) for phi, angle in enumerate(angles)]
+
+    @staticmethod
+    def render_spritesheet(scene: Scene, items: list[session.RenderItem], subject: Optional[bpy.types.Object], rows: int, cols: int,
+                           output_path: str, encoder: Optional[indexed.IndexedEncoder] = None, lut: Optional[quantize.PaletteLUT] = None,
+                           progress: Optional[Callable[[int, str], None]] = None) -> tuple[Optional[render_cache.CacheStats], int]:
+        """
+        Il metodo renderizza gli sprite e compone la spritesheet durante il rendering.
+        Gli sprite vengono scritti in un archivio di frame accanto alla spritesheet (riapribile per ricomporla senza ripetere il rendering)
+        e ognuno viene elaborato da una pipeline di thread mentre Blender renderizza i successivi.
+        Con lut la spritesheet viene quantizzata sulla palette e con l'encoder scritta a colori indicizzati (l'archivio resta invariato).
+        progress viene chiamata con (indice, percorso) per ogni sprite salvato.
+        Ogni sprite completato viene registrato in un journal: se il job si interrompe, rilanciandolo con gli stessi parametri
+        gli sprite integri dell'archivio vengono riusati e la spritesheet viene composta con quelli vecchi e nuovi.
         
-        for y in range(height):
-            for x in range(width):
-                if pixels[x, y][3] > 0:  # se il pixel non è completamente trasparente
-                    min_x = min(min_x, x)
-                    min_y = min(min_y, y)
-                    max_x = max(max_x, x)
-                    max_y = max(max_y, y)
+        Returns:
+            - le statistiche della cache degli sprite, se attiva, e il numero di sprite ripresi dal journal.
+        """
         
-        if min_x > max_x or min_y > max_y:  # se non ci sono pixel visibili
-            return img.copy()
+        props = scene.pixel_props
+        cache: Optional[render_cache.RenderCache] = RenderUtils.sprite_cache(props)
+        width: int = scene.render.resolution_x * scene.render.resolution_percentage // 100
+        height: int = scene.render.resolution_y * scene.render.resolution_percentage // 100
+        store_path: str = os.path.splitext(output_path)[0] + frame_store.FrameStore.EXTENSION
+        meta: dict = {"rows": rows, "cols": cols, "items": [{"frame": item.frame, "angle": item.angle} for item in items]}
+        journal: job_journal.JobJournal = job_journal.JobJournal(os.path.splitext(output_path)[0] + const.JOURNAL_SUFFIX,
+                                                                 dict(meta, width = width, height = height,
+                                                                      scene = fingerprint.SpriteFingerprint.job_digest(scene).hex()))
         
-        print("CENTERING FRAME")
-        bbox: tuple[int, int, int, int] = (min_x, min_y, max_x + 1, max_y + 1)  # il rettangolo che contiene l'immagine
-        cropped: Image.Image = img.crop(bbox)  # ritaglia l'immagine
+        def record(idx: int, path: str) -> None:
+            journal.record(idx, items[idx].frame, items[idx].angle, store.read(idx))
+            if progress is not None: progress(idx, path)
         
-        center_x, center_y = width // 2, height // 2  # centro dell'immagine
-        cropped_width, cropped_height = cropped.size  # dimensioni dell'immagine ritagliata
-        offset_x  = center_x - cropped_width // 2  # offset orizzontale
-        offset_y  = center_y - cropped_height // 2
-        new_img: Image.Image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-        new_img.paste(cropped, (offset_x, offset_y))
+        store, done = RenderUtils.resume_store(store_path, journal, meta, height, width)
+        try:
+            if props.sheet_layout == "ATLAS":  # l'atlante richiede tutti i frame: viene costruito dall'archivio alla fine del rendering
+                with store:
+                    with session.RenderSession(scene, props.final_samples, subject, on_saved = record, store = store, cache = cache,
+                                               skip = done) as render_session:
+                        render_session.render(items)
+                    RenderUtils.write_atlas(store, output_path, props, encoder, lut)
+            else:
+                RenderUtils.compose_spritesheet(scene, items, subject, rows, cols, output_path, store, done, record, cache, encoder, lut)
+            journal.finish()  # un job interrotto lascia il journal su disco per essere ripreso
+        finally:
+            journal.close()
+        return RenderUtils.close_cache(cache), len(done)
+
+    @staticmethod
+    def resume_store(store_path: str, journal: job_journal.JobJournal, meta: dict, height: int, width: int) -> tuple[frame_store.FrameStore, set[int]]:
+        """
+        Il metodo riapre l'archivio di un job ripreso dal journal, oppure ne crea uno nuovo.
+        
+        Returns:
+            - l'archivio e gli indici degli sprite integri da non renderizzare di nuovo.
+        """
         
-        return new_img
+        if journal.open():
+            if os.path.exists(store_path):
+                store: frame_store.FrameStore = frame_store.FrameStore.open(store_path, "r+")
+                if (store.count, store.meta["height"], store.meta["width"]) == (len(meta["items"]), height, width):
+                    return store, journal.verify(store.frames, store.written)
+                store.close()
+            journal.restart()  # l'archivio del job non c'è più: nessuno sprite riusabile
         
+        return frame_store.FrameStore.create(store_path, len(meta["items"]), height, width, meta), set()
+
     @staticmethod
-    def set_render_settings(samples: int = 1, denoising: bool = False, freestyle: bool = False, diffuse_override: bool = False,
-                                emission_override: bool = False, is_border: bool = False, use_compositor: bool = False) -> None:
+    def compose_spritesheet(scene: Scene, items: list[session.RenderItem], subject: Optional[bpy.types.Object], rows: int, cols: int,
+                            output_path: str, store: frame_store.FrameStore, done: set[int], on_saved: Callable[[int, str], None],
+                            cache: Optional[render_cache.RenderCache] = None, encoder: Optional[indexed.IndexedEncoder] = None,
+                            lut: Optional[quantize.PaletteLUT] = None) -> None:
         """
-        Il metodo setta i parametri di rendering
+        Il metodo renderizza gli sprite mancanti nell'archivio e compone la spritesheet a griglia durante il rendering:
+        una pipeline di thread compone dall'archivio ogni fascia appena i suoi sprite sono stati scritti, mentre Blender renderizza i successivi.
         """
-            
-        scene: Scene = bpy.context.scene
-        view_layer = bpy.context.view_layer
-            
-        # ... settings di base ...
-        scene.cycles.samples = samples
-        scene.cycles.use_denoising = denoising
-        scene.render.use_freestyle = freestyle
-        scene.use_nodes = use_compositor
-        
-        # ... override dei materiali ...
-        view_layer.material_override = None
-        if diffuse_override: view_layer.material_override = bpy.data.materials[const.DIFFUSE_MATERIAL]
-        elif emission_override: view_layer.material_override = bpy.data.materials[const.EMISSION_MATERIAL]
-        
-        for material in bpy.data.materials:
-            if material.use_nodes:
-                for node in material.node_tree.nodes:
-                    RenderUtils.set_node_data(node, is_border)
-        
-        for node_group in bpy.data.node_groups:
-            for node in node_group.nodes:
-                RenderUtils.set_node_data(node, is_border)
         
+        props = scene.pixel_props
+        sheet_width, sheet_height = cols * props.frame_size, rows * props.frame_size
+        with store, SpritesheetUtils.open_writer(output_path, sheet_width, sheet_height, encoder, lut, props.frame_size) as writer:
+            with pipeline.SheetPipeline(store.frames, rows, cols, props.frame_size, props.center_frame, props.anchor_frames,
+                                        writer = writer) as sheet:  # i pixel restano nell'archivio, in memoria solo la fascia in composizione
+                def saved(idx: int, path: str) -> None:
+                    sheet.submit(idx)
+                    on_saved(idx, path)
+                
+                with session.RenderSession(scene, props.final_samples, subject, on_saved = saved, store = store, cache = cache,
+                                           skip = done) as render_session:
+                    render_session.render(items)
+                
+                sheet.result()  # consegna al writer le fasce rimaste
+
     @staticmethod
-    def render_pixel_art(samples) -> None:
+    def profiler(scene: Scene, name: str) -> Any:
         """
-        Il metodo gestisce il rendering in pixel art
+        Il metodo restituisce il profiler del job (vedi core.profiling), oppure un contesto che non misura nulla se la profilazione non è attiva.
+        Il trace viene salvato nella cartella indicata o accanto al progetto, con il nome del job e l'ora di inizio.
         """
-            
-        assert bpy.data.filepath  # abort se il file non è salvato
-        nodes = bpy.data.node_groups[const.CAMERA_MAPPING_GROUP].nodes  # nodi del gruppo di mapping
-        links = bpy.data.node_groups[const.CAMERA_MAPPING_GROUP].links  # collegamenti del gruppo di mapping
-            
-        scene: Scene = bpy.data.scenes["Scene"]
-        resX: int = scene.render.resolution_x
-        resY: int = scene.render.resolution_y
-        isLandscape: bool = resX >= resY
-            
-        if bpy.context.scene.camera.type == "ORTHO" and isLandscape:
-            links.new(nodes["Vector Math"].outputs[0], nodes["Image Texture"].inputs[0])
-        else:
-            links.new(nodes[camera.CameraMappingGroupSetting.CAMERA_COORD_NODE].outputs[5], nodes["Image Texture"].inputs[0])
-            
-        RenderUtils.set_render_settings(samples = samples, denoising = True, diffuse_override = True)
-        buffers.BufferUtils.render_buffer(const.DIFFUSE_BUFFER)
         
-        RenderUtils.set_render_settings(freestyle=True, emission_override=True)
-        buffers.BufferUtils.render_buffer(const.FREESTYLE_BUFFER)
+        props = scene.pixel_props
+        if not props.profile_enabled: return NULL_SPAN
+        directory: str = (bpy.path.abspath(props.profile_dir) if props.profile_dir
+                          else os.path.join(os.path.dirname(bpy.data.filepath), const.LUT_CACHE_DIR, const.PROFILE_DIR))
+        return Profiler(name, os.path.join(directory, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+
+    @staticmethod
+    def sprite_cache(props) -> Optional[render_cache.RenderCache]:
+        """
+        Il metodo apre la cache degli sprite (nella cartella indicata o accanto al progetto), oppure restituisce None se non è attiva.
+        """
         
-        RenderUtils.set_render_settings(is_border=True)
-        buffers.BufferUtils.render_buffer(const.BORDER_BUFFER)
+        if not props.cache_enabled: return None
+        root: str = (bpy.path.abspath(props.cache_dir) if props.cache_dir
+                     else os.path.join(os.path.dirname(bpy.data.filepath), const.LUT_CACHE_DIR, const.CACHE_DIR))
+        return render_cache.RenderCache(root, props.cache_size * 1024 * 1024)
+
+    @staticmethod
+    def close_cache(cache: Optional[render_cache.RenderCache]) -> Optional[render_cache.CacheStats]:
+        """
+        Il metodo chiude la cache, salvando le statistiche cumulative, e restituisce quelle del job.
+        """
         
-        RenderUtils.set_render_settings(use_compositor=True)
-        bpy.ops.render.render(use_viewport = True, write_still = True)
+        if cache is None: return None
+        stats: render_cache.CacheStats = cache.stats
+        cache.close()
+        return stats
+
+    @staticmethod
+    def report_cache(operator: Operator, stats: Optional[render_cache.CacheStats]) -> None:
+        """
+        Il metodo riporta all'utente le statistiche della cache del job.
+        """
         
-        scene.render.use_freestyle = True  # ripristina il freestyle dopo il rendering
+        if stats is not None:
+            operator.report({'INFO'}, f"cache: {stats.hits} sprite riusati, {stats.misses} renderizzati ({stats.hit_rate:.0%}), {stats.evictions} rimossi")
+
+    @staticmethod
+    def report_resumed(operator: Operator, resumed: int) -> None:
+        """
+        Il metodo riporta all'utente gli sprite ripresi dal journal di un job interrotto.
+        """
         
+        if resumed: operator.report({'INFO'}, f"job ripreso: {resumed} sprite già completati")
 
     @staticmethod
-    def create_spritesheet(frames: list[str], rows: int, cols: int, output_path: str, frame_size: int, center_frame: bool):
+    def render_spritesheet_farm(scene: Scene, items: list[session.RenderItem], rows: int, cols: int, output_path: str,
+                                encoder: Optional[indexed.IndexedEncoder] = None, lut: Optional[quantize.PaletteLUT] = None) -> scheduler.FarmPlan:
         """
-        Il metodo consente di sintetizzare una spritesheet a partire da una lista di immagini.
+        Il metodo renderizza gli sprite con la farm locale: più processi 'blender -b' lavorano su una copia del progetto,
+        scrivono nello stesso archivio di frame e la spritesheet viene composta dall'archivio alla fine, come con rebuild_spritesheet.
+        Le durate misurate vengono salvate accanto alla spritesheet per bilanciare meglio il job successivo.
+        
+        Returns:
+            - il dimensionamento usato (worker e thread per worker).
         """
+        
+        from . import farm  # moduli dei job distribuiti: importati solo da chi li usa (vedi __init__)
+        
+        props = scene.pixel_props
+        width: int = scene.render.resolution_x * scene.render.resolution_percentage // 100
+        height: int = scene.render.resolution_y * scene.render.resolution_percentage // 100
+        base: str = os.path.splitext(output_path)[0]
+        store_path: str = base + frame_store.FrameStore.EXTENSION
+        costs_path: str = base + const.FARM_COSTS_SUFFIX
+        blend_path: str = os.path.splitext(bpy.data.filepath)[0] + const.FARM_BLEND_SUFFIX
+        meta: dict = {"rows": rows, "cols": cols, "items": [{"frame": item.frame, "angle": item.angle} for item in items]}
+        
+        shards: list[scheduler.Shard] = scheduler.WorkStealingScheduler.shards([(item.frame, item.angle, item.filepath) for item in items],
+                                                                               const.FARM_SHARD, scheduler.WorkStealingScheduler.load_costs(costs_path))
+        plan: scheduler.FarmPlan = scheduler.FarmPlan.auto(width, height, len(shards), max_workers = props.farm_workers or const.FARM_MAX_WORKERS)
+        if props.farm_workers: plan = scheduler.FarmPlan(min(props.farm_workers, len(shards)), plan.threads)
+        
+        frame_store.FrameStore.create(store_path, len(items), height, width, meta).close()
+        bpy.ops.wm.save_as_mainfile(filepath = blend_path, copy = True)  # i worker vedono anche le modifiche non salvate
+        try:
+            work: scheduler.WorkStealingScheduler = farm.RenderFarm(blend_path, store_path, plan).run(shards)
+        finally:
+            os.remove(blend_path)
+        work.save_costs(costs_path, shards)
+        
+        with frame_store.FrameStore.open(store_path) as store:
+            if not store.complete(): raise RuntimeError(f"la farm non ha renderizzato tutti gli sprite di '{store_path}'")
+        RenderUtils.rebuild_spritesheet(store_path, output_path, props.frame_size, props.center_frame, props.anchor_frames,
+                                        props.sheet_layout, props, encoder, lut)
+        return plan
 
-        img: Image = Image.new("RGBA", (frame_size * cols, frame_size * rows))
+    @staticmethod
+    def submit_queue(scene: Scene, queue_dir: str, frames: list[int], local_workers: int = 0) -> list[subprocess.Popen]:
+        """
+        Il metodo crea nella cartella condivisa la coda di un job multi-angolo: uno sprite per (frame, angolo), con le impostazioni
+        del pass, e una copia del progetto aperta da tutti i worker (vedi farm.QueueWorker).
+        
+        Args:
+            - local_workers: i worker da avviare su questa macchina; gli altri vengono avviati a mano sulle altre macchine.
+        
+        Returns:
+            - i processi dei worker locali.
+        """
+        
+        from . import farm, workqueue
+        
+        props = scene.pixel_props
+        config: dict = {"pipeline_mode": props.pipeline_mode, "outline_mode": props.outline_mode, "samples": props.final_samples}
+        items: list[workqueue.WorkItem] = [workqueue.WorkItem(f"{idx:06d}", idx, item.frame, item.angle, config)
+                                           for idx, item in enumerate(RenderUtils.multiangle_items(queue_dir, frames))]
+        meta: dict = {"rows": 8, "cols": len(frames), "width": scene.render.resolution_x * scene.render.resolution_percentage // 100,
+                      "height": scene.render.resolution_y * scene.render.resolution_percentage // 100}
+        
+        queue: workqueue.WorkQueue = workqueue.WorkQueue(queue_dir)
+        queue.create(items, meta)
+        blend_path: str = os.path.join(queue_dir, const.QUEUE_BLEND)
+        bpy.ops.wm.save_as_mainfile(filepath = blend_path, copy = True)
+        return [subprocess.Popen(farm.QueueWorker.command(blend_path, queue_dir, props.queue_lease)) for _ in range(local_workers)]
 
-        idx: int = 0  # l'indice dell'immagine
-        for col in range(cols):
-            for row in range(rows):
-                path: str = frames[idx]
-                idx += 1
-                frame = Image.open(path + ".png").resize((frame_size, frame_size), Image.NEAREST)
-                
-                if center_frame: frame = RenderUtils.center_image(frame)  # centra l'immagine
-                img.paste(frame, (col * frame_size, row * frame_size))
+    @staticmethod
+    def assemble_queue(queue_dir: str, output_path: str, props, encoder: Optional[indexed.IndexedEncoder] = None,
+                       lut: Optional[quantize.PaletteLUT] = None) -> None:
+        """
+        Il metodo compone la spritesheet dai risultati della coda, passando per un archivio di frame come rebuild_spritesheet.
+        """
+        
+        from . import workqueue
+        
+        queue: workqueue.WorkQueue = workqueue.WorkQueue(queue_dir)
+        status: dict[str, int] = queue.status()
+        if status["done"] != queue.meta["count"]: raise RuntimeError(f"la coda non è completa: {status}")
+        
+        meta: dict = queue.meta
+        items: list[workqueue.WorkItem] = queue.items()
+        store_path: str = os.path.splitext(output_path)[0] + frame_store.FrameStore.EXTENSION
+        store_meta: dict = {"rows": meta["rows"], "cols": meta["cols"], "items": [{"frame": item.frame, "angle": item.angle} for item in items]}
+        with frame_store.FrameStore.create(store_path, len(items), meta["height"], meta["width"], store_meta) as store:
+            for item in items:
+                with Profiler.span("load_result", "post", idx = item.index):
+                    store.write(item.index, SpritesheetUtils.load_frame(queue.result(item)))
+        
+        RenderUtils.rebuild_spritesheet(store_path, output_path, props.frame_size, props.center_frame, props.anchor_frames,
+                                        props.sheet_layout, props, encoder, lut)
+
+    @staticmethod
+    def rebuild_spritesheet(store_path: str, output_path: str, frame_size: int, center_frame: bool, anchor_frames: bool = False,
+                            layout: str = "GRID", props = None, encoder: Optional[indexed.IndexedEncoder] = None,
+                            lut: Optional[quantize.PaletteLUT] = None) -> None:
+        """
+        Il metodo ricompone la spritesheet (o l'atlante, con le impostazioni di props) da un archivio di frame, senza ripetere il rendering.
+        """
+        
+        with frame_store.FrameStore.open(store_path) as store:
+            rows, cols = store.meta["rows"], store.meta["cols"]
+            if layout == "ATLAS":
+                RenderUtils.write_atlas(store, output_path, props, encoder, lut)
+                return
+            
+            with Profiler.span("rebuild_spritesheet", "sheet"):
+                with SpritesheetUtils.open_writer(output_path, cols * frame_size, rows * frame_size, encoder, lut, frame_size) as writer:
+                    frame_engine.FrameEngine.stream(store.frames, rows, cols, writer, frame_size, center_frame, anchor_frames)  # una fascia alla volta
+
+    @staticmethod
+    def write_atlas(store: frame_store.FrameStore, output_path: str, props, encoder: Optional[indexed.IndexedEncoder] = None,
+                    lut: Optional[quantize.PaletteLUT] = None) -> list[str]:
+        """
+        Il metodo costruisce l'atlante dai frame dell'archivio: le pagine '<nome>_<pagina>' e l'indice '<nome>.json'.
+        
+        Returns:
+            - i percorsi delle pagine salvate.
+        """
+        
+        base, extension = os.path.splitext(output_path)
+        packer: atlas.AtlasPacker = atlas.AtlasPacker(props.atlas_max_size, props.atlas_padding)
+        with Profiler.span("pack_atlas", "sheet"): pages, entries = packer.pack(store.frames, props.frame_size)
+        
+        page_paths: list[str] = [f"{base}_{page}{extension}" for page in range(len(pages))]
+        for path, page in zip(page_paths, pages):
+            with Profiler.span("write_page", "sheet"):
+                with SpritesheetUtils.open_writer(path, page.shape[1], page.shape[0], encoder, lut) as writer:
+                    writer.write(page)
+        
+        index: dict = atlas.AtlasPacker.index(entries, pages, [os.path.basename(path) for path in page_paths], store.meta.get("items"))
+        atlas.AtlasPacker.write_index(base + ".json", index)
+        return page_paths
+
+    @staticmethod
+    def patch_spritesheet(scene: Scene, output_path: str, cells: list[tuple[int, Optional[int]]], encoder: Optional[indexed.IndexedEncoder] = None,
+                          lut: Optional[quantize.PaletteLUT] = None) -> tuple[int, Optional[int], int]:
+        """
+        Il metodo renderizza di nuovo alcuni sprite di una spritesheet già composta e aggiorna solo le loro righe della griglia.
+        Ogni riga è un angolo del job (vedi frame_engine.FrameEngine.sheet): vengono riscritte solo le fasce degli angoli selezionati;
+        se la selezione tocca tutte le righe la patch non fa risparmiare nulla e viene segnalato.
+        Gli sprite vengono riscritti nell'archivio di frame del job; le fasce con sprite invariati non vengono né decodificate
+        né ricompresse (vedi sheet.SheetPatcher). Se la spritesheet non si può aggiornare a fasce (atlante, impostazioni diverse,
+        centratura comune cambiata, file scritto senza fasce) viene ricomposta dall'archivio, sempre senza ripetere gli altri rendering.
+        
+        Args:
+            - cells: le coppie (frame, angolo) da renderizzare; quelle che non fanno parte del job vengono ignorate.
+        
+        Returns:
+            - il numero di sprite renderizzati, le fasce riscritte (None se la spritesheet è stata ricomposta) e le fasce della spritesheet.
+        """
+        
+        props = scene.pixel_props
+        store_path: str = os.path.splitext(output_path)[0] + frame_store.FrameStore.EXTENSION
+        with frame_store.FrameStore.open(store_path, "r+") as store:
+            rows, cols = store.meta["rows"], store.meta["cols"]
+            entries: list[dict] = store.meta["items"]
+            positions: dict[tuple[int, Optional[int]], int] = {(entry["frame"], entry["angle"]): idx for idx, entry in enumerate(entries)}
+            selected: set[int] = {positions[cell] for cell in cells if cell in positions}
+            if not selected: return 0, 0, rows
+            
+            anchored: bool = props.center_frame and props.anchor_frames
+            box: Optional[np.ndarray] = frame_engine.FrameEngine.anchor_box(store.frames, rows, cols, props.frame_size) if anchored else None
+            directory: str = os.path.dirname(output_path)
+            items: list[session.RenderItem] = [session.RenderItem(entry["frame"], entry["angle"], os.path.join(directory, f"frame_{idx}"))
+                                               for idx, entry in enumerate(entries)]
+            cache: Optional[render_cache.RenderCache] = RenderUtils.sprite_cache(props)
+            with session.RenderSession(scene, props.final_samples, props.subject, store = store, cache = cache,
+                                       skip = set(range(store.count)) - selected) as render_session:
+                render_session.render(items)
+            RenderUtils.close_cache(cache)
+            
+            patched: bool = (props.sheet_layout == "GRID"
+                             and (box is None or np.array_equal(box, frame_engine.FrameEngine.anchor_box(store.frames, rows, cols, props.frame_size)))
+                             and sheet_writer.SheetPatcher.compatible(output_path, cols * props.frame_size, rows * props.frame_size, props.frame_size,
+                                                                      SpritesheetUtils.sheet_palette(output_path, encoder)))
+            if patched:
+                with Profiler.span("patch_bands", "sheet"):
+                    bands: dict[int, np.ndarray] = {}
+                    for row in sorted({idx % rows for idx in selected}):
+                        band: np.ndarray = frame_engine.FrameEngine.band(store.frames, rows, cols, row, props.frame_size, props.center_frame, box)
+                        bands[row] = SpritesheetUtils.encode_rows(output_path, band, encoder, lut)
+                    sheet_writer.SheetPatcher.patch(output_path, bands)
         
-        img.save(output_path)
+        if not patched:
+            RenderUtils.rebuild_spritesheet(store_path, output_path, props.frame_size, props.center_frame, props.anchor_frames,
+                                            props.sheet_layout, props, encoder, lut)
+        return len(selected), len(bands) if patched else None, rows
+
+    @staticmethod
+    def parse_frames(frames: str) -> list[int]:
+        """
+        Il metodo interpreta un elenco di frame e intervalli come '40-55, 60'.
+        """
+        
+        selected: list[int] = []
+        for part in (part.strip() for part in frames.split(",")):
+            if not part: continue
+            first, _, last = part.partition("-")
+            selected.extend(range(int(first), int(last or first) + 1))
+        return selected
+
+    @staticmethod
+    def parse_cells(frames: str, angles: str, default_frame: int) -> list[tuple[int, int]]:
+        """
+        Il metodo interpreta la selezione degli sprite da aggiornare: frame come '40-55, 60' (il frame corrente se vuoto)
+        e angoli in gradi come '0, 45' (tutti gli 8 se vuoto).
+        """
+        
+        selected: list[int] = RenderUtils.parse_frames(frames)
+        phis: list[int] = [int(angle) % 360 for angle in angles.split(",") if angle.strip()] or [phi * 45 for phi in range(8)]
+        return [(frame, phi) for frame in (selected or [default_frame]) for phi in phis]
         
 
 # ... operatori ...
@@ -178,7 +480,10 @@ class RenderPixelArt(Operator):
         Esegue l'operazione
         """
         
-        RenderUtils.render_pixel_art(context.scene.pixel_props.final_samples)
+        encoder: Optional[indexed.IndexedEncoder] = RenderUtils.indexed_encoder(context.scene.pixel_props)
+        with RenderUtils.profiler(context.scene, "sprite"):
+            RenderUtils.render_pixel_art(context.scene.pixel_props.final_samples, encoder, RenderUtils.palette_lut(context.scene.pixel_props))
+        RenderUtils.report_palette(self, encoder)
         return {'FINISHED'}
     
 class RenderPixelArtPreview(Operator):
@@ -193,7 +498,8 @@ class RenderPixelArtPreview(Operator):
         Esegue l'operazione
         """
         
-        RenderUtils.render_pixel_art(context.scene.pixel_props.preview_samples)
+        with RenderUtils.profiler(context.scene, "preview"):
+            RenderUtils.render_pixel_art(context.scene.pixel_props.preview_samples)
         return {'FINISHED'}    
     
 class RenderPixelArtAnimation(Operator):
@@ -208,15 +514,20 @@ class RenderPixelArtAnimation(Operator):
         Esegue l'operazione
         """
         
+        assert bpy.data.filepath  # abort se il file non è salvato
         scene: Scene = context.scene
         start = scene.frame_start
         end = scene.frame_end
         path: str = bpy.data.filepath
-        for frame in range(start, end):
-            scene.frame_current = frame
-            scene.render.filepath = path + str(frame)   
-            RenderUtils.render_pixel_art(context.scene.pixel_props.final_samples)
+        items: list[session.RenderItem] = [session.RenderItem(frame, None, path + str(frame)) for frame in range(start, end)]
+        
+        encoder: Optional[indexed.IndexedEncoder] = RenderUtils.indexed_encoder(scene.pixel_props)
+        with RenderUtils.profiler(scene, "animation"):
+            with session.RenderSession(scene, context.scene.pixel_props.final_samples) as render_session:
+                paths: list[str] = render_session.render(items)
             
+            SpritesheetUtils.convert_frames(paths, encoder, RenderUtils.palette_lut(scene.pixel_props))
+        RenderUtils.report_palette(self, encoder)
         return {'FINISHED'}
 
 class RenderMultiAngle(Operator):
@@ -233,25 +544,19 @@ class RenderMultiAngle(Operator):
         """
         
         subject: Optional[bpy.types.Object] = context.scene.pixel_props.subject
-        frame_size: int = context.scene.pixel_props.frame_size
-        center_frame: bool = context.scene.pixel_props.center_frame
         if subject is None: return
+        assert bpy.data.filepath  # abort se il file non è salvato
         path: str = os.path.dirname(bpy.data.filepath)  # la cartella in cui si trova il progetto
-        files: list[str] = []  # lista dei file creati
-        
-        for idx in range(8): 
-            angle: int = idx * 45
-            subject.rotation_euler[2] = math.radians(angle)
-            filepath: str = os.path.join(path, f"frame_{idx}")
-            files.append(filepath)
-            context.scene.render.filepath = filepath   
-            RenderUtils.render_pixel_art(context.scene.pixel_props.final_samples)
-        
-        output_path: str = os.path.join(path, 'multiangle.png')
-        RenderUtils.create_spritesheet(files, 8, 1, output_path, frame_size=frame_size, center_frame=center_frame)
+        items: list[session.RenderItem] = RenderUtils.multiangle_items(path, [context.scene.frame_current])
         
-        for file in files: os.remove(file + '.png')  # cancella i singoli frame
-        subject.rotation_euler[2] = math.radians(0)  # applica la rotazione
+        output_path: str = SpritesheetUtils.sheet_path(path, 'multiangle', context.scene.pixel_props.sheet_format)
+        encoder: Optional[indexed.IndexedEncoder] = RenderUtils.indexed_encoder(context.scene.pixel_props)
+        with RenderUtils.profiler(context.scene, "multiangle"):
+            stats, resumed = RenderUtils.render_spritesheet(context.scene, items, subject, 8, 1, output_path, encoder,
+                                                            RenderUtils.palette_lut(context.scene.pixel_props))  # la rotazione del soggetto viene ripristinata alla fine
+        RenderUtils.report_cache(self, stats)
+        RenderUtils.report_resumed(self, resumed)
+        RenderUtils.report_palette(self, encoder)
         return {'FINISHED'}
 
 
@@ -268,34 +573,139 @@ class RenderMultiAngleAnimation(Operator):
         """
 
         subject: Optional[bpy.types.Object] = context.scene.pixel_props.subject
-        frame_size: int = context.scene.pixel_props.frame_size
         if subject is None: return
 
+        assert bpy.data.filepath  # abort se il file non è salvato
         scene: Scene = context.scene
         start = scene.frame_start
         end = scene.frame_end
         path: str = os.path.dirname(bpy.data.filepath)  # la cartella in cui si trova il progetto
-        frames: list[str] = []
-
-        idx: int = 0
-        tot_frames: int = 0
-        for frame in range(start, end + 1):
-            scene.frame_current = frame
-
-            tot_frames += 1
-            for phi in range(8):
-                angle: int = phi * 45
-                subject.rotation_euler[2] = math.radians(angle)  # applica la rotazione
-                filepath: str = os.path.join(path, f"frame_{idx}")
-                idx += 1
-                frames.append(filepath)
-                context.scene.render.filepath = filepath
-                RenderUtils.render_pixel_art(context.scene.pixel_props.final_samples)
-
-            subject.rotation_euler[2] = math.radians(0)  # applica la rotazione
-
-        output_path: str = os.path.join(path, 'animation.png')
-        RenderUtils.create_spritesheet(frames, 8, tot_frames, output_path,frame_size = frame_size, center_frame=context.scene.pixel_props.center_frame)
-
-        for file in frames: os.remove(file + '.png')
-        return {'FINISHED'}
\ No newline at end of file
+        tot_frames: int = end + 1 - start
+        items: list[session.RenderItem] = RenderUtils.multiangle_items(path, range(start, end + 1))
+
+        output_path: str = SpritesheetUtils.sheet_path(path, 'animation', scene.pixel_props.sheet_format)
+        encoder: Optional[indexed.IndexedEncoder] = RenderUtils.indexed_encoder(scene.pixel_props)
+        with RenderUtils.profiler(scene, "multiangle_animation"):
+            if scene.pixel_props.farm_mode:  # più processi in parallelo, utile per sprite piccoli che non occupano tutti i core
+                plan: scheduler.FarmPlan = RenderUtils.render_spritesheet_farm(scene, items, 8, tot_frames, output_path, encoder,
+                                                                               RenderUtils.palette_lut(scene.pixel_props))
+                self.report({'INFO'}, f"farm: {plan.workers} worker da {plan.threads} thread")
+            else:
+                stats, resumed = RenderUtils.render_spritesheet(scene, items, subject, 8, tot_frames, output_path, encoder,
+                                                                RenderUtils.palette_lut(scene.pixel_props))
+                RenderUtils.report_cache(self, stats)
+                RenderUtils.report_resumed(self, resumed)  # gli 8 angoli di ogni frame vengono renderizzati pass per pass
+        RenderUtils.report_palette(self, encoder)
+        return {'FINISHED'}
+
+
+class SubmitRenderQueue(Operator):
+    """
+    Operatore che scrive nella cartella condivisa la coda di un'animazione multi-angolo
+    """
+    bl_label: str = "Submit Render Queue"
+    bl_idname: str = "render.queue_submit"
+
+    def execute(self, context: Context):
+        """
+        Crea la coda e avvia i worker locali richiesti
+        """
+
+        props = context.scene.pixel_props
+        if props.subject is None or not props.queue_dir: return {'CANCELLED'}
+        scene: Scene = context.scene
+        processes: list[subprocess.Popen] = RenderUtils.submit_queue(scene, bpy.path.abspath(props.queue_dir),
+                                                                     list(range(scene.frame_start, scene.frame_end + 1)), props.queue_local_workers)
+        self.report({'INFO'}, f"coda creata, {len(processes)} worker locali avviati")
+        return {'FINISHED'}
+
+
+class AssembleRenderQueue(Operator):
+    """
+    Operatore che compone la spritesheet dai risultati della coda condivisa
+    """
+    bl_label: str = "Assemble Render Queue"
+    bl_idname: str = "render.queue_assemble"
+
+    def execute(self, context: Context):
+        """
+        Compone la spritesheet accanto al progetto
+        """
+
+        assert bpy.data.filepath  # abort se il file non è salvato
+        props = context.scene.pixel_props
+        output_path: str = SpritesheetUtils.sheet_path(os.path.dirname(bpy.data.filepath), 'animation', props.sheet_format)
+        encoder: Optional[indexed.IndexedEncoder] = RenderUtils.indexed_encoder(props)
+        with RenderUtils.profiler(context.scene, "assemble"):
+            RenderUtils.assemble_queue(bpy.path.abspath(props.queue_dir), output_path, props, encoder, RenderUtils.palette_lut(props))
+        RenderUtils.report_palette(self, encoder)
+        return {'FINISHED'}
+
+
+class RebuildSpritesheets(Operator):
+    """
+    Operatore che ricompone le spritesheet dagli archivi di frame salvati accanto al progetto
+    """
+    bl_label: str = "Rebuild Spritesheets"
+    bl_idname: str = "render.rebuild_spritesheets"
+
+    def execute(self, context: Context):
+        """
+        Ricompone ogni spritesheet con le impostazioni correnti di dimensione e centratura
+        """
+
+        assert bpy.data.filepath  # abort se il file non è salvato
+        props = context.scene.pixel_props
+        path: str = os.path.dirname(bpy.data.filepath)
+        encoder: Optional[indexed.IndexedEncoder] = RenderUtils.indexed_encoder(props)
+        lut: Optional[quantize.PaletteLUT] = RenderUtils.palette_lut(props)
+
+        with RenderUtils.profiler(context.scene, "rebuild"):
+            for name in os.listdir(path):
+                if not name.endswith(frame_store.FrameStore.EXTENSION): continue
+                output_path: str = SpritesheetUtils.sheet_path(path, name[:-len(frame_store.FrameStore.EXTENSION)], props.sheet_format)
+                RenderUtils.rebuild_spritesheet(os.path.join(path, name), output_path, props.frame_size, props.center_frame, props.anchor_frames,
+                                                props.sheet_layout, props, encoder, lut)
+
+        RenderUtils.report_palette(self, encoder)
+        return {'FINISHED'}
+
+
+class PatchSpritesheet(Operator):
+    """
+    Operatore che renderizza di nuovo alcuni sprite e aggiorna solo le loro celle della spritesheet
+    """
+    bl_label: str = "Patch Spritesheet"
+    bl_idname: str = "render.patch_spritesheet"
+
+    def execute(self, context: Context):
+        """
+        Aggiorna la spritesheet scelta con i frame e gli angoli indicati
+        """
+
+        assert bpy.data.filepath  # abort se il file non è salvato
+        scene: Scene = context.scene
+        props = scene.pixel_props
+        if props.subject is None: return {'CANCELLED'}
+        output_path: str = SpritesheetUtils.sheet_path(os.path.dirname(bpy.data.filepath), props.patch_sheet, props.sheet_format)
+        if not os.path.exists(os.path.splitext(output_path)[0] + frame_store.FrameStore.EXTENSION):
+            self.report({'ERROR'}, f"nessun archivio di frame per '{output_path}': renderizza prima la spritesheet")
+            return {'CANCELLED'}
+
+        try:
+            cells: list[tuple[int, int]] = RenderUtils.parse_cells(props.patch_frames, props.patch_angles, scene.frame_current)
+        except ValueError:
+            self.report({'ERROR'}, f"selezione non valida: '{props.patch_frames}' / '{props.patch_angles}'")
+            return {'CANCELLED'}
+
+        encoder: Optional[indexed.IndexedEncoder] = RenderUtils.indexed_encoder(props)
+        with RenderUtils.profiler(scene, "patch"):
+            count, bands, rows = RenderUtils.patch_spritesheet(scene, output_path, cells, encoder, RenderUtils.palette_lut(props))
+        if bands is None:
+            self.report({'WARNING'}, f"{count} sprite aggiornati: la spritesheet non si può aggiornare a fasce ed è stata ricomposta dall'archivio")
+        elif count and bands == rows > 1:  # nessun risparmio rispetto a ricomporre la spritesheet
+            self.report({'WARNING'}, f"{count} sprite aggiornati: riscritte tutte le {rows} fasce della spritesheet")
+        else:
+            self.report({'INFO'}, f"{count} sprite aggiornati, {bands} fasce su {rows} riscritte")
+        RenderUtils.report_palette(self, encoder)
+        return {'FINISHED'}
@@ -0,0 +1,196 @@
+"""
+Il modulo contiene la pianificazione dei job divisi tra più processi: dimensionamento dei worker e scheduler con work stealing
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Optional
+import json
+import math
+import os
+
+
+@dataclass
+class Shard:
+    """
+    classe che descrive una porzione di job: sprite consecutivi dello stesso frame, renderizzati da un solo worker
+    """
+
+    id: int
+    start: int  # l'indice nel job del primo sprite
+    items: list[tuple[int, Optional[int], str]]  # (frame, angolo, percorso) di ogni sprite
+    cost: float = 1.0  # costo stimato (secondi o unità relative)
+
+    @property
+    def frame(self) -> int:
+        """
+        Il frame della scena di tutti gli sprite della porzione.
+        """
+
+        return self.items[0][0]
+
+
+@dataclass
+class FarmPlan:
+    """
+    classe che descrive il dimensionamento della farm: numero di worker e thread di Cycles per worker
+    """
+
+    workers: int
+    threads: int
+
+    @staticmethod
+    def auto(width: int, height: int, shards: int, cores: Optional[int] = None, max_workers: int = 8) -> "FarmPlan":
+        """
+        Il metodo sceglie il dimensionamento in base ai core e alla dimensione delle immagini:
+        Cycles non riesce a usare molti thread su uno sprite piccolo, quindi a ogni worker vengono assegnati
+        circa un thread ogni 64 pixel di lato e i core restanti vengono distribuiti su più worker.
+
+        Args:
+            - width, height: le dimensioni dell'immagine renderizzata.
+            - shards: il numero di porzioni del job (non servono più worker che porzioni).
+            - cores: i core disponibili (quelli della macchina se None).
+            - max_workers: il limite dei processi, ognuno dei quali carica una copia della scena.
+        """
+
+        cores = cores or os.cpu_count() or 1
+        threads: int = max(1, min(cores, math.ceil(math.sqrt(width * height) / 64)))
+        workers: int = max(1, min(cores // threads, max_workers, shards))
+        return FarmPlan(workers, max(threads, cores // workers))
+
+
+class WorkStealingScheduler:
+    """
+    La classe distribuisce le porzioni di un job tra i worker:
+    - all'inizio ogni worker riceve una coda di porzioni consecutive di costo simile (frame vicini hanno scene simili);
+    - ogni worker prende le porzioni dalla testa della propria coda;
+    - un worker con la coda vuota ruba metà del lavoro (per costo) dalla coda del worker più carico, prendendolo dalla fine;
+    - i costi misurati aggiornano le stime delle porzioni non ancora eseguite dello stesso worker.
+    """
+
+    def __init__(self, shards: list[Shard], workers: int):
+        self.queues: list[deque[Shard]] = [deque() for _ in range(workers)]
+        self.running: dict[int, Shard] = {}  # worker -> porzione in esecuzione
+        self.durations: dict[int, float] = {}  # porzione -> secondi misurati
+        self.steals: int = 0
+        self.alive: list[bool] = [True] * workers
+        self._scale: list[float] = [1.0] * workers  # rapporto tra costo misurato e stimato di ogni worker
+
+        # ... divisione iniziale in blocchi consecutivi di costo simile ...
+        total: float = sum(shard.cost for shard in shards)
+        done: float = 0.0
+        for shard in shards:
+            worker: int = min(workers - 1, int(done / total * workers)) if total > 0 else 0
+            self.queues[worker].append(shard)
+            done += shard.cost
+
+    def remaining(self, worker: int) -> float:
+        """
+        Il metodo restituisce il costo stimato del lavoro in coda per il worker.
+        """
+
+        return sum(shard.cost for shard in self.queues[worker]) * self._scale[worker]
+
+    def next(self, worker: int) -> Optional[Shard]:
+        """
+        Il metodo restituisce la prossima porzione per il worker, rubandola a un altro se la sua coda è vuota.
+        Restituisce None se non c'è più lavoro da assegnare.
+        """
+
+        if not self.queues[worker]:
+            victim: int = max(range(len(self.queues)), key = self.remaining)
+            if not self.queues[victim]: return None
+            self.steal(victim, worker)
+
+        shard: Shard = self.queues[worker].popleft()
+        self.running[worker] = shard
+        return shard
+
+    def steal(self, victim: int, thief: int) -> None:
+        """
+        Il metodo sposta dalla fine della coda di victim a quella di thief circa metà del costo in coda (almeno una porzione).
+        """
+
+        queue: deque[Shard] = self.queues[victim]
+        target: float = sum(shard.cost for shard in queue) / 2
+        stolen: list[Shard] = []
+        while queue and (not stolen or sum(shard.cost for shard in stolen) + queue[-1].cost <= target):
+            stolen.append(queue.pop())
+
+        self.queues[thief].extend(reversed(stolen))  # restano in ordine di frame
+        self.steals += 1
+
+    def finished(self, worker: int, seconds: float) -> Shard:
+        """
+        Il metodo registra il completamento della porzione in esecuzione sul worker e aggiorna la sua stima dei costi.
+        """
+
+        shard: Shard = self.running.pop(worker)
+        self.durations[shard.id] = seconds
+        if shard.cost > 0: self._scale[worker] = 0.5 * self._scale[worker] + 0.5 * seconds / shard.cost
+        return shard
+
+    def failed(self, worker: int) -> None:
+        """
+        Il metodo rimette in coda la porzione di un worker terminato, assieme al suo lavoro in coda, distribuendoli agli altri.
+        """
+
+        orphans: list[Shard] = ([self.running.pop(worker)] if worker in self.running else []) + list(self.queues[worker])
+        self.queues[worker].clear()
+        self.alive[worker] = False
+        alive: list[int] = [idx for idx in range(len(self.queues)) if self.alive[idx]]
+        if not alive: raise RuntimeError("tutti i worker della farm sono terminati")
+        for shard in orphans: min((self.queues[idx] for idx in alive), key = len).appendleft(shard)
+
+    def done(self) -> bool:
+        """
+        Il metodo verifica che non ci siano porzioni in coda o in esecuzione.
+        """
+
+        return not self.running and not any(self.queues)
+
+    # ... stime dei costi ...
+    @staticmethod
+    def shards(items: list[tuple[int, Optional[int], str]], size: int, costs: Optional[dict[str, float]] = None) -> list[Shard]:
+        """
+        Il metodo divide gli sprite in porzioni di al più size sprite consecutivi dello stesso frame.
+
+        Args:
+            - costs: i secondi per sprite misurati in un job precedente per ogni frame (vedi save_costs); senza stime il costo è il numero di sprite.
+        """
+
+        shards: list[Shard] = []
+        for idx, item in enumerate(items):
+            if shards and shards[-1].frame == item[0] and len(shards[-1].items) < size:
+                shards[-1].items.append(item)
+                continue
+            shards.append(Shard(len(shards), idx, [item]))
+
+        costs = costs or {}
+        default: float = sum(costs.values()) / len(costs) if costs else 1.0  # i frame senza misura costano come la media
+        for shard in shards:
+            per_item: float = costs.get(str(shard.frame), default)
+            shard.cost = per_item * len(shard.items)
+        return shards
+
+    @staticmethod
+    def load_costs(path: str) -> dict[str, float]:
+        """
+        Il metodo legge i costi per sprite di ogni frame salvati da un job precedente (vuoti se il file manca).
+        """
+
+        if not os.path.exists(path): return {}
+        with open(path, "r") as file:
+            return json.load(file)
+
+    def save_costs(self, path: str, shards: list[Shard]) -> None:
+        """
+        Il metodo salva i secondi per sprite misurati per ogni frame, usati per stimare i costi del job successivo.
+        """
+
+        costs: dict[str, Any] = {}
+        for shard in shards:
+            if shard.id in self.durations: costs[str(shard.frame)] = self.durations[shard.id] / len(shard.items)
+
+        with open(path, "w") as file:
+            json.dump(costs, file, indent = 2)
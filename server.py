@@ -0,0 +1,176 @@
+"""
+Il modulo contiene il server di rendering: un processo 'blender -b' che resta attivo tra un job e l'altro,
+con la scena caricata e lo stato di Cycles già pronto
+"""
+
+import bpy
+from typing import Any, Callable, Iterator, Optional
+import json
+import os
+import socket
+import sys
+import time
+
+from . import const
+from . import jobs
+
+
+class RenderServer:
+    """
+    La classe riceve i job su un socket locale e li esegue uno alla volta nel processo di Blender.
+
+    Protocollo (una riga JSON per messaggio, in UTF-8):
+    - richiesta: {"id", "type", ...} con type tra JOB_TYPES, "ping" o "shutdown"; campi facoltativi:
+      "blend" (progetto da usare) e quelli descritti in jobs.JobRunner ("output", "frame", "start", "end", "samples", ...);
+    - risposte: {"id", "event": "progress", "done", "index", "path"} per ogni sprite salvato,
+      poi {"id", "event": "done", "outputs", "seconds", "reloaded"} oppure {"id", "event": "error", "message"}.
+
+    Il progetto viene riaperto solo quando cambia il file richiesto o la sua data di modifica.
+    """
+
+    JOB_TYPES: tuple[str, ...] = jobs.JobRunner.JOB_TYPES
+
+    def __init__(self, host: str = "127.0.0.1", port: int = const.SERVER_PORT):
+        self.host: str = host
+        self.port: int = port
+        self.blend_path: str = bpy.data.filepath
+        self.mtime: float = os.path.getmtime(self.blend_path) if self.blend_path else 0.0
+        self.running: bool = False
+
+    # ... progetto ...
+    def reload(self, blend_path: Optional[str] = None) -> bool:
+        """
+        Il metodo riapre il progetto se è stato richiesto un altro file o se il file è cambiato su disco.
+
+        Returns:
+            - True se il progetto è stato riaperto.
+        """
+
+        path: str = os.path.abspath(blend_path) if blend_path else self.blend_path
+        if not path: raise ValueError("nessun progetto caricato")
+        mtime: float = os.path.getmtime(path)
+        if path == self.blend_path and mtime == self.mtime: return False
+
+        bpy.ops.wm.open_mainfile(filepath = path)
+        self.blend_path, self.mtime = path, mtime
+        return True
+
+    # ... job ...
+    def run_job(self, job: dict[str, Any], progress: Callable[[int, str], None]) -> list[str]:
+        """
+        Il metodo esegue un job con le stesse funzioni degli operatori (vedi jobs.JobRunner).
+
+        Returns:
+            - i percorsi dei file prodotti (sprite o spritesheet).
+        """
+
+        return jobs.JobRunner.run(bpy.context.scene, job, self.blend_path, progress)
+
+    def handle(self, request: dict[str, Any], send: Callable[[dict[str, Any]], None]) -> None:
+        """
+        Il metodo esegue una richiesta, inviando gli eventi con send; gli errori del job vengono inviati al client.
+        """
+
+        job_id: Any = request.get("id")
+        kind: Optional[str] = request.get("type")
+        if kind in ("ping", "shutdown"):
+            self.running = kind == "ping"
+            send({"id": job_id, "event": "done", "outputs": [], "blend": self.blend_path})
+            return
+
+        try:
+            if kind not in RenderServer.JOB_TYPES: raise ValueError(f"tipo di job '{kind}' non supportato")
+            begin: float = time.perf_counter()
+            reloaded: bool = self.reload(request.get("blend"))
+            total: int = 0
+
+            def progress(idx: int, path: str) -> None:
+                nonlocal total
+                total += 1
+                send({"id": job_id, "event": "progress", "done": total, "index": idx, "path": path})
+
+            outputs: list[str] = self.run_job(request, progress)
+            send({"id": job_id, "event": "done", "outputs": outputs, "seconds": time.perf_counter() - begin, "reloaded": reloaded})
+        except Exception as error:
+            send({"id": job_id, "event": "error", "message": f"{type(error).__name__}: {error}"})
+
+    # ... rete ...
+    def serve(self) -> None:
+        """
+        Il metodo accetta le connessioni (una alla volta) fino a una richiesta 'shutdown'.
+        """
+
+        self.running = True
+        with socket.create_server((self.host, self.port)) as listener:
+            sys.stdout.write(f"{const.SERVER_READY} {self.host}:{listener.getsockname()[1]}\n")
+            sys.stdout.flush()
+            while self.running:
+                connection, _ = listener.accept()
+                with connection, connection.makefile("rw", encoding = "utf-8", newline = "\n") as stream:
+                    def send(message: dict[str, Any]) -> None:
+                        stream.write(json.dumps(message) + "\n")
+                        stream.flush()
+
+                    for line in stream:
+                        if line.strip(): self.handle(json.loads(line), send)
+                        if not self.running: break
+
+    @staticmethod
+    def command(blend_path: str, port: int = const.SERVER_PORT) -> list[str]:
+        """
+        Il metodo restituisce la riga di comando che avvia il server sul progetto indicato.
+        """
+
+        return [bpy.app.binary_path, "-b", blend_path, "--addons", __package__,
+                "--python-expr", f"import {__package__}.server as server; server.RenderServer.main()", "--", "--port", str(port)]
+
+    @staticmethod
+    def main() -> None:
+        """
+        Il metodo avvia il server con gli argomenti che seguono '--' ('--host', '--port').
+        """
+
+        argv: list[str] = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+        options: dict[str, str] = dict(zip(argv[::2], argv[1::2]))
+        RenderServer(options.get("--host", "127.0.0.1"), int(options.get("--port", const.SERVER_PORT))).serve()
+
+
+class RenderClient:
+    """
+    La classe invia i job a un server di rendering e ne riceve gli eventi.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = const.SERVER_PORT, timeout: Optional[float] = None):
+        self._socket: socket.socket = socket.create_connection((host, port), timeout = timeout)
+        self._stream = self._socket.makefile("rw", encoding = "utf-8", newline = "\n")
+        self._next_id: int = 0
+
+    def __enter__(self) -> "RenderClient":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def submit(self, job: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        """
+        Il metodo invia un job e restituisce i suoi eventi, fino all'evento finale ('done' o 'error').
+        """
+
+        self._next_id += 1
+        job = dict(job, id = job.get("id", self._next_id))
+        self._stream.write(json.dumps(job) + "\n")
+        self._stream.flush()
+
+        for line in self._stream:
+            event: dict[str, Any] = json.loads(line)
+            yield event
+            if event["event"] in ("done", "error"): return
+        raise ConnectionError("il server ha chiuso la connessione")
+
+    def close(self) -> None:
+        """
+        Il metodo chiude la connessione.
+        """
+
+        self._stream.close()
+        self._socket.close()
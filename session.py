@@ -0,0 +1,369 @@
+"""
+Il modulo gestisce la sessione di rendering di un intero job
+"""
+
+import bpy
+from bpy.types import Scene, Object, Material
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+import math
+import numpy as np
+
+from . import cache as render_cache
+from . import const
+from . import buffers
+from . import fingerprint
+from . import gbuffer
+from . import params
+from . import registry
+from . import store as frame_store
+from .core.profiling import Profiler
+
+
+@dataclass(frozen = True)
+class PassConfig:
+    """
+    classe che descrive le impostazioni di un pass di rendering
+    """
+
+    name: str
+    buffer: Optional[str]  # il buffer che riceve il risultato (None per la composizione finale)
+    use_samples: bool = False  # usa i campioni del job, altrimenti un solo campione
+    denoising: bool = False
+    freestyle: bool = False
+    diffuse_override: bool = False
+    emission_override: bool = False
+    is_border: bool = False
+    use_compositor: bool = False
+    use_gbuffer: bool = False
+    use_lights: bool = False  # i pass di sola emissione non hanno bisogno di luci e mondo
+
+
+# ... pass della pipeline ...
+DIFFUSE_PASS: PassConfig = PassConfig("diffuse", const.DIFFUSE_BUFFER, use_samples = True, denoising = True, diffuse_override = True, use_lights = True)
+FREESTYLE_PASS: PassConfig = PassConfig("freestyle", const.FREESTYLE_BUFFER, freestyle = True, emission_override = True)
+BORDER_PASS: PassConfig = PassConfig("border", const.BORDER_BUFFER, is_border = True)
+COMPOSITE_PASS: PassConfig = PassConfig("composite", None, use_compositor = True, use_lights = True)  # come il rendering finale dell'utente
+GBUFFER_PASS: PassConfig = PassConfig("gbuffer", const.GBUFFER_BUFFER, use_samples = True, denoising = True, use_gbuffer = True, use_lights = True)
+BUFFER_PASSES: tuple[PassConfig, ...] = (DIFFUSE_PASS, FREESTYLE_PASS, BORDER_PASS)  # i pass senza luci sono consecutivi: due cambi per gruppo
+BUFFER_NAMES: tuple[str, ...] = tuple(config.buffer for config in BUFFER_PASSES)  # buffer letti dalla composizione finale
+
+
+@dataclass
+class RenderItem:
+    """
+    classe che descrive uno sprite da renderizzare
+    """
+
+    frame: int  # il frame della scena
+    angle: Optional[int]  # la rotazione del soggetto in gradi (None per non ruotarlo)
+    filepath: str  # il percorso di output, senza estensione
+
+
+class RenderSession:
+    """
+    La classe gestisce il rendering di un intero job mantenendo caldo lo stato di Cycles:
+    - i dati persistenti restano attivi per tutto il job;
+    - gli sprite dello stesso frame vengono renderizzati a gruppi, eseguendo di seguito i pass con le stesse impostazioni;
+    - luci e mondo vengono esclusi dai pass di sola emissione;
+    - le impostazioni dell'utente vengono ripristinate una sola volta, alla fine del job.
+    """
+
+    RESTORE_PATHS: list[str] = [
+        "scene.cycles.samples",
+        "scene.cycles.use_denoising",
+        "scene.render.use_freestyle",
+        "scene.render.use_persistent_data",
+        "scene.render.filepath",
+        "scene.use_nodes",
+        "scene.frame_current",
+        "view_layer.material_override",
+    ]  # impostazioni ripristinate alla fine del job
+
+    def __init__(self, scene: Scene, samples: int, subject: Optional[Object] = None, batch_size: int = const.SESSION_BATCH,
+                 on_saved: Optional[Callable[[int, str], None]] = None, store: Optional[frame_store.FrameStore] = None,
+                 cache: Optional[render_cache.RenderCache] = None, skip: Optional[set[int]] = None):
+        """
+        Args:
+            - scene: la scena da renderizzare.
+            - samples: i campioni dei pass che li richiedono.
+            - subject: l'oggetto da ruotare per gli sprite con un angolo.
+            - batch_size: il numero massimo di sprite dello stesso frame raggruppati pass per pass.
+            - on_saved: chiamata con (indice, percorso) appena uno sprite è salvato, ad esempio per elaborarlo durante il rendering.
+            - store: l'archivio in cui scrivere gli sprite, nell'ordine del job, al posto dei file.
+            - cache: la cache degli sprite (solo con un archivio): gli sprite con la stessa impronta non vengono renderizzati.
+            - skip: gli indici degli sprite già presenti nell'archivio (ad esempio da un job ripreso), che non vengono renderizzati.
+        """
+
+        self.scene: Scene = scene
+        self.samples: int = samples
+        self.subject: Optional[Object] = subject
+        self.batch_size: int = max(1, batch_size)
+        self.on_saved: Optional[Callable[[int, str], None]] = on_saved
+        self.store: Optional[frame_store.FrameStore] = store
+        self.cache: Optional[render_cache.RenderCache] = cache if store is not None else None
+        self.skip: set[int] = set(skip or ()) if store is not None else set()
+        self._count: int = 0  # sprite salvati nel job
+        self._fingerprint: Optional[fingerprint.SpriteFingerprint] = None
+        self._keys: dict[int, str] = {}  # indice -> chiave di cache degli sprite da renderizzare
+        self._lighting: dict[int, str] = {}  # indice -> dati di illuminazione da salvare in cache con lo sprite
+
+        self._saved: dict[str, Any] = {}
+        self._lights: dict[str, bool] = {}  # visibilità originale delle luci
+        self._world_sampling: Optional[str] = None
+        self._rotation: float = 0.0
+        self._use_lights: bool = True
+
+    # ... ciclo di vita ...
+    def __enter__(self) -> "RenderSession":
+        self.begin()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.end()
+
+    def begin(self) -> None:
+        """
+        Il metodo salva le impostazioni dell'utente e prepara la scena per il job.
+        """
+
+        scene: Scene = self.scene
+        self._saved = registry.RenderState.capture(scene, self.RESTORE_PATHS)
+        self._lights = {obj.name: obj.hide_render for obj in scene.objects if obj.type == "LIGHT"}
+        self._world_sampling = scene.world.cycles.sampling_method if scene.world is not None else None
+        if self.subject is not None: self._rotation = self.subject.rotation_euler[2]
+        self._use_lights = True
+
+        with Profiler.span("session_begin", "state"):
+            registry.RenderState.apply(scene, {"scene.render.use_persistent_data": True})  # BVH e shader restano in memoria tra i rendering
+            params.ShaderParams.migrate()  # aggiorna i materiali delle versioni precedenti (una sola volta)
+            params.ShaderParams.set_mapping_link(scene)  # ricollega il mapping solo se orientamento o camera sono cambiati
+            if self.cache is not None: self._fingerprint = fingerprint.SpriteFingerprint(scene, self._lights)
+
+    def end(self) -> None:
+        """
+        Il metodo ripristina le impostazioni dell'utente.
+        """
+
+        with Profiler.span("session_end", "state"):
+            self.set_lights(True)
+            params.ShaderParams.apply(self.scene)  # gli shader tornano al pass finale
+            registry.RenderState.apply(self.scene, self._saved)
+            if self.subject is not None: self.subject.rotation_euler[2] = self._rotation
+
+    # ... stato della scena ...
+    @staticmethod
+    def apply_settings(scene: Scene, config: PassConfig, samples: int = 1) -> None:
+        """
+        Il metodo applica le impostazioni del pass, scrivendo solo i valori cambiati.
+        """
+
+        override: Optional[Material] = None
+        if config.diffuse_override: override = bpy.data.materials[const.DIFFUSE_MATERIAL]
+        elif config.emission_override: override = bpy.data.materials[const.EMISSION_MATERIAL]
+
+        registry.RenderState.apply(scene, {
+            "scene.cycles.samples": samples if config.use_samples else 1,
+            "scene.cycles.use_denoising": config.denoising,
+            "scene.render.use_freestyle": config.freestyle,
+            "scene.use_nodes": config.use_compositor,
+            "view_layer.material_override": override,
+        })
+
+        # ... parametri degli shader, scritti sugli oggetti per non ricompilare i materiali ...
+        params.ShaderParams.apply(scene, config.is_border, config.use_gbuffer)
+
+    def set_lights(self, enabled: bool) -> None:
+        """
+        Il metodo include o esclude luci e mondo dal rendering.
+        """
+
+        if enabled == self._use_lights: return
+        self._use_lights = enabled
+
+        for name, hidden in self._lights.items():
+            if name in bpy.data.objects: bpy.data.objects[name].hide_render = hidden if enabled else True
+
+        if self._world_sampling is not None:
+            self.scene.world.cycles.sampling_method = self._world_sampling if enabled else "NONE"
+
+    def set_pass(self, config: PassConfig) -> None:
+        """
+        Il metodo prepara la scena per il pass indicato.
+        """
+
+        with Profiler.span("set_pass", "state", name = config.name):
+            RenderSession.apply_settings(self.scene, config, self.samples)
+            self.set_lights(config.use_lights)
+
+    def goto(self, item: RenderItem) -> None:
+        """
+        Il metodo porta la scena nello stato dello sprite (frame e rotazione), solo se necessario.
+        """
+
+        if self.scene.frame_current != item.frame:
+            with Profiler.span("frame_change", "state", frame = item.frame): self.scene.frame_current = item.frame
+        if self.subject is not None and item.angle is not None:
+            angle: float = math.radians(item.angle)
+            if self.subject.rotation_euler[2] != angle:
+                with Profiler.span("rotate", "state", angle = item.angle): self.subject.rotation_euler[2] = angle
+
+    # ... rendering ...
+    def saved(self, path: str, idx: int) -> str:
+        """
+        Il metodo notifica il salvataggio dello sprite idx del job.
+        Con un archivio lo sprite, presente nel buffer SPRITE_BUFFER, viene scritto nella sua posizione dell'archivio (e nella cache).
+        """
+
+        if self.store is not None:
+            with Profiler.span("store_sprite", "post", idx = idx):
+                sprite: np.ndarray = buffers.BufferPool.read(const.SPRITE_BUFFER)
+                premultiplied: bool = self.scene.pixel_props.pipeline_mode != "GBUFFER"  # il compositor lavora con alpha premoltiplicato
+                encoded: np.ndarray = frame_store.FrameStore.encode(sprite, premultiplied)
+                self.store.write(idx, encoded)
+                if idx in self._keys: self.cache.put(self._keys.pop(idx), encoded, self._lighting.pop(idx, None))
+            path = self.store.path
+
+        Profiler.frame()
+        if self.on_saved is not None: self.on_saved(idx, path)
+        return path
+
+    def cached(self, batch: list[RenderItem], indices: list[int]) -> tuple[list[RenderItem], list[int]]:
+        """
+        Il metodo copia nell'archivio gli sprite del gruppo presenti in cache e, se il job li esporta, i loro dati di illuminazione
+        accanto allo sprite; uno sprite in cache senza dati di illuminazione viene renderizzato di nuovo.
+
+        Returns:
+            - gli sprite da renderizzare e i loro indici; le loro chiavi vengono ricordate per salvarli in cache.
+        """
+
+        missing: tuple[list[RenderItem], list[int]] = ([], [])
+        for item, idx in zip(batch, indices):
+            self.goto(item)
+            with Profiler.span("cache_lookup", "post", idx = idx):
+                key: str = self._fingerprint.key(item.frame)
+                lighting: Optional[str] = self.lighting_path(item)
+                pixels: Optional[np.ndarray] = self.cache.get(key, lighting)
+            if pixels is not None and pixels.shape == self.store.frames.shape[1:]:
+                self.store.write(idx, pixels)
+                Profiler.frame()
+                if self.on_saved is not None: self.on_saved(idx, self.store.path)
+                continue
+
+            self._keys[idx] = key
+            if lighting is not None: self._lighting[idx] = lighting
+            missing[0].append(item)
+            missing[1].append(idx)
+
+        return missing
+
+    def lighting_path(self, item: RenderItem) -> Optional[str]:
+        """
+        Il metodo restituisce il file in cui il rendering dello sprite salva i dati di illuminazione (vedi gbuffer.GBufferUtils.lighting_path),
+        oppure None se il job non li esporta (solo i rendering G-buffer li producono).
+        """
+
+        props = self.scene.pixel_props
+        if not props.store_lighting or (props.pipeline_mode != "GBUFFER" and props.outline_mode != "IMAGE"): return None
+        return bpy.path.abspath(item.filepath) + const.LIGHTING_SUFFIX
+
+    def batches(self, items: list[RenderItem]) -> list[list[RenderItem]]:
+        """
+        Il metodo divide gli sprite in gruppi consecutivi dello stesso frame, al più batch_size per gruppo:
+        solo dentro un frame la geometria non cambia e i pass possono essere riordinati.
+        """
+
+        groups: list[list[RenderItem]] = []
+        for item in items:
+            if groups and groups[-1][0].frame == item.frame and len(groups[-1]) < self.batch_size: groups[-1].append(item)
+            else: groups.append([item])
+        return groups
+
+    def render_batch(self, batch: list[RenderItem], indices: list[int]) -> list[str]:
+        """
+        Il metodo renderizza un gruppo di sprite dello stesso frame, con i loro indici nel job.
+
+        Returns:
+            - i percorsi dei file salvati, nell'ordine degli sprite.
+        """
+
+        scene: Scene = self.scene
+        paths: list[str] = []
+
+        if scene.pixel_props.pipeline_mode == "GBUFFER":  # un solo rendering, lo sprite viene ricostruito dai pass
+            self.set_pass(GBUFFER_PASS)
+            for item, idx in zip(batch, indices):
+                self.goto(item)
+                scene.render.filepath = item.filepath
+                with Profiler.span(GBUFFER_PASS.name, "pass"):
+                    path: str = gbuffer.GBufferUtils.render_sprite(scene, save = self.store is None)
+                paths.append(self.saved(path, idx))
+            return paths
+
+        # ... i pass con le stesse impostazioni vengono eseguiti di seguito per tutto il gruppo ...
+        image_outlines: bool = scene.pixel_props.outline_mode == "IMAGE"  # un rendering G-buffer sostituisce i tre pass dei buffer
+        snapshots: dict[tuple[int, str], np.ndarray] = {}
+        for config in (GBUFFER_PASS,) if image_outlines else BUFFER_PASSES:
+            self.set_pass(config)
+            for idx, item in enumerate(batch):
+                self.goto(item)
+                scene.render.filepath = item.filepath  # i dati di illuminazione vengono salvati accanto allo sprite
+                with Profiler.span(config.name, "pass"):  # comprende la copia del risultato nei buffer
+                    if image_outlines: gbuffer.GBufferUtils.render_buffers(scene)
+                    else: buffers.BufferUtils.render_buffer(config.buffer)
+
+                if len(batch) == 1: continue
+                with Profiler.span("snapshot", "buffer"):
+                    for name in BUFFER_NAMES if image_outlines else (config.buffer,):
+                        snapshots[idx, name] = buffers.BufferPool.snapshot(name)
+
+        self.set_pass(COMPOSITE_PASS)
+        for idx, item in enumerate(batch):
+            self.goto(item)
+            if len(batch) > 1:
+                with Profiler.span("restore", "buffer"):
+                    for name in BUFFER_NAMES: buffers.BufferPool.restore(name, snapshots[idx, name])
+
+            scene.render.filepath = item.filepath
+            if self.store is not None:  # l'immagine finale viene letta dal viewer, senza scrivere file
+                buffers.BufferUtils.set_viewer(scene, buffers.BufferUtils.composite_source(scene))
+                with Profiler.span(COMPOSITE_PASS.name, "pass"): bpy.ops.render.render(use_viewport = True)
+                with Profiler.span("capture", "buffer"): buffers.BufferUtils.copy_render_result(const.SPRITE_BUFFER)
+            else:
+                with Profiler.span(COMPOSITE_PASS.name, "pass"): bpy.ops.render.render(use_viewport = True, write_still = True)
+            paths.append(self.saved(buffers.BufferUtils.still_path(scene), indices[idx]))
+
+        return paths
+
+    def render(self, items: list[RenderItem], start: Optional[int] = None) -> list[str]:
+        """
+        Il metodo renderizza gli sprite del job.
+
+        Args:
+            - start: l'indice nel job del primo sprite, per i job divisi tra più sessioni (vedi farm.FarmWorker).
+
+        Returns:
+            - i percorsi dei file salvati, nell'ordine degli sprite.
+        """
+
+        if start is not None: self._count = start
+        paths: list[str] = []
+        for batch in self.batches(items):
+            indices: list[int] = list(range(self._count, self._count + len(batch)))
+            self._count += len(batch)
+            if self.skip:  # con l'archivio ogni sprite è nello stesso file: conta solo la notifica
+                for idx in (idx for idx in indices if idx in self.skip):
+                    if self.on_saved is not None: self.on_saved(idx, self.store.path)
+                    paths.append(self.store.path)
+                pending: list[tuple[RenderItem, int]] = [(item, idx) for item, idx in zip(batch, indices) if idx not in self.skip]
+                if not pending: continue
+                batch, indices = [item for item, _ in pending], [idx for _, idx in pending]
+
+            if self.cache is None:
+                paths.extend(self.render_batch(batch, indices))
+                continue
+
+            missing, missing_indices = self.cached(batch, indices)
+            if missing: self.render_batch(missing, missing_indices)
+            paths.extend(self.store.path for _ in batch)  # con l'archivio ogni sprite è nello stesso file
+        return paths
@@ -103,7 +103,6 @@ class SetupPixelArtEnvironment(Operator):
         buffers.BufferUtils.new_buffer(const.DIFFUSE_BUFFER)
         buffers.BufferUtils.new_buffer(const.FREESTYLE_BUFFER)
         buffers.BufferUtils.new_buffer(const.BORDER_BUFFER)
-        bpy.ops.file.pack_all()  # salva i buffer
         
         self.set_freestyle()
         self.set_compositor()
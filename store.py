@@ -0,0 +1,153 @@
+"""
+Il modulo contiene l'archivio dei frame: un solo file mappato in memoria al posto dei PNG intermedi
+"""
+
+from typing import Any, Optional
+import json
+import os
+import numpy as np
+
+
+class FrameStore:
+    """
+    La classe gestisce un archivio di N frame RGBA uint8 di forma (altezza, larghezza, 4), salvati in un unico file mappato in memoria.
+
+    Struttura del file:
+    - 8 byte: identificativo del formato;
+    - 8 byte: lunghezza dell'intestazione;
+    - intestazione JSON: forma dei frame e metadati del job (righe, colonne, frame e angolo di ogni sprite, ...);
+    - N byte: indice dei frame scritti (1 se il frame è presente);
+    - i frame, allineati a ALIGNMENT byte.
+
+    I frame hanno le righe dall'alto verso il basso e colori sRGB ad alpha non premoltiplicato, come i PNG che sostituiscono.
+    """
+
+    MAGIC: bytes = b"PXSTORE1"
+    ALIGNMENT: int = 4096
+    EXTENSION: str = ".pxstore"
+
+    def __init__(self, path: str, frames: np.ndarray, written: np.ndarray, meta: dict[str, Any]):
+        self.path: str = path
+        self.frames: np.ndarray = frames  # memmap (N, altezza, larghezza, 4)
+        self.written: np.ndarray = written  # memmap (N,)
+        self.meta: dict[str, Any] = meta
+
+    # ... apertura ...
+    @staticmethod
+    def create(path: str, count: int, height: int, width: int, meta: Optional[dict[str, Any]] = None) -> "FrameStore":
+        """
+        Il metodo crea un archivio vuoto (i frame non scritti sono trasparenti).
+        """
+
+        meta = dict(meta or {})
+        meta.update(count = count, height = height, width = width)
+        header: bytes = json.dumps(meta).encode("utf-8")
+        index_offset: int = 16 + len(header)
+        data_offset: int = -(-(index_offset + count) // FrameStore.ALIGNMENT) * FrameStore.ALIGNMENT
+
+        with open(path, "wb") as file:
+            file.write(FrameStore.MAGIC)
+            file.write(len(header).to_bytes(8, "little"))
+            file.write(header)
+            file.truncate(data_offset + count * height * width * 4)  # file sparso: nessuna scrittura dei frame vuoti
+
+        return FrameStore.open(path, "r+")
+
+    @staticmethod
+    def open(path: str, mode: str = "r") -> "FrameStore":
+        """
+        Il metodo riapre un archivio esistente ('r' in sola lettura, 'r+' per scrivere).
+        """
+
+        with open(path, "rb") as file:
+            if file.read(8) != FrameStore.MAGIC: raise ValueError(f"'{path}' non è un archivio di frame")
+            header_size: int = int.from_bytes(file.read(8), "little")
+            meta: dict[str, Any] = json.loads(file.read(header_size).decode("utf-8"))
+
+        count, height, width = meta["count"], meta["height"], meta["width"]
+        index_offset: int = 16 + header_size
+        data_offset: int = -(-(index_offset + count) // FrameStore.ALIGNMENT) * FrameStore.ALIGNMENT
+
+        written: np.ndarray = np.memmap(path, dtype = np.uint8, mode = mode, offset = index_offset, shape = (count,))
+        frames: np.ndarray = np.memmap(path, dtype = np.uint8, mode = mode, offset = data_offset, shape = (count, height, width, 4))
+        return FrameStore(path, frames, written, meta)
+
+    def __enter__(self) -> "FrameStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def flush(self) -> None:
+        """
+        Il metodo scrive su disco le modifiche.
+        """
+
+        if self.frames.mode != "r":
+            self.written.flush()
+            self.frames.flush()
+
+    def close(self) -> None:
+        """
+        Il metodo chiude l'archivio.
+        """
+
+        self.flush()
+        self.frames = np.empty((0,) + self.frames.shape[1:], dtype = np.uint8)  # rilascia la mappatura del file
+        self.written = np.empty(0, dtype = np.uint8)
+
+    # ... accesso ai frame ...
+    @property
+    def count(self) -> int:
+        """
+        Il numero di frame dell'archivio.
+        """
+
+        return self.meta["count"]
+
+    def read(self, idx: int) -> np.ndarray:
+        """
+        Il metodo restituisce il frame idx senza copiarlo (vista sul file).
+        """
+
+        return self.frames[idx]
+
+    def write(self, idx: int, pixels: np.ndarray) -> None:
+        """
+        Il metodo scrive il frame idx, già convertito in uint8 (vedi encode).
+        """
+
+        self.frames[idx] = pixels
+        self.written[idx] = 1
+
+    def complete(self) -> bool:
+        """
+        Il metodo verifica che tutti i frame siano stati scritti.
+        """
+
+        return bool(self.written.all())
+
+    @staticmethod
+    def encode(pixels: np.ndarray, premultiplied: bool = False) -> np.ndarray:
+        """
+        Il metodo converte i pixel lineari float di Blender (righe dal basso verso l'alto) nel formato dell'archivio:
+        sRGB uint8 con alpha non premoltiplicato e righe dall'alto verso il basso (trasformazione di vista 'Standard').
+        """
+
+        rgb: np.ndarray = np.clip(pixels[::-1, :, :3], 0, 1)
+        alpha: np.ndarray = np.clip(pixels[::-1, :, 3:], 0, 1)
+        if premultiplied: rgb = np.divide(rgb, alpha, out = np.zeros_like(rgb), where = alpha > 0).clip(0, 1)
+
+        srgb: np.ndarray = np.where(rgb <= 0.0031308, rgb * 12.92, 1.055 * np.power(rgb, 1 / 2.4) - 0.055)
+        encoded: np.ndarray = np.empty(pixels.shape, dtype = np.uint8)
+        encoded[..., :3] = np.rint(srgb * 255)
+        encoded[..., 3:] = np.rint(alpha * 255)
+        return encoded
+
+    @staticmethod
+    def store_path(directory: str, name: str) -> str:
+        """
+        Il metodo restituisce il percorso dell'archivio name nella cartella indicata.
+        """
+
+        return os.path.join(directory, name + FrameStore.EXTENSION)
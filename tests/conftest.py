@@ -0,0 +1,23 @@
+"""
+Configurazione dei test: il nucleo (core) si importa come pacchetto a sé, l'add-on completo solo dove è disponibile bpy
+(Blender in background o il modulo bpy di PyPI)
+"""
+
+import importlib
+import os
+import sys
+import pytest
+
+ADDON_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ADDON_DIR)  # import core
+sys.path.insert(0, os.path.dirname(ADDON_DIR))  # import dell'add-on come pacchetto
+
+
+@pytest.fixture(scope = "session")
+def addon():
+    """
+    L'add-on importato come pacchetto (test saltato senza bpy).
+    """
+
+    pytest.importorskip("bpy")
+    return importlib.import_module(os.path.basename(ADDON_DIR))
@@ -0,0 +1,62 @@
+"""
+Test del packer degli atlanti: rettangoli disgiunti dentro la pagina, ritagli ricostruibili e duplicati condivisi
+"""
+
+import numpy as np
+
+from core.atlas import AtlasPacker, MaxRects
+
+
+def overlaps(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> bool:
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def test_maxrects_places_disjoint_rects():
+    rng: np.random.Generator = np.random.default_rng(11)
+    packer: MaxRects = MaxRects(128, 128)
+    placed: list[tuple[int, int, int, int]] = []
+    for w, h in rng.integers(3, 30, size = (60, 2)).tolist():
+        found = packer.find(w, h)
+        if found is None: continue
+        packer.place(found[0], found[1], w, h)
+        placed.append((found[0], found[1], w, h))
+
+    assert len(placed) > 20
+    for i, rect in enumerate(placed):
+        assert rect[0] >= 0 and rect[1] >= 0 and rect[0] + rect[2] <= 128 and rect[1] + rect[3] <= 128
+        assert not any(overlaps(rect, other) for other in placed[i + 1:])
+    for free in packer.free:  # i rettangoli liberi non toccano quelli occupati
+        assert not any(overlaps(free, rect) for rect in placed)
+
+
+def sprites(count: int, size: int = 16) -> np.ndarray:
+    rng: np.random.Generator = np.random.default_rng(4)
+    stack: np.ndarray = np.zeros((count, size, size, 4), dtype = np.uint8)
+    for idx in range(count):
+        y, x = rng.integers(0, size // 2, size = 2)
+        h, w = rng.integers(2, size // 2, size = 2)
+        stack[idx, y:y + h, x:x + w] = rng.integers(1, 256, size = (h, w, 4), dtype = np.uint8) | np.array([0, 0, 0, 1], dtype = np.uint8)
+    return stack
+
+
+def test_pack_rebuilds_frames_without_overlap():
+    stack: np.ndarray = sprites(24)
+    stack[5] = stack[2]  # duplicato
+    stack[7] = 0  # frame vuoto
+    pages, entries = AtlasPacker(max_size = 24, padding = 1).pack(stack)
+
+    assert len(pages) > 1  # la pagina piena ne apre una nuova
+    assert entries[5].duplicate_of == 2 and (entries[5].page, entries[5].x, entries[5].y) == (entries[2].page, entries[2].x, entries[2].y)
+    assert entries[7].page == -1
+
+    owners = [entry for entry in entries if entry.page >= 0 and entry.duplicate_of is None]
+    for i, entry in enumerate(owners):
+        rect = (entry.x, entry.y, entry.w, entry.h)
+        assert not any(overlaps(rect, (other.x, other.y, other.w, other.h)) for other in owners[i + 1:] if other.page == entry.page)
+
+    for entry in entries:
+        rebuilt: np.ndarray = np.zeros_like(stack[0])
+        if entry.page >= 0:
+            crop: np.ndarray = pages[entry.page][entry.y:entry.y + entry.h, entry.x:entry.x + entry.w]
+            rebuilt[entry.offset_y:entry.offset_y + entry.h, entry.offset_x:entry.offset_x + entry.w] = crop
+        assert np.array_equal(rebuilt, stack[entry.index])
@@ -0,0 +1,75 @@
+"""
+Test della cache degli sprite: lettura, rimozione LRU oltre la dimensione massima e statistiche cumulative
+"""
+
+import os
+import numpy as np
+
+from cache import RenderCache
+
+
+def sprite(value: int) -> np.ndarray:
+    return np.full((16, 16, 4), value, dtype = np.uint8)
+
+
+def test_get_returns_stored_sprite(tmp_path):
+    with RenderCache(str(tmp_path), 1 << 20) as cache:
+        cache.put("ab01", sprite(3))
+        assert np.array_equal(cache.get("ab01"), sprite(3))
+        assert cache.get("ab02") is None
+        assert (cache.stats.hits, cache.stats.misses, cache.stats.writes) == (1, 1, 1)
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache: RenderCache = RenderCache(str(tmp_path), 1 << 20)
+    for value, key in enumerate(("aa", "bb", "cc")):
+        cache.put(key, sprite(value))
+        os.utime(cache.path(key), (1000 + value, 1000 + value))  # ordine di utilizzo: aa, bb, cc
+    entry_size: int = os.path.getsize(cache.path("aa"))
+
+    cache.max_bytes = int(entry_size * 3.5)
+    assert cache.get("aa") is not None  # aa diventa il più recente
+    cache.put("dd", sprite(9))
+
+    assert cache.get("bb") is None
+    assert all(cache.get(key) is not None for key in ("aa", "cc", "dd"))
+    assert cache.stats.evictions == 1 and cache.stats.evicted_bytes == entry_size
+    assert sum(size for _, size, _ in cache.entries()) <= cache.max_bytes * 0.9
+
+
+def test_totals_accumulate_across_sessions(tmp_path):
+    with RenderCache(str(tmp_path), 1 << 20) as cache:
+        cache.put("aa", sprite(1))
+        cache.get("aa")
+    with RenderCache(str(tmp_path), 1 << 20) as cache:
+        cache.get("aa")
+        cache.get("bb")
+        totals: dict = cache.totals()
+    assert (totals["hits"], totals["misses"], totals["writes"], totals["entries"]) == (2, 1, 1, 1)
+    assert totals["hit_rate"] == 2 / 3
+
+
+def test_clear_removes_every_sprite(tmp_path):
+    with RenderCache(str(tmp_path), 1 << 20) as cache:
+        for key in ("aa", "bb"): cache.put(key, sprite(0))
+        cache.clear()
+        assert cache.entries() == []
+
+
+def test_lighting_data_follow_the_sprite(tmp_path):
+    lighting = tmp_path / "frame_0.lighting.npz"
+    lighting.write_bytes(b"lighting" * 64)
+    target: str = str(tmp_path / "frame_8.lighting.npz")
+
+    cache: RenderCache = RenderCache(str(tmp_path / "cache"), 1 << 20)
+    cache.put("aa", sprite(1), str(lighting))
+    cache.put("bb", sprite(2))
+    assert cache.get("aa", target) is not None
+    with open(target, "rb") as file: assert file.read() == lighting.read_bytes()
+    assert cache.get("bb", str(tmp_path / "frame_9.lighting.npz")) is None  # senza dati di illuminazione lo sprite va renderizzato
+    assert cache.get("bb") is not None
+
+    entry_size: int = os.path.getsize(cache.path("aa"))
+    assert sorted(size for _, size, _ in cache.entries()) == [entry_size, entry_size + len(lighting.read_bytes())]
+    cache.clear()
+    assert not os.path.exists(RenderCache.lighting_path(cache.path("aa")))
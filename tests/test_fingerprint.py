@@ -0,0 +1,46 @@
+"""
+Test delle chiavi di cache degli sprite (richiedono bpy)
+"""
+
+import importlib
+import pytest
+
+
+@pytest.fixture
+def light_scene(addon):
+    import bpy
+    scene = bpy.context.scene
+    light = bpy.data.objects.new("pixelize_test_light", bpy.data.lights.new("pixelize_test_light", "POINT"))
+    scene.collection.objects.link(light)
+    bpy.context.view_layer.update()
+    yield scene, light
+    data = light.data
+    bpy.data.objects.remove(light)
+    bpy.data.lights.remove(data)
+
+
+def test_hidden_light_still_changes_key(addon, light_scene):
+    import bpy
+    fingerprint = importlib.import_module(addon.__name__ + ".fingerprint").SpriteFingerprint
+    scene, light = light_scene
+    hidden: dict[str, bool] = {light.name: False}  # visibilità salvata da RenderSession.begin
+    light.hide_render = True  # come dopo un pass di sola emissione (RenderSession.set_lights(False))
+
+    assert light in fingerprint.renderable(scene, hidden)
+    before: bytes = fingerprint.transforms_digest(scene, bpy.context.evaluated_depsgraph_get(), hidden)
+
+    light.data.energy *= 2
+    bpy.context.view_layer.update()
+    energy: bytes = fingerprint.transforms_digest(scene, bpy.context.evaluated_depsgraph_get(), hidden)
+    assert energy != before
+
+    light.location.x += 1
+    bpy.context.view_layer.update()
+    assert fingerprint.transforms_digest(scene, bpy.context.evaluated_depsgraph_get(), hidden) != energy
+
+
+def test_hidden_light_keeps_original_visibility(addon, light_scene):
+    fingerprint = importlib.import_module(addon.__name__ + ".fingerprint").SpriteFingerprint
+    scene, light = light_scene
+    light.hide_render = False
+    assert light not in fingerprint.renderable(scene, {light.name: True})  # luce esclusa dall'utente
@@ -0,0 +1,69 @@
+"""
+Test della lettura delle immagini: PNG a 16 bit RGBA letti con i valori del file (colore non premoltiplicato, nessuna conversione)
+"""
+
+import struct
+import zlib
+import numpy as np
+import pytest
+
+from core import imaging
+
+
+def write_png16(path: str, pixels: np.ndarray) -> None:
+    """
+    Scrive un PNG RGBA a 16 bit (filtro None) da un array uint16 di forma (altezza, larghezza, 4).
+    """
+
+    height, width, _ = pixels.shape
+    raw: bytes = b"".join(b"\0" + row.astype(">u2").tobytes() for row in pixels)
+    chunk = lambda tag, body: struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body))
+    with open(path, "wb") as file:
+        file.write(imaging.PngDecoder.SIGNATURE + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 16, 6, 0, 0, 0))
+                   + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+@pytest.fixture
+def png16(tmp_path) -> tuple[str, np.ndarray]:
+    rng: np.random.Generator = np.random.default_rng(7)
+    pixels: np.ndarray = rng.integers(0, 65536, size = (5, 7, 4), dtype = np.uint16)
+    pixels[0, 0] = (65535, 32768, 0, 0)  # colore pieno con alpha nullo: resta invariato
+    pixels[0, 1] = (65535, 65535, 65535, 16384)  # alpha parziale: il colore non viene premoltiplicato
+    path: str = str(tmp_path / "sprite16.png")
+    write_png16(path, pixels)
+    return path, (pixels >> 8).astype(np.uint8)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    def force(name: str) -> None:
+        monkeypatch.setenv(imaging.ImagingUtils.ENVIRONMENT, name)
+        monkeypatch.setattr(imaging.ImagingUtils, "_backend", None)
+    return force
+
+
+def test_decoder_reads_16bit_rgba(png16):
+    path, expected = png16
+    assert np.array_equal(imaging.PngDecoder.read(path), expected)
+
+
+def test_numpy_backend_round_trip(png16, backend):
+    path, expected = png16
+    backend("NUMPY")
+    assert imaging.ImagingUtils.backend() == "NUMPY"
+    assert np.array_equal(imaging.ImagingUtils.load(path), expected)
+
+
+def test_pil_backend_matches_decoder(png16, backend):
+    pytest.importorskip("PIL")
+    path, expected = png16
+    backend("PIL")
+    assert np.array_equal(imaging.ImagingUtils.load(path), expected)
+
+
+def test_blender_backend_keeps_file_values(png16, backend):
+    pytest.importorskip("bpy")
+    path, expected = png16
+    backend("BLENDER")
+    pixels: np.ndarray = imaging.ImagingUtils.load(path)
+    assert np.abs(pixels.astype(np.int16) - expected).max() <= 1  # arrotondamento invece del byte più significativo
@@ -0,0 +1,54 @@
+"""
+Test dei colori indicizzati: palette, conversione dei pixel negli indici e PNG in modalità palette
+"""
+
+import zlib
+import numpy as np
+
+from core import indexed
+from core.sheet import SheetPatcher
+
+PALETTE: dict = {
+    "Skin": {"gradients": {"0.5": "#c08060", "0.0": "#804020"}, "border": "#201010", "dithering": 0.1},
+    "Cloth": {"gradients": {"0.0": "#2040a0"}, "border": "#201010", "dithering": 0.0, "light": "#ffffff"},
+}
+
+
+def test_palette_colors_in_order_without_repeats():
+    palette: indexed.IndexedPalette = indexed.IndexedPalette.from_palette(PALETTE)
+    assert palette.colors.tolist() == [[0, 0, 0], [0x80, 0x40, 0x20], [0xC0, 0x80, 0x60], [0x20, 0x10, 0x10], [0x20, 0x40, 0xA0]]
+    assert palette.alpha.tolist() == [0, 255, 255, 255, 255]
+
+
+def test_encode_indices_and_unknown_colors():
+    encoder: indexed.IndexedEncoder = indexed.IndexedEncoder(indexed.IndexedPalette.from_palette(PALETTE))
+    pixels: np.ndarray = np.array([[
+        [0x80, 0x40, 0x20, 255],  # colore della palette
+        [0xC1, 0x7F, 0x60, 255],  # entro la tolleranza
+        [0x22, 0x44, 0xA8, 200],  # fuori palette: colore più vicino
+        [0xC0, 0x80, 0x60, 10],  # trasparente
+    ]], dtype = np.uint8)
+
+    assert encoder.encode(pixels).tolist() == [[1, 2, 4, indexed.IndexedPalette.TRANSPARENT]]
+    assert encoder.unknown == {(0x22, 0x44, 0xA8): 1}
+    assert "#2244a8 (1 px)" in encoder.report()
+
+
+def test_indexed_writer_writes_palette_png(tmp_path):
+    encoder: indexed.IndexedEncoder = indexed.IndexedEncoder(indexed.IndexedPalette.from_palette(PALETTE))
+    pixels: np.ndarray = np.zeros((4, 3, 4), dtype = np.uint8)
+    pixels[1:3, 1] = (0x20, 0x40, 0xA0, 255)
+    path: str = str(tmp_path / "sheet.png")
+    with indexed.open_writer(path, 3, 4, encoder, band_rows = 2) as writer:
+        writer.write(pixels)
+
+    blocks: dict[bytes, bytes] = {}
+    with open(path, "rb") as file:
+        for tag, offset, length in SheetPatcher.chunks(file):
+            file.seek(offset + 8)
+            blocks[tag] = blocks.get(tag, b"") + file.read(length)
+
+    assert blocks[b"IHDR"][9] == 3  # modalità palette
+    assert blocks[b"PLTE"] == encoder.palette.colors.tobytes() and blocks[b"tRNS"] == encoder.palette.alpha.tobytes()
+    rows: np.ndarray = np.frombuffer(zlib.decompress(blocks[b"IDAT"]), dtype = np.uint8).reshape(4, 4)[:, 1:]
+    assert rows.tolist() == [[0, 0, 0], [0, 4, 0], [0, 4, 0], [0, 0, 0]]
@@ -0,0 +1,58 @@
+"""
+Test del journal dei job: ripresa dopo una riga troncata, checksum degli sprite e parametri del job
+"""
+
+import os
+import numpy as np
+
+from journal import JobJournal
+
+PARAMS: dict = {"rows": 8, "cols": 2, "scene": "abc"}
+
+
+def sprite(value: int) -> np.ndarray:
+    return np.full((2, 2, 4), value, dtype = np.uint8)
+
+
+def crash(tmp_path) -> str:
+    """
+    Registra due sprite e simula un crash durante la scrittura del terzo (riga troncata).
+    """
+
+    path: str = str(tmp_path / "job.journal")
+    journal: JobJournal = JobJournal(path, PARAMS)
+    assert not journal.open()
+    journal.record(0, 1, 0, sprite(1))
+    journal.record(1, 1, 45, sprite(2))
+    journal.close()
+    with open(path, "a", encoding = "utf-8") as file:
+        file.write('{"idx": 2, "frame": 1, "ang')
+    return path
+
+
+def test_resume_after_truncated_line(tmp_path):
+    path: str = crash(tmp_path)
+    frames: np.ndarray = np.stack([sprite(1), sprite(2), sprite(3)])
+
+    with JobJournal(path, PARAMS) as journal:
+        assert sorted(journal.entries) == [0, 1]
+        assert journal.verify(frames, np.array([1, 1, 1])) == {0, 1}
+        journal.record(2, 1, 90, frames[2])
+
+    with JobJournal(path, PARAMS) as journal:  # la riga interrotta resta isolata, quelle successive sono valide
+        assert sorted(journal.entries) == [0, 1, 2]
+
+
+def test_changed_sprites_are_rendered_again(tmp_path):
+    path: str = crash(tmp_path)
+    with JobJournal(path, PARAMS) as journal:
+        assert journal.verify(np.stack([sprite(1), sprite(9)]), np.array([1, 1])) == {0}
+        assert journal.verify(np.stack([sprite(1), sprite(2)]), np.array([0, 1])) == set()  # il frame 0 non è nell'archivio
+
+
+def test_other_job_starts_over(tmp_path):
+    path: str = crash(tmp_path)
+    journal: JobJournal = JobJournal(path, dict(PARAMS, scene = "def"))
+    assert not journal.open() and journal.entries == {}
+    journal.finish()
+    assert not os.path.exists(path)
@@ -0,0 +1,34 @@
+"""
+Test della codifica dei buffer BYTE: i colori della palette, scritti in 8 bit e riletti, tornano gli stessi colori sRGB
+"""
+
+import numpy as np
+
+from core.palette import PaletteUtils
+
+PALETTE: list[str] = ["#000000", "#010101", "#0d0d0d", "#101010", "#131313", "#3a2b1c", "#7f7f7f", "#c0ffee", "#ffffff"]
+
+
+def to_bytes(linear: np.ndarray) -> np.ndarray:
+    """
+    Riporta i colori lineari nei byte sRGB dell'output finale.
+    """
+
+    return np.rint(PaletteUtils.linear_to_srgb(linear) * 255).astype(np.uint8)
+
+
+def test_palette_round_trips_through_byte_buffer():
+    linear: np.ndarray = np.stack([PaletteUtils.hex_to_linear(color) for color in PALETTE])
+    pixels: np.ndarray = np.concatenate((linear, np.ones((len(PALETTE), 1), dtype = np.float32)), axis = -1)[None]
+
+    stored: np.ndarray = PaletteUtils.encode_bytes(pixels)
+    expected: np.ndarray = np.array([[int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in PALETTE], dtype = np.uint8)
+    assert np.array_equal(stored[0, :, :3], expected)  # i byte del buffer sono i colori della palette
+    assert np.array_equal(to_bytes(PaletteUtils.decode_bytes(stored)[0, :, :3]), expected)
+
+
+def test_alpha_is_stored_linearly():
+    pixels: np.ndarray = np.array([[[0.5, 0.5, 0.5, 0.5], [2.0, -1.0, 0.0, 1.5]]], dtype = np.float32)
+    stored: np.ndarray = PaletteUtils.encode_bytes(pixels)
+    assert stored[0, 0, 3] == 128 and stored[0, 1, 3] == 255
+    assert tuple(stored[0, 1, :3]) == (255, 0, 0)  # valori limitati a [0, 1]
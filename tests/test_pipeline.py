@@ -0,0 +1,87 @@
+"""
+Test della pipeline che compone la spritesheet durante il rendering: griglia per colonne, pixel letti dall'archivio dei frame
+"""
+
+import numpy as np
+import pytest
+
+from core import frames
+from core import pipeline
+from store import FrameStore
+
+
+class BandRecorder:
+    """
+    Writer che conserva le fasce ricevute.
+    """
+
+    def __init__(self):
+        self.bands: list[np.ndarray] = []
+
+    def write(self, rows: np.ndarray) -> None:
+        self.bands.append(rows.copy())
+
+
+def sprites(count: int, size: int = 12) -> np.ndarray:
+    rng: np.random.Generator = np.random.default_rng(3)
+    stack: np.ndarray = np.zeros((count, size, size, 4), dtype = np.uint8)
+    for idx in range(count):  # un rettangolo opaco in una posizione diversa per ogni sprite
+        y, x = rng.integers(0, size - 4, size = 2)
+        stack[idx, y:y + 4, x:x + 3] = (idx * 7 % 256, 50, 200, 255)
+    return stack
+
+
+def render(store: FrameStore, stack: np.ndarray, sheet: pipeline.SheetPipeline) -> None:
+    """
+    Simula il rendering: ogni sprite viene scritto nell'archivio e poi consegnato alla pipeline, nell'ordine del job.
+    """
+
+    with sheet:
+        for idx in range(len(stack)):
+            store.write(idx, stack[idx])
+            sheet.submit(idx)
+        sheet.result()
+
+
+@pytest.mark.parametrize("anchor", [False, True])
+def test_animation_sheet_from_store(tmp_path, anchor):
+    angles, count_frames, frame_size = 8, 5, 8
+    stack: np.ndarray = sprites(angles * count_frames)
+    recorder: BandRecorder = BandRecorder()
+    with FrameStore.create(str(tmp_path / "job.pxstore"), len(stack), 12, 12) as store:
+        sheet = pipeline.SheetPipeline(store.frames, angles, count_frames, frame_size, center = True, anchor = anchor,
+                                       workers = 2, writer = recorder)
+        render(store, stack, sheet)
+
+    assert len(recorder.bands) == angles  # una fascia per angolo, una colonna per frame
+    expected: np.ndarray = frames.FrameEngine.process(stack, angles, count_frames, frame_size, center = True, anchor = anchor)
+    assert np.array_equal(np.concatenate(recorder.bands), expected)
+
+
+def test_bands_are_written_while_rendering(tmp_path):
+    stack: np.ndarray = sprites(8)
+    recorder: BandRecorder = BandRecorder()
+    with FrameStore.create(str(tmp_path / "multiangle.pxstore"), len(stack), 12, 12) as store:
+        with pipeline.SheetPipeline(store.frames, 8, 1, 12, workers = 2, writer = recorder) as sheet:
+            for idx in range(3):
+                store.write(idx, stack[idx])
+                sheet.submit(idx)
+            sheet.close()  # attende i consumatori, senza consegnare le fasce incomplete
+
+    assert len(recorder.bands) == 3  # le fasce dei primi tre angoli, prima della fine del job
+    assert np.array_equal(np.concatenate(recorder.bands), frames.FrameEngine.sheet(stack, 8, 1)[:3 * 12])
+
+
+def test_result_without_writer_matches_sheet():
+    stack: np.ndarray = sprites(3 * 4)
+    with pipeline.SheetPipeline(stack, 3, 4, 12) as sheet:
+        for idx in reversed(range(len(stack))):  # anche fuori ordine
+            sheet.submit(idx)
+        result: np.ndarray = sheet.result()
+    assert np.array_equal(result, frames.FrameEngine.sheet(stack, 3, 4))
+
+
+def test_sheet_is_column_major():
+    stack: np.ndarray = np.arange(6, dtype = np.uint8).reshape(6, 1, 1, 1).repeat(4, axis = -1)
+    grid: np.ndarray = frames.FrameEngine.sheet(stack, 2, 3)[..., 0]
+    assert grid.tolist() == [[0, 2, 4], [1, 3, 5]]  # il frame idx va nella colonna idx // rows e nella riga idx % rows
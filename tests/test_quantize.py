@@ -0,0 +1,53 @@
+"""
+Test della quantizzazione sulla palette: i colori della palette restano invariati, gli altri vanno sul colore più vicino
+"""
+
+import numpy as np
+import pytest
+
+from core import quantize
+
+PALETTE: np.ndarray = np.array([[0x10, 0x10, 0x10], [0x13, 0x13, 0x13], [0xC0, 0x20, 0x20], [0x20, 0xC0, 0x20], [0xF0, 0xF0, 0xF0]], dtype = np.uint8)
+
+
+def rgba(colors, alpha: int = 255) -> np.ndarray:
+    colors = np.asarray(colors, dtype = np.uint8).reshape(-1, 3)
+    return np.concatenate((colors, np.full((len(colors), 1), alpha, dtype = np.uint8)), axis = -1)
+
+
+@pytest.fixture(scope = "module")
+def lut() -> quantize.PaletteLUT:
+    return quantize.PaletteLUT(PALETTE, bins = 64)
+
+
+def test_close_palette_colors_share_a_cell(lut):
+    words: np.ndarray = rgba(PALETTE[:2]).view("<u4")[:, 0]
+    cells: np.ndarray = lut.cells(words)
+    assert cells[0] == cells[1]  # con 64 celle per canale #101010 e #131313 cadono nella stessa cella
+
+
+def test_palette_colors_are_unchanged(lut):
+    pixels: np.ndarray = rgba(PALETTE)[None]
+    assert np.array_equal(lut.snap(pixels), pixels)
+    assert lut.indices(pixels)[0].tolist() == list(range(len(PALETTE)))
+
+
+def test_other_colors_snap_to_nearest(lut):
+    pixels: np.ndarray = rgba([[0xB8, 0x28, 0x1C], [0x1C, 0xB8, 0x28], [0xFA, 0xFA, 0xFA]])
+    assert np.array_equal(lut.snap(pixels)[:, :3], PALETTE[[2, 3, 4]])
+
+
+def test_alpha_is_kept_and_transparent_pixels_untouched(lut):
+    pixels: np.ndarray = np.array([[0xB8, 0x28, 0x1C, 128], [0x55, 0x66, 0x77, 0]], dtype = np.uint8)
+    snapped: np.ndarray = lut.snap(pixels)
+    assert snapped[0].tolist() == [0xC0, 0x20, 0x20, 128]
+    assert snapped[1].tolist() == [0x55, 0x66, 0x77, 0]
+
+
+def test_cached_table_is_reused(tmp_path):
+    path = tmp_path / "palette.json"
+    path.write_text("{}")
+    first: quantize.PaletteLUT = quantize.PaletteLUT.cached(str(path), PALETTE, 16, str(tmp_path / "cache"))
+    quantize.PaletteLUT._cache.clear()
+    second: quantize.PaletteLUT = quantize.PaletteLUT.cached(str(path), PALETTE, 16, str(tmp_path / "cache"))
+    assert first is not second and np.array_equal(first.table, second.table)
@@ -0,0 +1,71 @@
+"""
+Test dello scheduler della farm: divisione in porzioni, work stealing e riassegnazione del lavoro di un worker terminato
+"""
+
+import pytest
+
+from scheduler import FarmPlan, Shard, WorkStealingScheduler
+
+
+def items(frames: int, angles: int = 8) -> list[tuple[int, int, str]]:
+    return [(frame, angle * 45, f"frame_{frame * angles + angle}") for frame in range(frames) for angle in range(angles)]
+
+
+def shards(count: int) -> list[Shard]:
+    return [Shard(idx, idx, [(idx, 0, f"frame_{idx}")]) for idx in range(count)]
+
+
+def drain(scheduler: WorkStealingScheduler, worker: int) -> list[int]:
+    taken: list[int] = []
+    while (shard := scheduler.next(worker)) is not None:
+        scheduler.finished(worker, 1.0)
+        taken.append(shard.id)
+    return taken
+
+
+def test_shards_hold_one_frame():
+    split: list[Shard] = WorkStealingScheduler.shards(items(3), 4, {"0": 2.0, "1": 1.0})
+    assert [(shard.frame, shard.start, len(shard.items)) for shard in split] == [(0, 0, 4), (0, 4, 4), (1, 8, 4), (1, 12, 4), (2, 16, 4), (2, 20, 4)]
+    assert [shard.cost for shard in split] == [8.0, 8.0, 4.0, 4.0, 6.0, 6.0]  # il frame senza misura costa come la media
+
+
+def test_initial_queues_are_consecutive():
+    scheduler: WorkStealingScheduler = WorkStealingScheduler(shards(8), 2)
+    assert [[shard.id for shard in queue] for queue in scheduler.queues] == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+
+def test_idle_worker_steals_from_the_tail():
+    scheduler: WorkStealingScheduler = WorkStealingScheduler(shards(8), 2)
+    assert scheduler.next(0).id == 0
+    assert [scheduler.next(1).id for _ in range(4)] == [4, 5, 6, 7]
+    assert scheduler.next(1).id == 3  # metà del costo rimasto al worker 0, dalla fine della coda
+    assert scheduler.steals == 1 and [shard.id for shard in scheduler.queues[0]] == [1, 2]
+    scheduler.finished(0, 1.0)
+    scheduler.finished(1, 1.0)
+    assert drain(scheduler, 0) == [1, 2]
+    assert scheduler.done()
+
+
+def test_failed_worker_work_is_reassigned():
+    scheduler: WorkStealingScheduler = WorkStealingScheduler(shards(9), 3)
+    running: Shard = scheduler.next(0)
+    scheduler.failed(0)
+
+    assert not scheduler.alive[0] and not scheduler.queues[0] and 0 not in scheduler.running
+    queued: list[int] = sorted(shard.id for queue in scheduler.queues for shard in queue)
+    assert queued == list(range(9))  # anche la porzione in esecuzione torna in coda
+    assert running.id in [shard.id for worker in (1, 2) for shard in scheduler.queues[worker]]
+    assert sorted(drain(scheduler, 1) + drain(scheduler, 2)) == list(range(9))
+    assert scheduler.done()
+
+
+def test_all_workers_failed():
+    scheduler: WorkStealingScheduler = WorkStealingScheduler(shards(2), 1)
+    scheduler.next(0)
+    with pytest.raises(RuntimeError):
+        scheduler.failed(0)
+
+
+def test_plan_uses_more_workers_for_small_sprites():
+    assert FarmPlan.auto(64, 64, shards = 100, cores = 16) == FarmPlan(8, 2)
+    assert FarmPlan.auto(1024, 1024, shards = 100, cores = 16) == FarmPlan(1, 16)
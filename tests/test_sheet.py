@@ -0,0 +1,110 @@
+"""
+Test della scrittura delle spritesheet a fasce: i PNG vengono decodificati con zlib, che ne verifica anche l'adler32
+"""
+
+import zlib
+import numpy as np
+import pytest
+
+from core.sheet import SheetPatcher, SheetWriter
+
+
+def decode_png(path: str) -> np.ndarray:
+    """
+    Decodifica un PNG RGBA a 8 bit scritto da SheetWriter (righe con filtro 0).
+    """
+
+    with open(path, "rb") as file:
+        blocks: list[tuple[bytes, bytes]] = []
+        for tag, offset, length in SheetPatcher.chunks(file):
+            file.seek(offset + 8)
+            blocks.append((tag, file.read(length)))
+
+    header: bytes = dict(blocks)[b"IHDR"]
+    width, height = int.from_bytes(header[:4], "big"), int.from_bytes(header[4:8], "big")
+    raw: bytes = zlib.decompress(b"".join(data for tag, data in blocks if tag == b"IDAT"))  # errore se l'adler32 non torna
+    rows: np.ndarray = np.frombuffer(raw, dtype = np.uint8).reshape(height, 1 + width * 4)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 4)
+
+
+def sheet(height: int, width: int, seed: int = 5) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, size = (height, width, 4), dtype = np.uint8)
+
+
+@pytest.mark.parametrize("band_rows", [None, 4, 5])
+def test_png_round_trip(tmp_path, band_rows):
+    pixels: np.ndarray = sheet(12, 7)
+    path: str = str(tmp_path / "sheet.png")
+    with SheetWriter(path, 7, 12, band_rows = band_rows) as writer:
+        for start in range(0, 12, 3):  # fasce ricevute di 3 righe, anche a cavallo delle fasce del file
+            writer.write(pixels[start:start + 3])
+    assert np.array_equal(decode_png(path), pixels)
+
+
+def test_banded_png_has_index(tmp_path):
+    path: str = str(tmp_path / "sheet.png")
+    with SheetWriter(path, 3, 10, band_rows = 4) as writer:
+        writer.write(sheet(10, 3))
+    index: dict = SheetPatcher.index(path)
+    assert index["rows"] == 4 and [band[0] for band in index["bands"]] == [4 * 13, 4 * 13, 2 * 13]
+
+
+def test_missing_rows_are_transparent(tmp_path):
+    path: str = str(tmp_path / "sheet.png")
+    pixels: np.ndarray = sheet(2, 4)
+    with SheetWriter(path, 4, 6, band_rows = 2) as writer:
+        writer.write(pixels)
+    decoded: np.ndarray = decode_png(path)
+    assert np.array_equal(decoded[:2], pixels) and not decoded[2:].any()
+
+
+def test_raw_format(tmp_path):
+    path: str = str(tmp_path / "sheet.rgba")
+    pixels: np.ndarray = sheet(4, 5)
+    with SheetWriter(path, 5, 4, SheetWriter.format_for(path)) as writer:
+        writer.write(pixels)
+    assert np.array_equal(np.fromfile(path, dtype = np.uint8).reshape(4, 5, 4), pixels)
+
+
+def test_combine_adler_matches_zlib():
+    first, second = b"pixelize" * 100, bytes(range(256)) * 3
+    combined: int = SheetWriter.combine_adler(zlib.adler32(first), zlib.adler32(second), len(second))
+    assert combined == zlib.adler32(first + second)
+
+
+def test_patch_replaces_only_selected_bands(tmp_path):
+    path: str = str(tmp_path / "sheet.png")
+    pixels: np.ndarray = sheet(12, 6)
+    with SheetWriter(path, 6, 12, band_rows = 4) as writer:
+        writer.write(pixels)
+    before: dict = SheetPatcher.index(path)
+
+    patched: np.ndarray = pixels.copy()
+    patched[4:8] = sheet(4, 6, seed = 9)
+    assert SheetPatcher.compatible(path, 6, 12, 4)
+    SheetPatcher.patch(path, {1: patched[4:8]})
+
+    assert np.array_equal(decode_png(path), patched)  # adler32 delle fasce ricombinato
+    after: dict = SheetPatcher.index(path)
+    assert after["bands"][0] == before["bands"][0] and after["bands"][2] == before["bands"][2]
+    assert after["bands"][1] != before["bands"][1]
+
+
+def test_patch_raw_sheet(tmp_path):
+    path: str = str(tmp_path / "sheet.rgba")
+    pixels: np.ndarray = sheet(6, 3)
+    with SheetWriter(path, 3, 6, "RAW") as writer:
+        writer.write(pixels)
+    pixels[2:4] = 7
+    SheetPatcher.patch(path, {1: pixels[2:4]})
+    assert np.array_equal(np.fromfile(path, dtype = np.uint8).reshape(6, 3, 4), pixels)
+
+
+def test_sheet_without_bands_is_not_patchable(tmp_path):
+    path: str = str(tmp_path / "sheet.png")
+    with SheetWriter(path, 4, 4) as writer:
+        writer.write(sheet(4, 4))
+    assert not SheetPatcher.compatible(path, 4, 4, 4)
+    with pytest.raises(ValueError):
+        SheetPatcher.patch(path, {0: sheet(4, 4)})
@@ -0,0 +1,45 @@
+"""
+Test dell'archivio dei frame: creazione, riapertura con i metadati e codifica dei pixel di Blender
+"""
+
+import numpy as np
+import pytest
+
+from store import FrameStore
+
+
+def test_frames_survive_reopen(tmp_path):
+    path: str = FrameStore.store_path(str(tmp_path), "job")
+    frame: np.ndarray = np.random.default_rng(2).integers(0, 256, size = (5, 6, 4), dtype = np.uint8)
+    with FrameStore.create(path, 3, 5, 6, {"rows": 8, "cols": 1}) as store:
+        assert not store.read(0).any() and not store.complete()  # i frame non scritti sono trasparenti
+        store.write(1, frame)
+
+    with FrameStore.open(path) as store:
+        assert store.count == 3 and store.meta["rows"] == 8 and store.meta["cols"] == 1
+        assert store.written.tolist() == [0, 1, 0]
+        assert np.array_equal(store.read(1), frame)
+        assert store.frames.offset % FrameStore.ALIGNMENT == 0
+
+
+def test_complete_after_every_frame(tmp_path):
+    with FrameStore.create(str(tmp_path / "job.pxstore"), 2, 1, 1) as store:
+        for idx in range(2):
+            store.write(idx, np.full((1, 1, 4), idx, dtype = np.uint8))
+        assert store.complete()
+
+
+def test_open_rejects_other_files(tmp_path):
+    path = tmp_path / "other.pxstore"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(32))
+    with pytest.raises(ValueError):
+        FrameStore.open(str(path))
+
+
+def test_encode_flips_rows_and_converts_to_srgb():
+    pixels: np.ndarray = np.zeros((2, 1, 4), dtype = np.float32)
+    pixels[0, 0] = (0.5, 0.5, 0.5, 0.5)  # riga in basso, premoltiplicata
+    pixels[1, 0] = (1.5, 0.0, 0.0031308, 1.0)  # riga in alto
+    encoded: np.ndarray = FrameStore.encode(pixels, premultiplied = True)
+    assert encoded[0, 0].tolist() == [255, 0, 10, 255]
+    assert encoded[1, 0].tolist() == [255, 255, 255, 128]  # alpha non premoltiplicato
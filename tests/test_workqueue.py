@@ -0,0 +1,61 @@
+"""
+Test della coda di lavoro su cartella condivisa: lock esclusivi, scadenza dei lock e tentativi falliti
+"""
+
+import os
+
+from workqueue import WorkItem, WorkQueue
+
+
+def queue(tmp_path, worker: str, count: int = 1, **kwargs) -> WorkQueue:
+    work: WorkQueue = WorkQueue(str(tmp_path / "queue"), lease = 60.0, worker = worker, **kwargs)
+    if not os.path.exists(work.root): work.create([WorkItem(f"{idx:06d}", idx, idx, 0) for idx in range(count)], {"rows": 8, "cols": 1})
+    return work
+
+
+def age(work: WorkQueue, item: WorkItem, seconds: float) -> None:
+    lock: str = work.path("claims", item.id + ".lock")
+    mtime: float = os.stat(lock).st_mtime - seconds
+    os.utime(lock, (mtime, mtime))
+
+
+def test_locks_are_exclusive(tmp_path):
+    first: WorkQueue = queue(tmp_path, "a", count = 2)
+    second: WorkQueue = queue(tmp_path, "b")
+    assert first.claim().index == 0
+    assert second.claim().index == 1
+    assert second.claim() is None
+    assert first.status() == {"done": 0, "running": 2, "failed": 0, "waiting": 0}
+
+
+def test_expired_lock_is_taken_over(tmp_path):
+    first: WorkQueue = queue(tmp_path, "a")
+    second: WorkQueue = queue(tmp_path, "b")
+    item: WorkItem = first.claim()
+
+    age(first, item, 30)  # entro la scadenza
+    assert second.claim() is None
+    age(first, item, 60)  # il worker non rinnova più il lock
+    assert second.claim().id == item.id
+
+
+def test_renewed_lock_does_not_expire(tmp_path):
+    first: WorkQueue = queue(tmp_path, "a")
+    second: WorkQueue = queue(tmp_path, "b")
+    item: WorkItem = first.claim()
+    age(first, item, 120)
+    first.renew(item)
+    assert second.claim() is None
+
+
+def test_complete_and_failed_attempts(tmp_path):
+    work: WorkQueue = queue(tmp_path, "a", count = 2, max_attempts = 2)
+    source = tmp_path / "sprite.png"
+    source.write_bytes(b"png")
+    work.complete(work.claim(), str(source))
+
+    for _ in range(2):
+        work.fail(work.claim(), "errore")
+    assert work.claim() is None
+    assert work.status() == {"done": 1, "running": 0, "failed": 1, "waiting": 0}
+    assert work.finished()
@@ -0,0 +1,301 @@
+"""
+Il modulo contiene la coda di lavoro su filesystem condiviso (ad esempio NFS), per distribuire un job su più macchine
+"""
+
+from dataclasses import dataclass, asdict, field
+from typing import Any, Callable, Optional
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+
+@dataclass
+class WorkItem:
+    """
+    classe che descrive uno sprite da renderizzare con la coda
+    """
+
+    id: str  # il nome dei file dello sprite nella coda
+    index: int  # l'indice nel job (la posizione nella spritesheet)
+    frame: int
+    angle: Optional[int]
+    config: dict[str, Any] = field(default_factory = dict)  # impostazioni del pass (pipeline, campioni, ...)
+
+
+class WorkQueue:
+    """
+    La classe gestisce una coda di lavoro in una cartella condivisa tra più macchine:
+    - job.json: i metadati del job (righe, colonne, dimensioni, ...);
+    - todo/<id>.json: gli sprite da renderizzare;
+    - claims/<id>.lock: il lock del worker che sta renderizzando lo sprite, con scadenza rinnovata dal worker;
+    - results/<id>.png: gli sprite completati, pubblicati con una rinomina atomica;
+    - errors/<id>.<worker>.<n>.txt: i tentativi falliti.
+
+    I lock vengono acquisiti con un hard link, atomico anche su NFS; la scadenza si misura con l'orologio del server
+    (la data di modifica di un file appena scritto), così gli orologi diversi delle macchine non contano.
+    Un lock scaduto appartiene a un worker terminato: viene rimosso e lo sprite torna disponibile.
+    """
+
+    DIRECTORIES: tuple[str, ...] = ("todo", "claims", "results", "errors")
+    RESULT_EXTENSION: str = ".png"
+
+    def __init__(self, root: str, lease: float = 120.0, max_attempts: int = 3, worker: Optional[str] = None):
+        """
+        Args:
+            - root: la cartella condivisa della coda.
+            - lease: i secondi dopo i quali un lock non rinnovato scade.
+            - max_attempts: i tentativi falliti dopo i quali uno sprite non viene più assegnato.
+            - worker: il nome del worker (host e processo se None).
+        """
+
+        self.root: str = root
+        self.lease: float = lease
+        self.max_attempts: int = max_attempts
+        self.worker: str = worker or f"{socket.gethostname()}-{os.getpid()}"
+
+    def path(self, directory: str, name: str) -> str:
+        """
+        Il metodo restituisce il percorso di un file della coda.
+        """
+
+        return os.path.join(self.root, directory, name)
+
+    # ... coordinatore ...
+    def create(self, items: list[WorkItem], meta: dict[str, Any]) -> None:
+        """
+        Il metodo crea la coda con gli sprite del job; una coda esistente viene sostituita.
+        """
+
+        if os.path.exists(self.root): shutil.rmtree(self.root)
+        for directory in WorkQueue.DIRECTORIES: os.makedirs(os.path.join(self.root, directory))
+
+        WorkQueue.write_json(os.path.join(self.root, "job.json"), dict(meta, count = len(items)))
+        for item in items: WorkQueue.write_json(self.path("todo", item.id + ".json"), asdict(item))
+
+    @property
+    def meta(self) -> dict[str, Any]:
+        """
+        I metadati del job.
+        """
+
+        with open(os.path.join(self.root, "job.json"), "r") as file:
+            return json.load(file)
+
+    def items(self) -> list[WorkItem]:
+        """
+        Il metodo restituisce gli sprite della coda, nell'ordine del job.
+        """
+
+        items: list[WorkItem] = []
+        for name in os.listdir(os.path.join(self.root, "todo")):
+            with open(self.path("todo", name), "r") as file:
+                items.append(WorkItem(**json.load(file)))
+        return sorted(items, key = lambda item: item.index)
+
+    def result(self, item: WorkItem) -> str:
+        """
+        Il metodo restituisce il percorso del risultato dello sprite.
+        """
+
+        return self.path("results", item.id + WorkQueue.RESULT_EXTENSION)
+
+    def attempts(self, item: WorkItem) -> int:
+        """
+        Il metodo restituisce il numero di tentativi falliti dello sprite.
+        """
+
+        return sum(1 for name in os.listdir(os.path.join(self.root, "errors")) if name.startswith(item.id + "."))
+
+    def status(self) -> dict[str, int]:
+        """
+        Il metodo conta gli sprite completati, in corso, falliti (senza altri tentativi) e in attesa.
+        """
+
+        counts: dict[str, int] = {"done": 0, "running": 0, "failed": 0, "waiting": 0}
+        for item in self.items():
+            if os.path.exists(self.result(item)): counts["done"] += 1
+            elif os.path.exists(self.path("claims", item.id + ".lock")): counts["running"] += 1
+            elif self.attempts(item) >= self.max_attempts: counts["failed"] += 1
+            else: counts["waiting"] += 1
+        return counts
+
+    def finished(self) -> bool:
+        """
+        Il metodo verifica che ogni sprite sia completato o fallito definitivamente.
+        """
+
+        counts: dict[str, int] = self.status()
+        return counts["running"] == 0 and counts["waiting"] == 0
+
+    # ... worker ...
+    def now(self) -> float:
+        """
+        Il metodo restituisce l'ora del server che ospita la cartella, leggendo la data di un file appena scritto.
+        """
+
+        clock: str = self.path("claims", f".clock.{self.worker}")
+        with open(clock, "w"): pass
+        try:
+            return os.stat(clock).st_mtime
+        finally:
+            os.remove(clock)
+
+    def claim(self) -> Optional[WorkItem]:
+        """
+        Il metodo acquisisce il primo sprite disponibile, liberando i lock scaduti.
+        Restituisce None se non ci sono sprite disponibili (potrebbero essercene in corso su altri worker).
+        """
+
+        now: Optional[float] = None
+        for item in self.items():
+            if os.path.exists(self.result(item)) or self.attempts(item) >= self.max_attempts: continue
+
+            lock: str = self.path("claims", item.id + ".lock")
+            if self._acquire(lock): return item
+
+            now = now if now is not None else self.now()
+            if self._expired(lock, now) and self._break(lock, now) and self._acquire(lock): return item
+
+        return None
+
+    def renew(self, item: WorkItem) -> None:
+        """
+        Il metodo rinnova il lock dello sprite (da chiamare più spesso della scadenza durante il rendering).
+        """
+
+        os.utime(self.path("claims", item.id + ".lock"))
+
+    def complete(self, item: WorkItem, source: str) -> str:
+        """
+        Il metodo pubblica il risultato dello sprite (copiato da source) e rilascia il lock.
+        """
+
+        result: str = self.result(item)
+        partial: str = f"{result}.{self.worker}.part"
+        shutil.copyfile(source, partial)
+        os.replace(partial, result)  # il risultato compare completo o non compare
+        self.release(item)
+        return result
+
+    def fail(self, item: WorkItem, message: str) -> None:
+        """
+        Il metodo registra un tentativo fallito e rilascia lo sprite per un altro tentativo.
+        """
+
+        with open(self.path("errors", f"{item.id}.{self.worker}.{uuid.uuid4().hex[:8]}.txt"), "w") as file:
+            file.write(message)
+        self.release(item)
+
+    def release(self, item: WorkItem) -> None:
+        """
+        Il metodo rilascia il lock dello sprite.
+        """
+
+        try:
+            os.remove(self.path("claims", item.id + ".lock"))
+        except FileNotFoundError:
+            pass
+
+    def run(self, render: Callable[[WorkItem], str], poll: float = 5.0) -> int:
+        """
+        Il metodo esegue il ciclo di un worker: acquisisce gli sprite, li renderizza e ne pubblica i risultati
+        finché la coda non è finita. Durante il rendering un thread rinnova il lock a ogni quarto di scadenza.
+
+        Args:
+            - render: la funzione che renderizza lo sprite e restituisce il percorso del file prodotto.
+            - poll: i secondi di attesa quando gli sprite rimasti sono tutti in corso su altri worker.
+
+        Returns:
+            - il numero di sprite completati dal worker.
+        """
+
+        completed: int = 0
+        while True:
+            item: Optional[WorkItem] = self.claim()
+            if item is None:
+                if self.finished(): return completed
+                time.sleep(poll)  # un lock potrebbe scadere
+                continue
+
+            stop: threading.Event = threading.Event()
+            def heartbeat() -> None:
+                while not stop.wait(self.lease / 4):
+                    try:
+                        self.renew(item)
+                    except OSError:
+                        pass
+
+            thread: threading.Thread = threading.Thread(target = heartbeat, daemon = True)
+            thread.start()
+            try:
+                self.complete(item, render(item))
+                completed += 1
+            except Exception:
+                self.fail(item, traceback.format_exc())
+            finally:
+                stop.set()
+                thread.join()
+
+    def _acquire(self, lock: str) -> bool:
+        """
+        Il metodo prova ad acquisire il lock: un file temporaneo viene collegato al nome del lock, operazione che fallisce se esiste già.
+        """
+
+        temporary: str = f"{lock}.{self.worker}.{uuid.uuid4().hex[:8]}"
+        WorkQueue.write_json(temporary, {"worker": self.worker})
+        try:
+            os.link(temporary, lock)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:  # su NFS il link può riuscire anche se la risposta si perde: conta il numero di collegamenti
+            return os.stat(temporary).st_nlink == 2
+        finally:
+            os.remove(temporary)
+
+    def _expired(self, lock: str, now: float) -> bool:
+        """
+        Il metodo verifica che il lock non sia stato rinnovato entro la scadenza.
+        """
+
+        try:
+            return now - os.stat(lock).st_mtime > self.lease
+        except FileNotFoundError:
+            return True
+
+    def _break(self, lock: str, now: float) -> bool:
+        """
+        Il metodo rimuove un lock scaduto: la rinomina riesce a un solo worker; se nel frattempo il lock
+        era stato rinnovato viene rimesso al suo posto.
+        """
+
+        stale: str = f"{lock}.stale.{uuid.uuid4().hex[:8]}"
+        try:
+            os.rename(lock, stale)
+        except FileNotFoundError:
+            return True  # già rimosso da un altro worker
+
+        if not self._expired(stale, now):
+            try:
+                os.link(stale, lock)
+            except FileExistsError:
+                pass
+            os.remove(stale)
+            return False
+
+        os.remove(stale)
+        return True
+
+    @staticmethod
+    def write_json(path: str, data: dict[str, Any]) -> None:
+        """
+        Il metodo scrive un file JSON.
+        """
+
+        with open(path, "w") as file:
+            json.dump(data, file)